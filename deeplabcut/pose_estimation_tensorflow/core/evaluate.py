@@ -10,7 +10,12 @@ Licensed under GNU Lesser General Public License v3.0
 
 
 import argparse
+import multiprocessing
 import os
+import queue
+import tempfile
+import traceback
+import warnings
 from pathlib import Path
 import numpy as np
 import pandas as pd
@@ -213,6 +218,118 @@ def Plotting(
         visualization.erase_artists(ax)
 
 
+def load_evaluation_images(project_path, imagenames, scale=1):
+    """Decode, and rescale if needed, the labeled images once for all snapshots.
+
+    Parameters
+    ----------
+    project_path : str
+        Full path to the project.
+
+    imagenames : iterable
+        Image paths relative to the project, as in the index of the labeled data.
+
+    scale : float, optional (default=1)
+        Factor by which images are resized.
+
+    Returns
+    -------
+    list of numpy.ndarray
+        Images, in the order of ``imagenames``.
+    """
+    from deeplabcut.utils.auxfun_videos import imread, imresize
+
+    images = []
+    for imagename in tqdm(imagenames):
+        if isinstance(imagename, str):
+            imagename = (imagename,)
+        image = imread(os.path.join(project_path, *imagename), mode="skimage")
+        if scale != 1:
+            image = imresize(image, scale)
+        images.append(image)
+    return images
+
+
+def load_snapshot(dlc_cfg, model=None):
+    """Load the snapshot ``dlc_cfg["init_weights"]`` for single-animal prediction.
+
+    Parameters
+    ----------
+    dlc_cfg : dict
+        Test pose configuration.
+
+    model : tuple, optional (default=None)
+        Model previously returned by this function. If given, the snapshot
+        weights are restored into its graph rather than building a new one.
+
+    Returns
+    -------
+    tuple
+        Session, input placeholder, output tensors and saver of the model.
+    """
+    import tensorflow as tf
+    from deeplabcut.pose_estimation_tensorflow.core import predict
+
+    if model is None:
+        sess, inputs, outputs = predict.setup_pose_prediction(dlc_cfg)
+        return sess, inputs, outputs, tf.compat.v1.train.Saver()
+    sess, _, _, restorer = model
+    restorer.restore(sess, dlc_cfg["init_weights"])
+    return model
+
+
+def predict_evaluation_images(images, dlc_cfg, sess, inputs, outputs, batchsize=1):
+    """Predict single-animal poses on images, in fixed-size batches.
+
+    Images are batched together only if their shapes are identical,
+    so that every prediction is that of the image run on its own.
+    The last batch of every shape is padded by repeating its last image.
+
+    Parameters
+    ----------
+    images : list of numpy.ndarray
+        Images, as returned by :func:`load_evaluation_images`.
+
+    dlc_cfg : dict
+        Test pose configuration.
+
+    sess, inputs, outputs
+        Session, input placeholder and output tensors, as returned by
+        predict.setup_pose_prediction for a batch size of ``batchsize``.
+
+    batchsize : int, optional (default=1)
+        Number of images per forward pass.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n_images, 3 * n_bodyparts) of x, y and likelihood.
+    """
+    from deeplabcut.pose_estimation_tensorflow.core import predict
+
+    groups = dict()
+    for i, image in enumerate(images):
+        groups.setdefault(image.shape, []).append(i)
+    PredicteData = np.zeros((len(images), 3 * len(dlc_cfg["all_joints_names"])))
+    for inds in groups.values():
+        for start in range(0, len(inds), batchsize):
+            batch_inds = inds[start : start + batchsize]
+            batch = np.stack([images[i] for i in batch_inds]).astype(float)
+            if len(batch) < batchsize:
+                fill = np.repeat(batch[-1:], batchsize - len(batch), axis=0)
+                batch = np.concatenate((batch, fill))
+            outputs_np = sess.run(outputs, feed_dict={inputs: batch})
+            scmap, locref = predict.extract_cnn_outputmulti(outputs_np, dlc_cfg)
+            for n, i in enumerate(batch_inds):
+                # Extract maximum scoring location from the heatmap, assume 1 person
+                pose = predict.argmax_pose_predict(
+                    scmap[n], locref[n], dlc_cfg["stride"]
+                )
+                # NOTE: thereby cfg_test['all_joints_names'] should be same order as bodyparts!
+                PredicteData[i] = pose.flatten()
+    return PredicteData
+
+
 def return_evaluate_network_data(
     config,
     shuffle=0,
@@ -501,6 +618,12 @@ def evaluate_network(
     gputouse=None,
     rescale=False,
     modelprefix="",
+    batchsize=1,
+    snapshotindex=None,
+    n_processes=None,
+    n_threads=None,
+    n_graph_processes=1,
+    graph_patience=None,
 ):
     """Evaluates the network.
 
@@ -554,6 +677,39 @@ def evaluate_network(
         Directory containing the deeplabcut models to use when evaluating the network.
         By default, the models are assumed to exist in the project folder.
 
+    batchsize: int, optional, default=1
+        Number of images run through the network at once (single-animal projects).
+        Images are decoded once and reused by all snapshots of a shuffle and
+        training fraction, which are swapped by restoring their weights into the
+        same graph; only images of identical size are batched together.
+
+    snapshotindex: int or str, optional, default=None
+        Index of the snapshot to evaluate, or "all". By default, the
+        ``snapshotindex`` of the config.yaml file is used.
+
+    n_processes: int or None, optional, default=None
+        If greater than 1, every (shuffle, trainFraction, snapshot) combination is
+        evaluated as a separate job by a pool of that many worker processes. The
+        results files are only written once all jobs are done, so that concurrent
+        jobs never write to them. Workers are started with the "spawn" method, so
+        calling scripts must be guarded by ``if __name__ == "__main__":``.
+        Workers share the GPU, allocating its memory as they need it
+        (``TF_FORCE_GPU_ALLOW_GROWTH``) rather than all of it upfront.
+
+    n_threads: int or None, optional, default=None
+        Number of CPU threads used by the TensorFlow session of every worker.
+        By default, the CPU cores are split evenly among the workers.
+
+    n_graph_processes: int, optional, default=1
+        Number of processes benchmarking the candidate PAF graphs of
+        multi-animal projects. Graphs are benchmarked serially by default.
+        Every process holds its own copy of the detections, links and ground
+        truth, so memory use grows with the number of processes.
+
+    graph_patience: int or None, optional, default=None
+        If given, stop benchmarking ever larger PAF graphs of multi-animal
+        projects once that many successive graphs failed to improve the score.
+
     Returns
     -------
     None
@@ -593,8 +749,31 @@ def evaluate_network(
     from deeplabcut.utils import auxiliaryfunctions
 
     cfg = auxiliaryfunctions.read_config(config)
+    if snapshotindex is None:
+        snapshotindex = cfg["snapshotindex"]
 
-    if cfg.get("multianimalproject", False):
+    if n_processes is not None and n_processes > 1:
+        _evaluate_network_parallel(
+            config,
+            cfg,
+            Shuffles,
+            trainingsetindex,
+            snapshotindex,
+            n_processes,
+            n_threads,
+            dict(
+                plotting=plotting,
+                show_errors=show_errors,
+                comparisonbodyparts=comparisonbodyparts,
+                gputouse=gputouse,
+                rescale=rescale,
+                modelprefix=modelprefix,
+                batchsize=batchsize,
+                n_graph_processes=n_graph_processes,
+                graph_patience=graph_patience,
+            ),
+        )
+    elif cfg.get("multianimalproject", False):
         from .evaluate_multianimal import evaluate_multianimal_full
 
         # TODO: Make this code not so redundant!
@@ -606,12 +785,12 @@ def evaluate_network(
             comparisonbodyparts=comparisonbodyparts,
             gputouse=gputouse,
             modelprefix=modelprefix,
+            snapshotindex=snapshotindex,
+            n_graph_processes=n_graph_processes,
+            graph_patience=graph_patience,
         )
     else:
-        from deeplabcut.utils.auxfun_videos import imread, imresize
-        from deeplabcut.pose_estimation_tensorflow.core import predict
         from deeplabcut.pose_estimation_tensorflow.config import load_config
-        from deeplabcut.pose_estimation_tensorflow.datasets.utils import data_to_input
         from deeplabcut.utils import auxiliaryfunctions, conversioncode
         import tensorflow as tf
 
@@ -704,7 +883,8 @@ def evaluate_network(
                     )
 
                 # change batch size, if it was edited during analysis!
-                dlc_cfg["batch_size"] = 1  # in case this was edited for analysis.
+                # in case this was edited for analysis.
+                dlc_cfg["batch_size"] = batchsize
 
                 # Create folder structure to store results.
                 evaluationfolder = os.path.join(
@@ -739,12 +919,12 @@ def evaluate_network(
                 )
                 Snapshots = Snapshots[increasing_indices]
 
-                if cfg["snapshotindex"] == -1:
+                if snapshotindex == -1:
                     snapindices = [-1]
-                elif cfg["snapshotindex"] == "all":
+                elif snapshotindex == "all":
                     snapindices = range(len(Snapshots))
-                elif cfg["snapshotindex"] < len(Snapshots):
-                    snapindices = [cfg["snapshotindex"]]
+                elif snapshotindex < len(Snapshots):
+                    snapindices = [snapshotindex]
                 else:
                     raise ValueError(
                         "Invalid choice, only -1 (last), any integer up to last, or all (as string)!"
@@ -772,6 +952,11 @@ def evaluate_network(
                 ##################################################
                 # Compute predictions over images
                 ##################################################
+                # The graph is built for the first snapshot evaluated; the weights
+                # of the next ones are restored into it. Images are decoded once
+                # for all snapshots of this shuffle and training fraction only,
+                # so that at most one dataset is held in memory.
+                model = images = None
                 for snapindex in snapindices:
                     dlc_cfg["init_weights"] = os.path.join(
                         str(modelfolder), "train", Snapshots[snapindex]
@@ -808,40 +993,22 @@ def evaluate_network(
                     )
                     if notanalyzed:
                         # Specifying state of model (snapshot / training state)
-                        sess, inputs, outputs = predict.setup_pose_prediction(dlc_cfg)
-                        Numimages = len(Data.index)
-                        PredicteData = np.zeros(
-                            (Numimages, 3 * len(dlc_cfg["all_joints_names"]))
-                        )
-                        print("Running evaluation ...")
-                        for imageindex, imagename in tqdm(enumerate(Data.index)):
-                            image = imread(
-                                os.path.join(cfg["project_path"], *imagename),
-                                mode="skimage",
+                        model = load_snapshot(dlc_cfg, model)
+                        sess, inputs, outputs, _ = model
+                        if images is None:
+                            print("Loading images ...")
+                            images = load_evaluation_images(
+                                cfg["project_path"], Data.index, scale
                             )
-                            if scale != 1:
-                                image = imresize(image, scale)
-
-                            image_batch = data_to_input(image)
-                            # Compute prediction with the CNN
-                            outputs_np = sess.run(
-                                outputs, feed_dict={inputs: image_batch}
-                            )
-                            scmap, locref = predict.extract_cnn_output(
-                                outputs_np, dlc_cfg
-                            )
-
-                            # Extract maximum scoring location from the heatmap, assume 1 person
-                            pose = predict.argmax_pose_predict(
-                                scmap, locref, dlc_cfg["stride"]
-                            )
-                            PredicteData[
-                                imageindex, :
-                            ] = (
-                                pose.flatten()
-                            )  # NOTE: thereby     cfg_test['all_joints_names'] should be same order as bodyparts!
-
-                        sess.close()  # closes the current tf session
+                        print("Running evaluation ...")
+                        PredicteData = predict_evaluation_images(
+                            images,
+                            dlc_cfg,
+                            sess,
+                            inputs,
+                            outputs,
+                            batchsize,
+                        )
 
                         index = pd.MultiIndex.from_product(
                             [
@@ -945,7 +1112,6 @@ def evaluate_network(
                                 foldername,
                             )  # Rescaling coordinates to have figure in original size!
 
-                        tf.compat.v1.reset_default_graph()
                         # print(final_result)
                     else:
                         DataMachine = pd.read_hdf(resultsfilename)
@@ -974,6 +1140,10 @@ def evaluate_network(
                                 foldername,
                             )
 
+                if model is not None:
+                    model[0].close()  # closes the current tf session
+                    tf.compat.v1.reset_default_graph()
+
                 if len(final_result) > 0:  # Only append if results were calculated
                     make_results_file(final_result, evaluationfolder, DLCscorer)
                     print(
@@ -990,41 +1160,247 @@ def evaluate_network(
     os.chdir(str(start_path))
 
 
-def make_results_file(final_result, evaluationfolder, DLCscorer):
-    """
-    Makes result file in csv format and saves under evaluation_results directory.
-    If the file exists (typically, when the network has already been evaluated),
-    newer results are appended to it.
+_RESULTS_COLUMNS = [
+    "Training iterations:",
+    "%Training dataset",
+    "Shuffle number",
+    " Train error(px)",
+    " Test error(px)",
+    "p-cutoff used",
+    "Train error with p-cutoff",
+    "Test error with p-cutoff",
+]
+
+# When set to a list by an evaluation worker, results are collected there
+# rather than written, leaving the results files to the parent process.
+_results_sink = None
+
+
+def _list_evaluation_jobs(
+    cfg, Shuffles, trainingsetindex, snapshotindex, modelprefix=""
+):
+    """List the (shuffle, trainingsetindex, snapshotindex) combinations to evaluate."""
+    from deeplabcut.utils import auxiliaryfunctions
+
+    if trainingsetindex == "all":
+        trainingsetindices = range(len(cfg["TrainingFraction"]))
+    else:
+        trainingsetindices = [trainingsetindex]
+    jobs = []
+    for shuffle in Shuffles:
+        for index in trainingsetindices:
+            trainFraction = cfg["TrainingFraction"][index]
+            modelfolder = os.path.join(
+                cfg["project_path"],
+                str(
+                    auxiliaryfunctions.get_model_folder(
+                        trainFraction, shuffle, cfg, modelprefix=modelprefix
+                    )
+                ),
+            )
+            trainfolder = os.path.join(modelfolder, "train")
+            n_snapshots = 0
+            if os.path.isdir(trainfolder):
+                n_snapshots = sum("index" in fn for fn in os.listdir(trainfolder))
+            if not n_snapshots:
+                raise FileNotFoundError(
+                    "Snapshots not found! It seems the dataset for shuffle %s and trainFraction %s is not trained.\nPlease train it before evaluating.\nUse the function 'train_network' to do so."
+                    % (shuffle, trainFraction)
+                )
+            if snapshotindex == -1:
+                snapindices = [n_snapshots - 1]
+            elif snapshotindex == "all":
+                snapindices = range(n_snapshots)
+            elif snapshotindex < n_snapshots:
+                snapindices = [snapshotindex]
+            else:
+                raise ValueError(
+                    "Invalid choice, only -1 (last), any integer up to last, or all (as string)!"
+                )
+            jobs.extend((shuffle, index, snapindex) for snapindex in snapindices)
+    return jobs
+
+
+def _evaluate_network_worker(jobs, progress, n_threads, config, kwargs):
+    """Evaluate snapshots from the job queue until a sentinel is met."""
+    # Must be set before TensorFlow initializes the GPU; otherwise, the first
+    # worker's session would claim the memory of the GPU for itself.
+    os.environ.setdefault("TF_FORCE_GPU_ALLOW_GROWTH", "true")
+    if kwargs.get("gputouse") is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(kwargs["gputouse"])
+    import tensorflow as tf
+
+    global _results_sink
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        shuffle, trainingsetindex, snapindex = job
+        _results_sink = []
+        try:
+            evaluate_network(
+                config,
+                Shuffles=[shuffle],
+                trainingsetindex=trainingsetindex,
+                snapshotindex=snapindex,
+                **kwargs,
+            )
+            progress.put((job, _results_sink, None))
+        except Exception:
+            progress.put((job, None, traceback.format_exc()))
+
+
+def _evaluate_network_parallel(
+    config,
+    cfg,
+    Shuffles,
+    trainingsetindex,
+    snapshotindex,
+    n_processes,
+    n_threads,
+    kwargs,
+):
+    """Evaluate snapshots across a pool of worker processes.
+
+    Workers return their results instead of writing them; these are merged
+    into the results files once all jobs are done, in the same order as
+    a sequential evaluation would have written them.
     """
-    col_names = [
-        "Training iterations:",
-        "%Training dataset",
-        "Shuffle number",
-        " Train error(px)",
-        " Test error(px)",
-        "p-cutoff used",
-        "Train error with p-cutoff",
-        "Test error with p-cutoff",
+    from deeplabcut.utils import auxiliaryfunctions
+
+    jobs = _list_evaluation_jobs(
+        cfg, Shuffles, trainingsetindex, snapshotindex, kwargs["modelprefix"]
+    )
+    # Create the folders shared by several jobs upfront, as workers would race
+    # to create them
+    auxiliaryfunctions.attempttomakefolder(
+        os.path.join(cfg["project_path"], "evaluation-results")
+    )
+    for shuffle, index in {job[:2] for job in jobs}:
+        evaluationfolder = os.path.join(
+            cfg["project_path"],
+            str(
+                auxiliaryfunctions.get_evaluation_folder(
+                    cfg["TrainingFraction"][index],
+                    shuffle,
+                    cfg,
+                    modelprefix=kwargs["modelprefix"],
+                )
+            ),
+        )
+        auxiliaryfunctions.attempttomakefolder(evaluationfolder, recursive=True)
+    n_workers = min(n_processes, len(jobs))
+    if n_threads is None:
+        n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    print(
+        f"Evaluating {len(jobs)} snapshots with {n_workers} processes ({n_threads} threads each)..."
+    )
+    ctx = multiprocessing.get_context("spawn")  # TensorFlow is not fork-safe
+    job_queue = ctx.Queue()
+    for job in jobs:
+        job_queue.put(job)
+    for _ in range(n_workers):
+        job_queue.put(None)
+    progress = ctx.Queue()
+    workers = [
+        ctx.Process(
+            target=_evaluate_network_worker,
+            args=(job_queue, progress, n_threads, config, kwargs),
+        )
+        for _ in range(n_workers)
     ]
-    df = pd.DataFrame(final_result, columns=col_names)
-    output_path = os.path.join(str(evaluationfolder), DLCscorer + "-results.csv")
-    if os.path.exists(output_path):
-        temp = pd.read_csv(output_path, index_col=0)
-        df = pd.concat((df, temp)).reset_index(drop=True)
+    for worker in workers:
+        worker.start()
+
+    pending = set(jobs)
+    results = dict()
+    failed = []
+    pbar = tqdm(total=len(jobs))
+    while pending:
+        try:
+            job, collected, error = progress.get(timeout=5)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break
+            continue
+        pending.discard(job)
+        pbar.update(1)
+        if error is None:
+            results[job] = collected
+        else:
+            failed.append(job)
+            print(
+                f"Evaluation of (shuffle, trainingsetindex, snapshotindex)={job} failed:\n{error}"
+            )
+    pbar.close()
+    for worker in workers:
+        worker.join()
+
+    merged = dict()
+    for job in jobs:
+        for final_result, evaluationfolder, DLCscorer in results.get(job, []):
+            rows, _ = merged.get(evaluationfolder, ([], None))
+            # Like a sequential evaluation, name the file after the last snapshot
+            merged[evaluationfolder] = (rows + list(final_result), DLCscorer)
+    _write_results_files(list(merged.items()))
+    if pending or failed:
+        warnings.warn(
+            "The following (shuffle, trainingsetindex, snapshotindex) combinations "
+            f"could not be evaluated: {sorted(pending.union(failed))}."
+        )
 
-    df.to_csv(output_path)
 
-    ## Also storing one "large" table with results:
-    # note: evaluationfolder.parents[0] to get common folder above all shuffle evaluations.
-    df = pd.DataFrame(final_result, columns=col_names)
-    output_path = os.path.join(
-        str(Path(evaluationfolder).parents[0]), "CombinedEvaluation-results.csv"
-    )
+def _prepend_to_csv(df, output_path):
+    """Prepend rows to a csv file, replacing it atomically."""
     if os.path.exists(output_path):
         temp = pd.read_csv(output_path, index_col=0)
         df = pd.concat((df, temp)).reset_index(drop=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(output_path), suffix=".csv")
+    try:
+        with os.fdopen(fd, "w") as f:
+            df.to_csv(f)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
 
-    df.to_csv(output_path)
+def _write_results_files(results):
+    """Write the results of several evaluation folders.
+
+    Parameters
+    ----------
+    results : list
+        (evaluationfolder, (final_result, DLCscorer)) pairs, in evaluation order.
+        Every combined results file is written once, its newest rows first.
+    """
+    combined = dict()
+    for evaluationfolder, (final_result, DLCscorer) in results:
+        df = pd.DataFrame(final_result, columns=_RESULTS_COLUMNS)
+        _prepend_to_csv(
+            df, os.path.join(str(evaluationfolder), DLCscorer + "-results.csv")
+        )
+        ## Also storing one "large" table with results:
+        # note: evaluationfolder.parents[0] to get common folder above all shuffle evaluations.
+        output_path = os.path.join(
+            str(Path(evaluationfolder).parents[0]), "CombinedEvaluation-results.csv"
+        )
+        combined.setdefault(output_path, []).insert(0, df)
+    for output_path, dfs in combined.items():
+        _prepend_to_csv(pd.concat(dfs).reset_index(drop=True), output_path)
+
+
+def make_results_file(final_result, evaluationfolder, DLCscorer):
+    """
+    Makes result file in csv format and saves under evaluation_results directory.
+    If the file exists (typically, when the network has already been evaluated),
+    newer results are appended to it.
+    """
+    if _results_sink is not None:
+        _results_sink.append((final_result, evaluationfolder, DLCscorer))
+        return
+    _write_results_files([(evaluationfolder, (final_result, DLCscorer))])
 
 
 if __name__ == "__main__":
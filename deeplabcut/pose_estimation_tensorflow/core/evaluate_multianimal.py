@@ -105,6 +105,9 @@ def evaluate_multianimal_full(
     comparisonbodyparts="all",
     gputouse=None,
     modelprefix="",
+    snapshotindex=None,
+    n_graph_processes=1,
+    graph_patience=None,
 ):
     from deeplabcut.pose_estimation_tensorflow.core import (
         predict,
@@ -136,6 +139,8 @@ def evaluate_multianimal_full(
     # Load data...
     ##################################################
     cfg = auxiliaryfunctions.read_config(config)
+    if snapshotindex is None:
+        snapshotindex = cfg["snapshotindex"]
     if trainingsetindex == "all":
         TrainingFractions = cfg["TrainingFraction"]
     else:
@@ -245,12 +250,12 @@ def evaluate_multianimal_full(
                 )
                 Snapshots = Snapshots[increasing_indices]
 
-                if cfg["snapshotindex"] == -1:
+                if snapshotindex == -1:
                     snapindices = [-1]
-                elif cfg["snapshotindex"] == "all":
+                elif snapshotindex == "all":
                     snapindices = range(len(Snapshots))
-                elif cfg["snapshotindex"] < len(Snapshots):
-                    snapindices = [cfg["snapshotindex"]]
+                elif snapshotindex < len(Snapshots):
+                    snapindices = [snapshotindex]
                 else:
                     print(
                         "Invalid choice, only -1 (last), any integer up to last, or all (as string)!"
@@ -586,6 +591,8 @@ def evaluate_multianimal_full(
                         oks_sigma=dlc_cfg.get("oks_sigma", 0.1),
                         margin=dlc_cfg.get("bbox_margin", 0),
                         symmetric_kpts=dlc_cfg.get("symmetric_kpts"),
+                        n_processes=n_graph_processes,
+                        patience=graph_patience,
                     )
                     if plotting == "individual":
                         assemblies, assemblies_unique, image_paths = best_assemblies
@@ -0,0 +1,217 @@
+"""
+DeepLabCut2.2 Toolbox (deeplabcut.org)
+© A. & M. Mathis Labs
+https://github.com/DeepLabCut/DeepLabCut
+
+Please see AUTHORS for contributors.
+https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+Licensed under GNU Lesser General Public License v3.0
+
+Pipelined video inference: frame decoding, network forward passes and
+pose extraction/writing run concurrently instead of one after the other.
+"""
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+
+class StageStats:
+    """Accumulate the busy time and the number of frames processed by a stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.n_frames = 0
+
+    def add(self, duration, n_frames):
+        self.busy += duration
+        self.n_frames += n_frames
+
+    @property
+    def throughput(self):
+        if not self.busy:
+            return float("nan")
+        return self.n_frames / self.busy
+
+    def __repr__(self):
+        return (
+            f"{self.name}: {self.n_frames} frames in {self.busy:.2f} s "
+            f"({self.throughput:.1f} fps)"
+        )
+
+
+class PipelinedPoseEstimator:
+    """Overlap video decoding, network inference and result writing.
+
+    A decoder thread reads frames from the capture and converts them to RGB
+    directly into a ring of ``n_buffers`` preallocated batch buffers.
+    The calling thread (which owns the TensorFlow session) runs the network on
+    full batches and hands the raw outputs over to a writer thread, which turns
+    them into poses and stores them in the output array.
+    The ring size bounds the number of decoded frames held in memory.
+
+    Parameters
+    ----------
+    run_batch: callable
+        Maps a (batchsize, ny, nx, 3) uint8 array to the raw network outputs.
+        The input buffer is recycled as soon as this function returns.
+
+    extract_poses: callable
+        Maps the raw network outputs to an array of shape (batchsize, n_columns).
+
+    batchsize: int
+        Number of frames per forward pass.
+
+    n_buffers: int, optional (default=3)
+        Number of batch buffers in the ring; at least 2 are needed for decoding
+        and inference to overlap.
+
+    crop: tuple or None, optional (default=None)
+        Cropping coordinates as (x1, x2, y1, y2).
+    """
+
+    def __init__(self, run_batch, extract_poses, batchsize, n_buffers=3, crop=None):
+        if n_buffers < 2:
+            raise ValueError("At least two buffers are required for pipelining.")
+        self.run_batch = run_batch
+        self.extract_poses = extract_poses
+        self.batchsize = batchsize
+        self.n_buffers = n_buffers
+        self.crop = crop
+        self.stats = {
+            name: StageStats(name) for name in ("decode", "inference", "write")
+        }
+        self.wall_time = 0.0
+        self._error = None
+
+    def _set_error(self, exc):
+        if self._error is None:
+            self._error = exc
+
+    def _decode(self, cap, nframes, buffers, inds, free_slots, full_slots):
+        stats = self.stats["decode"]
+        try:
+            counter = 0
+            while counter < nframes and self._error is None:
+                slot = free_slots.get()
+                if slot is None:
+                    break
+                n = 0
+                tic = time.perf_counter()
+                while n < self.batchsize and counter < nframes:
+                    ret, frame = cap.read()
+                    if ret:
+                        if self.crop is not None:
+                            x1, x2, y1, y2 = self.crop
+                            frame = frame[y1:y2, x1:x2]
+                        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffers[slot, n])
+                        inds[slot, n] = counter
+                        n += 1
+                    counter += 1
+                stats.add(time.perf_counter() - tic, n)
+                if n:
+                    full_slots.put((slot, n))
+                else:
+                    free_slots.put(slot)
+        except Exception as e:
+            self._set_error(e)
+        finally:
+            full_slots.put(None)
+
+    def _write(self, results, data, pbar):
+        stats = self.stats["write"]
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue  # Keep draining so the inference thread never blocks
+            outputs, inds, n = item
+            try:
+                tic = time.perf_counter()
+                poses = self.extract_poses(outputs)
+                data[inds[:n]] = poses[:n]
+                stats.add(time.perf_counter() - tic, n)
+                pbar.update(n)
+            except Exception as e:
+                self._set_error(e)
+
+    def run(self, cap, nframes, frame_shape, n_columns):
+        """Analyze the first ``nframes`` frames of a video.
+
+        Parameters
+        ----------
+        cap: cv2.VideoCapture
+            Opened video capture; frames are read sequentially from its current position.
+
+        nframes: int
+            Number of frames to analyze.
+
+        frame_shape: tuple
+            (ny, nx) dimensions of the (cropped) frames.
+
+        n_columns: int
+            Number of columns of the output array.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (nframes, n_columns); rows of frames that could not
+            be decoded are left to zero, as in the serial code paths.
+        """
+        ny, nx = frame_shape
+        buffers = np.empty((self.n_buffers, self.batchsize, ny, nx, 3), dtype=np.uint8)
+        inds = np.zeros((self.n_buffers, self.batchsize), dtype=int)
+        data = np.zeros((nframes, n_columns))
+        free_slots = queue.Queue()
+        for slot in range(self.n_buffers):
+            free_slots.put(slot)
+        full_slots = queue.Queue()
+        results = queue.Queue(maxsize=self.n_buffers)
+        pbar = tqdm(total=nframes)
+
+        decoder = threading.Thread(
+            target=self._decode,
+            args=(cap, nframes, buffers, inds, free_slots, full_slots),
+            daemon=True,
+        )
+        writer = threading.Thread(
+            target=self._write, args=(results, data, pbar), daemon=True
+        )
+        decoder.start()
+        writer.start()
+        stats = self.stats["inference"]
+        start = time.perf_counter()
+        try:
+            while True:
+                item = full_slots.get()
+                if item is None or self._error is not None:
+                    break
+                slot, n = item
+                tic = time.perf_counter()
+                outputs = self.run_batch(buffers[slot])
+                stats.add(time.perf_counter() - tic, n)
+                # Indices are copied because the slot is handed back to the decoder.
+                results.put((outputs, inds[slot].copy(), n))
+                free_slots.put(slot)
+        except Exception as e:
+            self._set_error(e)
+        finally:
+            free_slots.put(None)  # Unblock the decoder if it waits for a buffer
+            results.put(None)
+            decoder.join()
+            writer.join()
+            pbar.close()
+        self.wall_time = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+        return data
+
+    def report(self):
+        print(f"Pipelined analysis completed in {self.wall_time:.2f} s:")
+        for stage in self.stats.values():
+            print(f"    {stage}")
@@ -0,0 +1,238 @@
+"""
+DeepLabCut2.2 Toolbox (deeplabcut.org)
+© A. & M. Mathis Labs
+https://github.com/DeepLabCut/DeepLabCut
+
+Please see AUTHORS for contributors.
+https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+Licensed under GNU Lesser General Public License v3.0
+
+Background loaders feeding training batches into the TensorFlow input queue.
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+import tensorflow as tf
+from deeplabcut.pose_estimation_tensorflow.datasets import PoseDatasetFactory
+
+
+class BatchLoader(threading.Thread):
+    """Enqueue batches of a dataset from a background thread.
+
+    Besides feeding the queue, the loader measures how long training stalls
+    for lack of data, i.e. the time spent producing batches while the queue
+    is empty.
+
+    Parameters
+    ----------
+    sess : tf.compat.v1.Session
+        Training session.
+
+    enqueue_op : tf.Operation
+        Operation enqueuing the placeholders' values.
+
+    dataset : BasePoseDataset
+        Dataset producing batches.
+
+    placeholders : dict
+        Placeholders fed with the batches, keyed by Batch.
+
+    coord : tf.compat.v1.train.Coordinator
+        Coordinator signaling when to stop.
+    """
+
+    def __init__(self, sess, enqueue_op, dataset, placeholders, coord):
+        super(BatchLoader, self).__init__(daemon=True)
+        self.sess = sess
+        self.enqueue_op = enqueue_op
+        self.dataset = dataset
+        self.placeholders = placeholders
+        self.coord = coord
+        queue_ref = enqueue_op.inputs[0]
+        self._size_op = tf.raw_ops.QueueSizeV2(handle=queue_ref)
+        self._close_op = tf.raw_ops.QueueCloseV2(
+            handle=queue_ref, cancel_pending_enqueues=True
+        )
+        self._stall_time = 0.0
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """Stop loading, unblocking any pending enqueue, and wait for the thread."""
+        self.coord.request_stop()
+        self.sess.run(self._close_op)
+        self.join()
+
+    def pop_stall_time(self):
+        """Return the stall time, in seconds, accumulated since the last call."""
+        with self._lock:
+            stall_time, self._stall_time = self._stall_time, 0.0
+        return stall_time
+
+    def next_batch(self):
+        """Return the next batch, or None if none is ready yet."""
+        return self.dataset.next_batch()
+
+    def run(self):
+        try:
+            while not self.coord.should_stop():
+                starving = self.sess.run(self._size_op) == 0
+                start = time.perf_counter()
+                batch = self.next_batch()
+                if starving:
+                    with self._lock:
+                        self._stall_time += time.perf_counter() - start
+                if batch is None:
+                    continue
+                food = {pl: batch[name] for (name, pl) in self.placeholders.items()}
+                self.sess.run(self.enqueue_op, feed_dict=food)
+        except Exception as e:
+            if not self.coord.should_stop():
+                logging.exception("Data loading failed.")
+                self.coord.request_stop(e)
+                # Unblock the training loop waiting for batches
+                self.sess.run(self._close_op)
+
+
+def _load_batches(make_dataset, cfg, keys, seed, batches, stop_event):
+    """Worker process writing batches into shared memory."""
+    import imgaug
+
+    try:
+        np.random.seed(seed)
+        imgaug.seed(seed)
+        dataset = make_dataset(cfg)
+        while not stop_event.is_set():
+            batch = dataset.next_batch()
+            arrays = [np.asarray(batch[key], dtype=np.float32) for key in keys]
+            shm = shared_memory.SharedMemory(
+                create=True, size=max(1, sum(array.nbytes for array in arrays))
+            )
+            specs = []
+            offset = 0
+            for array in arrays:
+                view = np.ndarray(array.shape, np.float32, shm.buf, offset)
+                view[:] = array
+                specs.append((array.shape, offset))
+                offset += array.nbytes
+            del view
+            shm.close()
+            batches.put((shm.name, specs))
+    except Exception:
+        batches.put((None, traceback.format_exc()))
+
+
+class MultiProcessBatchLoader(BatchLoader):
+    """Enqueue batches produced in parallel by worker processes.
+
+    Every worker builds its own dataset, and thus its own augmentation
+    pipeline, from the configuration, with an independent random seed.
+    Workers share the directory of the dataset's image cache, if any.
+    Batches are passed back to the loader thread through shared memory.
+
+    Parameters
+    ----------
+    sess, enqueue_op, dataset, placeholders, coord
+        See :class:`BatchLoader`; ``dataset`` is only used for its configuration.
+
+    num_workers : int
+        Number of worker processes.
+
+    seed : int, optional
+        Seed of the first worker, incremented for every other worker.
+        Drawn at random by default.
+
+    make_dataset : callable, optional
+        Picklable function building a dataset from a configuration in the
+        workers; by default, PoseDatasetFactory.create.
+    """
+
+    def __init__(
+        self,
+        sess,
+        enqueue_op,
+        dataset,
+        placeholders,
+        coord,
+        num_workers,
+        seed=None,
+        make_dataset=PoseDatasetFactory.create,
+    ):
+        super(MultiProcessBatchLoader, self).__init__(
+            sess, enqueue_op, dataset, placeholders, coord
+        )
+        if seed is None:
+            seed = np.random.randint(2 ** 31 - num_workers)
+        # Workers are spawned rather than forked, as forking a process
+        # running TensorFlow is unsafe.
+        ctx = multiprocessing.get_context("spawn")
+        cfg = dict(dataset.cfg)
+        image_cache = getattr(dataset, "image_cache", None)
+        if image_cache is not None and image_cache.cache_dir is not None:
+            cfg["image_cache_dir"] = image_cache.cache_dir
+        self._keys = list(placeholders)
+        self._batches = ctx.Queue(maxsize=2 * num_workers)
+        self._stop_event = ctx.Event()
+        self._workers = [
+            ctx.Process(
+                target=_load_batches,
+                args=(
+                    make_dataset,
+                    cfg,
+                    self._keys,
+                    seed + i,
+                    self._batches,
+                    self._stop_event,
+                ),
+                daemon=True,
+            )
+            for i in range(num_workers)
+        ]
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+        super(MultiProcessBatchLoader, self).start()
+
+    def next_batch(self):
+        try:
+            name, specs = self._batches.get(timeout=1)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in self._workers):
+                raise RuntimeError("All data loading workers died.")
+            return None
+        if name is None:
+            raise RuntimeError(f"Data loading worker failed:\n{specs}")
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return {
+                key: np.ndarray(shape, np.float32, shm.buf, offset).copy()
+                for key, (shape, offset) in zip(self._keys, specs)
+            }
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def run(self):
+        try:
+            super(MultiProcessBatchLoader, self).run()
+        finally:
+            self._stop_event.set()
+            # Release the shared memory of batches that were never consumed
+            while True:
+                try:
+                    name, _ = self._batches.get(timeout=0.1)
+                except queue.Empty:
+                    break
+                if name is not None:
+                    shm = shared_memory.SharedMemory(name=name)
+                    shm.close()
+                    shm.unlink()
+            for worker in self._workers:
+                worker.terminate()
+                worker.join()
@@ -81,7 +81,7 @@ class OpenVINOSession:
 
         def completion_callback(request, inp_id):
             output = next(iter(request.results.values()))
-            batch_output[out_id] = output
+            batch_output[inp_id] = output
 
         self.infer_queue.set_callback(completion_callback)
 
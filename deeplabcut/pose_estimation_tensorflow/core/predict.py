@@ -174,9 +174,16 @@ def getposeNP(image, cfg, sess, inputs, outputs, outall=False):
     """Adapted from DeeperCut, performs numpy-based faster inference on batches.
     Introduced in https://www.biorxiv.org/content/10.1101/457242v1"""
 
-    num_outputs = cfg.get("num_outputs", 1)
     outputs_np = sess.run(outputs, feed_dict={inputs: image})
+    return extract_poses_from_outputs(outputs_np, cfg, outall)
+
 
+def extract_poses_from_outputs(outputs_np, cfg, outall=False):
+    """Turn the raw network outputs of an image batch into poses.
+
+    This is the host-side part of :func:`getposeNP`; it is kept separate so that
+    it can run concurrently with the next forward pass."""
+    num_outputs = cfg.get("num_outputs", 1)
     scmap, locref = extract_cnn_outputmulti(outputs_np, cfg)  # processes image batch.
     batchsize, ny, nx, num_joints = scmap.shape
 
@@ -200,9 +207,7 @@ def getposeNP(image, cfg, sess, inputs, outputs, outall=False):
     Ys = Y.swapaxes(0, 2).swapaxes(0, 1)
     Ps = P.swapaxes(0, 2).swapaxes(0, 1)
 
-    pose = np.empty(
-        (cfg["batch_size"], num_outputs * cfg["num_joints"] * 3), dtype=X.dtype
-    )
+    pose = np.empty((batchsize, num_outputs * cfg["num_joints"] * 3), dtype=X.dtype)
     pose[:, 0::3] = Xs.reshape(batchsize, -1)
     pose[:, 1::3] = Ys.reshape(batchsize, -1)
     pose[:, 2::3] = Ps.reshape(batchsize, -1)
@@ -220,7 +225,7 @@ def setup_GPUpose_prediction(cfg, allow_growth=False):
         tf.float32, shape=[cfg["batch_size"], None, None, 3]
     )
     net_heads = PoseNetFactory.create(cfg).inference(inputs)
-    outputs = [net_heads["pose"]]
+    outputs = [net_heads["poses"]]
 
     restorer = tf.compat.v1.train.Saver()
 
@@ -244,6 +249,19 @@ def extract_GPUprediction(outputs, cfg):
     return outputs[0]
 
 
+def format_GPUprediction(pose, batchsize):
+    """Flatten graph-side poses into (batchsize, num_joints * num_outputs * 3) rows
+    of x, y and likelihood.
+
+    Frozen graphs exported for DLC-Live and OpenVINO output the legacy
+    (batchsize * num_joints, 3) arrays in y, x, likelihood order instead;
+    these are reordered first.
+    """
+    if pose.ndim == 2:
+        pose = pose[:, [1, 0, 2]]
+    return np.reshape(pose, (batchsize, -1))
+
+
 def setup_openvino_pose_prediction(cfg, device):
     sess = OpenVINOSession(cfg, device)
     return sess, sess.input_name, [sess.output_name]
@@ -59,6 +59,21 @@ def extract_cnn_outputmulti(outputs_np, cfg):
     return scmap, locref, paf
 
 
+def _group_peaks(peak_inds_in_batch, n_samples, n_bodyparts):
+    """Sort peaks by (sample, body part) and return the sorted order,
+    the number of peaks and the segment offsets per (sample, body part)."""
+    samples = peak_inds_in_batch[:, 0].astype(np.int64)
+    bpts = peak_inds_in_batch[:, 3].astype(np.int64)
+    # Channels beyond the body parts (e.g., identity) are not grouped
+    valid = np.flatnonzero(bpts < n_bodyparts)
+    keys = samples[valid] * n_bodyparts + bpts[valid]
+    order = valid[np.argsort(keys, kind="stable")]
+    counts = np.bincount(keys, minlength=n_samples * n_bodyparts)
+    offsets = np.cumsum(counts) - counts
+    shape = n_samples, n_bodyparts
+    return order, counts.reshape(shape), offsets.reshape(shape)
+
+
 def compute_edge_costs(
     pafs, peak_inds_in_batch, graph, paf_inds, n_bodyparts, n_points=10, n_decimals=3,
 ):
@@ -68,42 +83,36 @@ def compute_edge_costs(
     peak_inds_in_batch[:, 2] = np.clip(peak_inds_in_batch[:, 2], 0, w - 1)
 
     n_samples = pafs.shape[0]
-    sample_inds = []
-    edge_inds = []
-    all_edges = []
-    all_peaks = []
-    for i in range(n_samples):
-        samples_i = peak_inds_in_batch[:, 0] == i
-        peak_inds = peak_inds_in_batch[samples_i, 1:]
-        if not np.any(peak_inds):
-            continue
-        peaks = peak_inds[:, :2]
-        bpt_inds = peak_inds[:, 2]
-        idx = np.arange(peaks.shape[0])
-        idx_per_bpt = {j: idx[bpt_inds == j].tolist() for j in range(n_bodyparts)}
-        edges = []
-        for k, (s, t) in zip(paf_inds, graph):
-            inds_s = idx_per_bpt[s]
-            inds_t = idx_per_bpt[t]
-            if not (inds_s and inds_t):
-                continue
-            candidate_edges = ((i, j) for i in inds_s for j in inds_t)
-            edges.extend(candidate_edges)
-            edge_inds.extend([k] * len(inds_s) * len(inds_t))
-        if not edges:
-            continue
-        sample_inds.extend([i] * len(edges))
-        all_edges.extend(edges)
-        all_peaks.append(peaks[np.asarray(edges)])
-    if not all_peaks:
+    order, counts, offsets = _group_peaks(peak_inds_in_batch, n_samples, n_bodyparts)
+    # Samples whose peaks are all at the origin of body part 0 are ignored
+    nonzero = np.any(peak_inds_in_batch[:, 1:], axis=1)
+    has_peaks = np.bincount(
+        peak_inds_in_batch[:, 0], weights=nonzero, minlength=n_samples,
+    )[:n_samples] > 0
+    counts[~has_peaks] = 0
+
+    # Candidate edges are laid out sample by sample, then edge by edge,
+    # so that each cost matrix is a contiguous segment of the flat arrays.
+    src, tgt = np.asarray(graph, dtype=np.int64).reshape((-1, 2)).T
+    n_edges = len(src)
+    n_sources = counts[:, src]
+    n_targets = counts[:, tgt]
+    n_pairs = (n_sources * n_targets).ravel()
+    n_total = n_pairs.sum()
+    if not n_total:
         return [dict() for _ in range(n_samples)]
 
-    sample_inds = np.asarray(sample_inds, dtype=np.int32)
-    edge_inds = np.asarray(edge_inds, dtype=np.int32)
-    all_edges = np.asarray(all_edges, dtype=np.int32)
-    all_peaks = np.concatenate(all_peaks)
-    vecs_s = all_peaks[:, 0]
-    vecs_t = all_peaks[:, 1]
+    starts = np.cumsum(n_pairs) - n_pairs
+    segments = np.repeat(np.arange(n_pairs.size), n_pairs)
+    within = np.arange(n_total) - starts[segments]
+    n_targets_ = n_targets.ravel()[segments]
+    sample_inds, edge_pos = np.divmod(segments, n_edges)
+    inds_s = order[offsets[sample_inds, src[edge_pos]] + within // n_targets_]
+    inds_t = order[offsets[sample_inds, tgt[edge_pos]] + within % n_targets_]
+    edge_inds = np.asarray(paf_inds, dtype=np.int64)[edge_pos]
+
+    vecs_s = peak_inds_in_batch[inds_s, 1:3]
+    vecs_t = peak_inds_in_batch[inds_t, 1:3]
     vecs = vecs_t - vecs_s
     lengths = np.linalg.norm(vecs, axis=1).astype(np.float32)
     lengths += np.spacing(1, dtype=np.float32)
@@ -122,20 +131,20 @@ def compute_edge_costs(
     np.round(affinities, decimals=n_decimals, out=affinities)
     np.round(lengths, decimals=n_decimals, out=lengths)
 
-    # Form cost matrices
+    # Form cost matrices from the segment offsets
     all_costs = []
+    n_sources = n_sources.ravel()
+    n_targets = n_targets.ravel()
     for i in range(n_samples):
-        samples_i_mask = sample_inds == i
         costs = dict()
-        for k in paf_inds:
-            edges_k_mask = edge_inds == k
-            idx = np.flatnonzero(samples_i_mask & edges_k_mask)
-            s, t = all_edges[idx].T
-            n_sources = np.unique(s).size
-            n_targets = np.unique(t).size
+        for n, k in enumerate(paf_inds):
+            seg = i * n_edges + n
+            start = starts[seg]
+            stop = start + n_pairs[seg]
+            shape = (n_sources[seg], n_targets[seg]) if n_pairs[seg] else (0, 0)
             costs[k] = dict()
-            costs[k]["m1"] = affinities[idx].reshape((n_sources, n_targets))
-            costs[k]["distance"] = lengths[idx].reshape((n_sources, n_targets))
+            costs[k]["m1"] = affinities[start:stop].reshape(shape)
+            costs[k]["distance"] = lengths[start:stop].reshape(shape)
         all_costs.append(costs)
 
     return all_costs
@@ -173,24 +182,22 @@ def compute_peaks_and_costs(
     if n_id_channels:
         ids = np.round(scmaps[s, r, c, -n_id_channels:], n_decimals)
 
+    # Split the peaks, sorted by (sample, body part), into per-frame lists
+    order, counts, _ = _group_peaks(peak_inds_in_batch, n_samples, n_bodyparts)
+    splits = np.cumsum(counts.ravel())[:-1]
+    xy = np.split(pos[order], splits)
+    p = np.split(prob[order], splits)
+    if n_id_channels:
+        id_ = np.split(ids[order], splits)
+
     peaks_and_costs = []
     for i in range(n_samples):
-        xy = []
-        p = []
-        id_ = []
-        samples_i_mask = peak_inds_in_batch[:, 0] == i
-        for j in range(n_bodyparts):
-            bpts_j_mask = peak_inds_in_batch[:, 3] == j
-            idx = np.flatnonzero(samples_i_mask & bpts_j_mask)
-            xy.append(pos[idx])
-            p.append(prob[idx])
-            if n_id_channels:
-                id_.append(ids[idx])
-        dict_ = {"coordinates": (xy,), "confidence": p}
+        sl = slice(i * n_bodyparts, (i + 1) * n_bodyparts)
+        dict_ = {"coordinates": (xy[sl],), "confidence": p[sl]}
         if costs is not None:
             dict_["costs"] = costs[i]
         if n_id_channels:
-            dict_["identity"] = id_
+            dict_["identity"] = id_[sl]
         peaks_and_costs.append(dict_)
 
     return peaks_and_costs
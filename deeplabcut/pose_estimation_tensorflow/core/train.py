@@ -14,7 +14,6 @@ https://github.com/eldar/pose-tensorflow
 import argparse
 import logging
 import os
-import threading
 from pathlib import Path
 
 import tensorflow as tf
@@ -23,6 +22,10 @@ tf.compat.v1.disable_eager_execution()
 import tf_slim as slim
 
 from deeplabcut.pose_estimation_tensorflow.config import load_config
+from deeplabcut.pose_estimation_tensorflow.core.loader import (
+    BatchLoader,
+    MultiProcessBatchLoader,
+)
 from deeplabcut.pose_estimation_tensorflow.datasets import (
     Batch,
     PoseDatasetFactory,
@@ -76,20 +79,21 @@ def setup_preloading(batch_spec):
     return batch, enqueue_op, placeholders
 
 
-def load_and_enqueue(sess, enqueue_op, coord, dataset, placeholders):
-    while not coord.should_stop():
-        batch_np = dataset.next_batch()
-        food = {pl: batch_np[name] for (name, pl) in placeholders.items()}
-        sess.run(enqueue_op, feed_dict=food)
-
+def start_preloading(sess, enqueue_op, dataset, placeholders, num_workers=0):
+    """Start feeding batches into the input queue in the background.
 
-def start_preloading(sess, enqueue_op, dataset, placeholders):
+    Batches are produced by the calling process if ``num_workers`` is 0,
+    and by as many worker processes otherwise.
+    """
     coord = tf.compat.v1.train.Coordinator()
-    t = threading.Thread(
-        target=load_and_enqueue, args=(sess, enqueue_op, coord, dataset, placeholders),
-    )
-    t.start()
-    return coord, t
+    if num_workers > 0:
+        loader = MultiProcessBatchLoader(
+            sess, enqueue_op, dataset, placeholders, coord, num_workers
+        )
+    else:
+        loader = BatchLoader(sess, enqueue_op, dataset, placeholders, coord)
+    loader.start()
+    return coord, loader
 
 
 def get_optimizer(loss_op, cfg):
@@ -213,7 +217,13 @@ def train(
     else:
         sess = tf.compat.v1.Session()
 
-    coord, thread = start_preloading(sess, enqueue_op, dataset, placeholders)
+    coord, loader = start_preloading(
+        sess,
+        enqueue_op,
+        dataset,
+        placeholders,
+        num_workers=cfg.get("num_loader_workers", 0),
+    )
     train_writer = tf.compat.v1.summary.FileWriter(cfg["log_dir"], sess.graph)
 
     if cfg.get("freezeencoder", False):
@@ -279,8 +289,11 @@ def train(
             average_loss = cum_loss / display_iters
             cum_loss = 0.0
             logging.info(
-                "iteration: {} loss: {} lr: {}".format(
-                    it, "{0:.4f}".format(average_loss), current_lr
+                "iteration: {} loss: {} lr: {} loader stall: {:.2f}s".format(
+                    it,
+                    "{0:.4f}".format(average_loss),
+                    current_lr,
+                    loader.pop_stall_time(),
                 )
             )
             lrf.write("{}, {:.5f}, {}\n".format(it, average_loss, current_lr))
@@ -292,9 +305,8 @@ def train(
             saver.save(sess, model_name, global_step=it)
 
     lrf.close()
+    loader.stop()
     sess.close()
-    coord.request_stop()
-    coord.join([thread])
     # return to original path.
     os.chdir(str(start_path))
 
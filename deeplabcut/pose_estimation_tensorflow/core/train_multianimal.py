@@ -112,7 +112,13 @@ def train(
     else:
         sess = tf.compat.v1.Session()
 
-    coord, thread = start_preloading(sess, enqueue_op, dataset, placeholders)
+    coord, loader = start_preloading(
+        sess,
+        enqueue_op,
+        dataset,
+        placeholders,
+        num_workers=cfg.get("num_loader_workers", 0),
+    )
     train_writer = tf.compat.v1.summary.FileWriter(cfg["log_dir"], sess.graph)
     learning_rate, train_op, tstep = get_optimizer(total_loss, cfg)
 
@@ -173,13 +179,14 @@ def train(
 
         if it % display_iters == 0 and it > start_iter:
             logging.info(
-                "iteration: {} loss: {} scmap loss: {} locref loss: {} limb loss: {} lr: {}".format(
+                "iteration: {} loss: {} scmap loss: {} locref loss: {} limb loss: {} lr: {} loader stall: {:.2f}s".format(
                     it,
                     "{0:.4f}".format(cumloss / display_iters),
                     "{0:.4f}".format(partloss / display_iters),
                     "{0:.4f}".format(locrefloss / display_iters),
                     "{0:.4f}".format(pwloss / display_iters),
                     current_lr,
+                    loader.pop_stall_time(),
                 )
             )
 
@@ -204,9 +211,8 @@ def train(
 
     lrf.close()
 
+    loader.stop()
     sess.close()
-    coord.request_stop()
-    coord.join([thread])
 
     # return to original path.
     os.chdir(str(start_path))
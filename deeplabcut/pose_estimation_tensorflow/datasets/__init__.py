@@ -13,6 +13,7 @@ from .pose_scalecrop import ScalecropPoseDataset
 from .pose_imgaug import ImgaugPoseDataset
 from .pose_tensorpack import TensorpackPoseDataset
 from .pose_multianimal_imgaug import MAImgaugPoseDataset
+from .image_cache import ImageCache
 from .utils import Batch
 
 
@@ -23,5 +24,6 @@ __all__ = [
     "ImgaugPoseDataset",
     "TensorpackPoseDataset",
     "MAImgaugPoseDataset",
+    "ImageCache",
     "Batch",
 ]
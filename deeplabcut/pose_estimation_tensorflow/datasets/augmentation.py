@@ -121,3 +121,12 @@ def update_crop_size(pipeline, width, height):
     if not aug:
         return
     aug[0].size = width, height
+
+
+def update_resize(pipeline, height, width):
+    aug = pipeline.find_augmenters_by_name("resize")
+    if not aug:
+        return
+    aug[0].size, aug[0].size_order = aug[0]._handle_size_arg(
+        {"height": height, "width": width}, False
+    )
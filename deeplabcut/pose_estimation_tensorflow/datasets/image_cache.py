@@ -0,0 +1,187 @@
+"""
+DeepLabCut2.2 Toolbox (deeplabcut.org)
+© A. & M. Mathis Labs
+https://github.com/DeepLabCut/DeepLabCut
+
+Please see AUTHORS for contributors.
+https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+Licensed under GNU Lesser General Public License v3.0
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from deeplabcut.utils.auxfun_videos import imread
+
+
+SHARED_MEMORY_DIR = "/dev/shm"
+
+
+class ImageCache:
+    """Least recently used cache of decoded training images.
+
+    Images are decoded once and kept in memory until the byte budget is
+    exceeded, at which point the least recently used ones are evicted.
+    If a cache directory is given, decoded images are also written there as
+    .npy files and memory-mapped; processes sharing that directory then decode
+    every image only once and share its pages through the OS. The directory
+    is subject to the same byte budget: once full, further images are only
+    held in the memory of the process. The size of the directory is tracked as
+    images are written, and only rescanned every ``rescan_every`` writes to
+    account for the files of other processes, which may thus briefly overrun
+    the budget. As every memory map holds a file
+    descriptor, at most ``max_files`` images are memory-mapped at once.
+    Cached images are read-only; copy them before modifying them in place.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Maximal number of bytes of images held by the cache.
+
+    cache_dir : str, optional
+        Directory where decoded images are stored and memory-mapped from.
+        By default, images are only held in the memory of the process.
+
+    shared : bool, optional (default=False)
+        If True and no ``cache_dir`` is given, decoded images are stored in a
+        new shared-memory directory, removed along with the cache; pass its
+        :attr:`cache_dir` on to the loader workers to share the images.
+
+    max_files : int, optional (default=512)
+        Maximal number of images memory-mapped at once.
+
+    rescan_every : int, optional (default=64)
+        Number of images written to the cache directory between two scans
+        of its size.
+    """
+
+    def __init__(
+        self, max_bytes, cache_dir=None, shared=False, max_files=512, rescan_every=64
+    ):
+        self.max_bytes = int(max_bytes)
+        self.max_files = int(max_files)
+        self.rescan_every = int(rescan_every)
+        if cache_dir is None and shared:
+            root = SHARED_MEMORY_DIR
+            if not os.path.isdir(root):
+                root = tempfile.gettempdir()
+            cache_dir = tempfile.mkdtemp(prefix="dlc_image_cache_", dir=root)
+            # Deleted once the cache is garbage collected, or at exit at the latest
+            weakref.finalize(self, shutil.rmtree, cache_dir, ignore_errors=True)
+        self.cache_dir = cache_dir
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._n_mapped = 0
+        self._dir_full = False
+        self._dir_bytes = None
+        self._n_writes = 0
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        """Build the cache configured in a pose_cfg, or return None if disabled."""
+        max_bytes = cfg.get("image_cache_bytes", 0)
+        if not max_bytes:
+            return None
+        return cls(
+            max_bytes,
+            cache_dir=cfg.get("image_cache_dir"),
+            shared=cfg.get("image_cache_shared", False),
+        )
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, path):
+        return path in self._images
+
+    def _file(self, path):
+        # Images modified on disk get a new entry
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, name + ".npy")
+
+    def _dir_nbytes(self):
+        nbytes = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                try:
+                    nbytes += entry.stat().st_size
+                except FileNotFoundError:  # Renamed by another process
+                    pass
+        return nbytes
+
+    def _dir_bytes_estimate(self):
+        if self._dir_bytes is None or self._n_writes >= self.rescan_every:
+            self._dir_bytes = self._dir_nbytes()
+            self._n_writes = 0
+        return self._dir_bytes
+
+    def _load(self, path):
+        if self.cache_dir is None:
+            image = imread(path, mode="skimage")
+            image.setflags(write=False)
+            return image
+        file = self._file(path)
+        if not os.path.isfile(file):
+            image = imread(path, mode="skimage")
+            if (
+                self._dir_full
+                or self._dir_bytes_estimate() + image.nbytes > self.max_bytes
+            ):
+                self._dir_full = True
+                image.setflags(write=False)
+                return image
+            # Write then rename, so that other processes never see partial files
+            fd, temp = tempfile.mkstemp(dir=self.cache_dir, suffix=".npy")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, image)
+            os.replace(temp, file)
+            self._dir_bytes += os.path.getsize(file)
+            self._n_writes += 1
+        return np.load(file, mmap_mode="r")
+
+    def imread(self, path):
+        """Return the decoded uint8 image stored at ``path``.
+
+        Parameters
+        ----------
+        path : str
+            Full path to the image.
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only image of shape (height, width, 3).
+        """
+        image = self._images.get(path)
+        if image is not None:
+            self._images.move_to_end(path)
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = self._load(path)
+        if image.nbytes <= self.max_bytes:
+            self._images[path] = image
+            self.nbytes += image.nbytes
+            self._n_mapped += isinstance(image, np.memmap)
+            while self.nbytes > self.max_bytes or self._n_mapped > self.max_files:
+                # Dropping the last reference to a memmap closes its file
+                _, evicted = self._images.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self._n_mapped -= isinstance(evicted, np.memmap)
+        return image
+
+    def clear(self):
+        """Evict all images; files in the cache directory are kept."""
+        self._images.clear()
+        self.nbytes = 0
+        self._n_mapped = 0
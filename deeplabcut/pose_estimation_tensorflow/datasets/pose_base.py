@@ -11,12 +11,14 @@ Licensed under GNU Lesser General Public License v3.0
 
 import abc
 import numpy as np
+from .image_cache import ImageCache
 
 
 class BasePoseDataset(metaclass=abc.ABCMeta):
     # TODO Finish implementing actual abstract class
     def __init__(self, cfg):
         self.cfg = cfg
+        self.image_cache = ImageCache.from_cfg(cfg)
 
     @abc.abstractmethod
     def load_dataset(self):
@@ -75,6 +75,9 @@ class ImgaugPoseDataset(BasePoseDataset):
                 cfg.get("motion_blur_params", {"k": 7, "angle": (-90, 90)})
             )
 
+        # Augmentation pipelines, keyed by apply_prob
+        self._pipelines = dict()
+
         print("Batch Size is %d" % self.batch_size)
 
     def load_dataset(self):
@@ -289,7 +292,23 @@ class ImgaugPoseDataset(BasePoseDataset):
                     iaa.CropAndPad(percent=(-crop_by, crop_by), keep_size=False),
                 )
             )
-            pipeline.add(iaa.Resize({"height": height, "width": width}))
+            pipeline.add(
+                iaa.Resize({"height": height, "width": width}, name="resize")
+            )
+        return pipeline
+
+    def get_augmentation_pipeline(self, height, width, apply_prob=0.5):
+        """Return the augmentation pipeline resizing images to (height, width).
+
+        The pipeline is built once per ``apply_prob``; only its output size is
+        updated on subsequent calls.
+        """
+        pipeline = self._pipelines.get(apply_prob)
+        if pipeline is None:
+            pipeline = self.build_augmentation_pipeline(height, width, apply_prob)
+            self._pipelines[apply_prob] = pipeline
+        else:
+            augmentation.update_resize(pipeline, height, width)
         return pipeline
 
     def get_batch(self):
@@ -331,9 +350,11 @@ class ImgaugPoseDataset(BasePoseDataset):
             im_file = data_item.im_path
 
             logging.debug("image %s", im_file)
-            image = imread(
-                os.path.join(self.cfg["project_path"], im_file), mode="skimage"
-            )
+            im_path = os.path.join(self.cfg["project_path"], im_file)
+            if self.image_cache is None:
+                image = imread(im_path, mode="skimage")
+            else:
+                image = self.image_cache.imread(im_path)
 
             if self.has_gt:
                 joints = data_item.joints
@@ -404,7 +425,7 @@ class ImgaugPoseDataset(BasePoseDataset):
                 target_size,
             ) = self.get_batch()
 
-            pipeline = self.build_augmentation_pipeline(
+            pipeline = self.get_augmentation_pipeline(
                 height=target_size[0], width=target_size[1], apply_prob=0.5
             )
 
@@ -412,7 +433,8 @@ class ImgaugPoseDataset(BasePoseDataset):
                 images=batch_images, keypoints=batch_joints
             )
 
-            image_shape = np.array(batch_images).shape[1:3]
+            # All images are resized to the target size
+            image_shape = batch_images[0].shape[:2]
 
             batch_joints_valid = []
             joint_ids_valid = []
@@ -443,7 +465,8 @@ class ImgaugPoseDataset(BasePoseDataset):
             #    im = kps.draw_on_image(batch_images[i])
             #    imageio.imwrite('some_location/augmented/'+str(i)+'.png', im)
 
-            batch = {Batch.inputs: np.array(batch_images).astype(np.float64)}
+            # Placeholders are float32; convert once, without an intermediate copy.
+            batch = {Batch.inputs: np.asarray(batch_images, dtype=np.float32)}
             if self.has_gt:
                 scmap_update = self.get_scmap_update(
                     joint_ids_valid, batch_joints_valid, data_items, sm_size, image_shape
@@ -26,6 +26,35 @@ from deeplabcut.utils.conversioncode import robust_split_path
 from math import sqrt
 
 
+def _window_pixels(mins, maxs):
+    """Enumerate the pixels of rectangular windows on a grid.
+
+    Parameters
+    ----------
+    mins, maxs : numpy.ndarray
+        Inclusive (x, y) bounds of the windows, of shape (n_windows, 2).
+
+    Returns
+    -------
+    windows, rows, cols : numpy.ndarray
+        Window index and coordinates of every pixel, window after window.
+    """
+    widths = np.maximum(maxs[:, 0] - mins[:, 0] + 1, 0)
+    heights = np.maximum(maxs[:, 1] - mins[:, 1] + 1, 0)
+    sizes = widths * heights
+    windows = np.repeat(np.arange(sizes.size), sizes)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    rows = mins[windows, 1] + offsets // widths[windows]
+    cols = mins[windows, 0] + offsets % widths[windows]
+    return windows, rows, cols
+
+
+def _last_occurrences(keys):
+    """Return the indices of the last occurrence of every distinct key."""
+    _, inds = np.unique(keys[::-1], return_index=True)
+    return keys.size - 1 - inds
+
+
 @PoseDatasetFactory.register("multi-animal-imgaug")
 class MAImgaugPoseDataset(BasePoseDataset):
     def __init__(self, cfg):
@@ -261,9 +290,11 @@ class MAImgaugPoseDataset(BasePoseDataset):
             im_file = data_item.im_path
 
             logging.debug("image %s", im_file)
-            image = imread(
-                os.path.join(self.cfg["project_path"], im_file), mode="skimage"
-            )
+            im_path = os.path.join(self.cfg["project_path"], im_file)
+            if self.image_cache is None:
+                image = imread(im_path, mode="skimage")
+            else:
+                image = self.image_cache.imread(im_path)
             if self.has_gt:
                 Joints = data_item.joints
                 kpts = np.zeros((self._n_kpts * self._n_animals, 2))
@@ -353,8 +384,7 @@ class MAImgaugPoseDataset(BasePoseDataset):
             batch_images, batch_joints = self.pipeline(
                 images=batch_images, keypoints=batch_joints
             )
-            batch_images = np.asarray(batch_images)
-            image_shape = batch_images.shape[1:3]
+            image_shape = batch_images[0].shape[:2]
             # Discard keypoints whose coordinates lie outside the cropped image
             batch_joints_valid = []
             joint_ids_valid = []
@@ -391,7 +421,7 @@ class MAImgaugPoseDataset(BasePoseDataset):
                         os.path.join(self.cfg["project_path"], str(i) + ".png"), im
                     )
 
-            batch = {Batch.inputs: batch_images.astype(np.float64)}
+            batch = {Batch.inputs: np.asarray(batch_images, dtype=np.float32)}
             if self.has_gt:
                 targetmaps = self.get_targetmaps_update(
                     joint_ids_valid,
@@ -445,6 +475,7 @@ class MAImgaugPoseDataset(BasePoseDataset):
         half_stride = stride // 2
         dist_thresh = float(self.cfg["pos_dist_thresh"] * scale)
         num_idchannel = self.cfg.get("num_idchannel", 0)
+        weigh_only_present_joints = self.cfg["weigh_only_present_joints"]
 
         num_joints = self.cfg["num_joints"]
 
@@ -456,7 +487,7 @@ class MAImgaugPoseDataset(BasePoseDataset):
 
         partaffinityfield_shape = *size, self.cfg["num_limbs"] * 2
         partaffinityfield_map = np.zeros(partaffinityfield_shape)
-        if self.cfg["weigh_only_present_joints"]:
+        if weigh_only_present_joints:
             partaffinityfield_mask = np.zeros(partaffinityfield_shape)
             locref_mask = np.zeros(locref_size)
         else:
@@ -464,32 +495,31 @@ class MAImgaugPoseDataset(BasePoseDataset):
             locref_mask = np.ones(locref_size)
 
         height, width = size
-        grid = np.mgrid[:height, :width].transpose((1, 2, 0))
-        xx = np.expand_dims(grid[..., 1], axis=2)
-        yy = np.expand_dims(grid[..., 0], axis=2)
 
-        # Produce score maps and location refinement fields
+        # Produce score maps and location refinement fields,
+        # only visiting the pixels in the window around every keypoint.
         coords_sm = np.round((coords - half_stride) / stride).astype(int)
         mins = np.round(np.maximum(coords_sm - dist_thresh - 1, 0)).astype(int)
         maxs = np.round(
             np.minimum(coords_sm + dist_thresh + 1, [width - 1, height - 1])
         ).astype(int)
-        dx = coords[:, 0] - xx * stride - half_stride
-        dx_ = dx * locref_scale
-        dy = coords[:, 1] - yy * stride - half_stride
-        dy_ = dy * locref_scale
+        n, yy, xx = _window_pixels(mins, maxs)
+        dx = coords[n, 0] - xx * stride - half_stride
+        dy = coords[n, 1] - yy * stride - half_stride
         dist = dx ** 2 + dy ** 2
-        mask1 = dist <= dist_thresh_sq
-        mask2 = (xx >= mins[:, 0]) & (xx <= maxs[:, 0])
-        mask3 = (yy >= mins[:, 1]) & (yy <= maxs[:, 1])
-        mask = mask1 & mask2 & mask3
-        for n, ind in enumerate(np.concatenate(joint_id).tolist()):
-            mask_ = mask[..., n]
-            scmap[mask_, ind] = 1
-            if self.cfg["weigh_only_present_joints"]:
-                locref_mask[mask_, [ind * 2 + 0, ind * 2 + 1]] = 1.0
-            locref_map[mask_, ind * 2 + 0] = dx_[mask_, n]
-            locref_map[mask_, ind * 2 + 1] = dy_[mask_, n]
+        mask = dist <= dist_thresh_sq
+        n, yy, xx, dx, dy = n[mask], yy[mask], xx[mask], dx[mask], dy[mask]
+        inds = np.concatenate(joint_id)[n]
+        scmap[yy, xx, inds] = 1
+        if weigh_only_present_joints:
+            locref_mask[yy, xx, inds * 2 + 0] = 1.0
+            locref_mask[yy, xx, inds * 2 + 1] = 1.0
+        # Where windows of the same bodypart overlap, the last keypoint wins.
+        last = _last_occurrences(
+            np.ravel_multi_index((yy, xx, inds), (height, width, num_joints))
+        )
+        locref_map[yy[last], xx[last], inds[last] * 2 + 0] = dx[last] * locref_scale
+        locref_map[yy[last], xx[last], inds[last] * 2 + 1] = dy[last] * locref_scale
 
         if num_idchannel > 0:
             coordinateoffset = 0
@@ -499,28 +529,31 @@ class MAImgaugPoseDataset(BasePoseDataset):
                 for i, id_ in enumerate(data_item.joints)
                 if id_ < num_idchannel
             ]
+            id_channels = np.full(len(coords), -1)
             for i, person_id in idx:
-                joint_ids = joint_id[i]
-                n_joints = joint_ids.size
-                if n_joints:
-                    inds = np.arange(n_joints) + coordinateoffset
-                    mask_ = mask[..., inds].any(axis=2)
-                    scmap[mask_, person_id + num_joints] = 1
+                n_joints = joint_id[i].size
+                id_channels[coordinateoffset : coordinateoffset + n_joints] = (
+                    person_id + num_joints
+                )
                 coordinateoffset += n_joints
-
+            channels = id_channels[n]
+            valid = channels >= 0
+            scmap[yy[valid], xx[valid], channels[valid]] = 1
+
+        # Produce part affinity fields. The segment parameters are computed
+        # first, and each segment is then rasterized within its bounding box.
+        pafwidth = self.cfg["pafwidth"]
+        segments = []
         coordinateoffset = 0  # the offset based on
-        y, x = np.rollaxis(grid * stride + half_stride, 2)
         for person_id in range(len(joint_id)):
             joint_ids = joint_id[person_id].tolist()
             if len(joint_ids) >= 2:  # there is a possible edge
+                # Index of the first occurrence of every bodypart
+                first = {bp: i for i, bp in reversed(list(enumerate(joint_ids)))}
                 for l, (bp1, bp2) in enumerate(self.cfg["partaffinityfield_graph"]):
-                    try:
-                        ind1 = joint_ids.index(bp1)
-                    except ValueError:
-                        continue
-                    try:
-                        ind2 = joint_ids.index(bp2)
-                    except ValueError:
+                    ind1 = first.get(bp1)
+                    ind2 = first.get(bp2)
+                    if ind1 is None or ind2 is None:
                         continue
                     j_x, j_y = coords[ind1 + coordinateoffset]
                     linkedj_x, linkedj_y = coords[ind2 + coordinateoffset]
@@ -532,32 +565,59 @@ class MAImgaugPoseDataset(BasePoseDataset):
                             Dx * j_x + Dy * j_y,
                             Dx * linkedj_x + Dy * linkedj_y,
                         ]  # in-line with direct axis
-                        d1lowerboundary = min(d1)
-                        d1upperboundary = max(d1)
                         d2mid = j_y * Dx - j_x * Dy  # orthogonal direction
-
-                        distance_along = Dx * x + Dy * y
-                        distance_across = (
-                            ((y * Dx - x * Dy) - d2mid)
-                            * 1.0
-                            / self.cfg["pafwidth"]
-                            * scale
-                        )
-
-                        mask1 = (distance_along >= d1lowerboundary) & (
-                            distance_along <= d1upperboundary
+                        segments.append(
+                            (
+                                l,
+                                Dx,
+                                Dy,
+                                min(d1),
+                                max(d1),
+                                d2mid,
+                                min(j_x, linkedj_x),
+                                min(j_y, linkedj_y),
+                                max(j_x, linkedj_x),
+                                max(j_y, linkedj_y),
+                            )
                         )
-                        distance_across_abs = np.abs(distance_across)
-                        mask2 = distance_across_abs <= 1
-                        mask = mask1 & mask2
-                        temp = 1 - distance_across_abs[mask]
-                        if self.cfg["weigh_only_present_joints"]:
-                            partaffinityfield_mask[mask, [l * 2 + 0, l * 2 + 1]] = 1.0
-                        partaffinityfield_map[mask, l * 2 + 0] = Dx * temp
-                        partaffinityfield_map[mask, l * 2 + 1] = Dy * temp
-
             coordinateoffset += len(joint_ids)  # keeping track of the blocks
 
+        if segments:
+            segments = np.array(segments)
+            limbs = segments[:, 0].astype(int)
+            Dx, Dy, d1lower, d1upper, d2mid = segments[:, 1:6].T
+            # Pixels farther than pafwidth / scale from a segment are masked out;
+            # pad the boxes by one more cell to be safe from rounding.
+            pad = pafwidth / scale
+            box_mins = np.floor((segments[:, 6:8] - pad - half_stride) / stride) - 1
+            box_maxs = np.ceil((segments[:, 8:10] + pad - half_stride) / stride) + 1
+            box_mins = np.maximum(box_mins, 0).astype(int)
+            box_maxs = np.minimum(box_maxs, [width - 1, height - 1]).astype(int)
+            s, yy, xx = _window_pixels(box_mins, box_maxs)
+            y = yy * stride + half_stride
+            x = xx * stride + half_stride
+            distance_along = Dx[s] * x + Dy[s] * y
+            distance_across = (
+                ((y * Dx[s] - x * Dy[s]) - d2mid[s]) * 1.0 / pafwidth * scale
+            )
+            mask1 = (distance_along >= d1lower[s]) & (distance_along <= d1upper[s])
+            distance_across_abs = np.abs(distance_across)
+            mask2 = distance_across_abs <= 1
+            mask = mask1 & mask2
+            s, yy, xx = s[mask], yy[mask], xx[mask]
+            temp = 1 - distance_across_abs[mask]
+            channels = limbs[s] * 2
+            if weigh_only_present_joints:
+                partaffinityfield_mask[yy, xx, channels + 0] = 1.0
+                partaffinityfield_mask[yy, xx, channels + 1] = 1.0
+            # Where limbs of different animals overlap, the last animal wins.
+            last = _last_occurrences(
+                np.ravel_multi_index((yy, xx, channels), partaffinityfield_shape)
+            )
+            yy, xx, channels = yy[last], xx[last], channels[last]
+            partaffinityfield_map[yy, xx, channels + 0] = Dx[s[last]] * temp[last]
+            partaffinityfield_map[yy, xx, channels + 1] = Dy[s[last]] * temp[last]
+
         weights = self.compute_scmap_weights(scmap.shape, joint_id)
         return (
             scmap,
@@ -8,9 +8,11 @@ https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
 Licensed under GNU Lesser General Public License v3.0
 """
 
+import multiprocessing
 import os
 import pickle
 import shutil
+import sys
 from collections import defaultdict
 from copy import deepcopy
 from tqdm import tqdm
@@ -169,6 +171,69 @@ def _calc_within_between_pafs(
     return (within_train, within_test), (between_train, between_test)
 
 
+def _score_assemblies(assemblies, ground_truth):
+    """Fraction of unassembled keypoints and identity purity in every image."""
+    scores = np.full((len(ground_truth), 2), np.nan)
+    for i, gt in enumerate(tqdm(ground_truth)):
+        gt = gt[~np.isnan(gt).any(axis=1)]
+        if len(np.unique(gt[:, 2])) < 2:  # Only consider frames with 2+ animals
+            continue
+
+        # Count the number of unassembled bodyparts
+        n_dets = len(gt)
+        animals = assemblies.get(i)
+        if animals is None:
+            if n_dets:
+                scores[i, 0] = 1
+        else:
+            animals = [
+                np.c_[animal.data, np.ones(animal.data.shape[0]) * n]
+                for n, animal in enumerate(animals)
+            ]
+            hyp = np.concatenate(animals)
+            hyp = hyp[~np.isnan(hyp).any(axis=1)]
+            scores[i, 0] = max(0, (n_dets - hyp.shape[0]) / n_dets)
+            neighbors = _find_closest_neighbors(gt[:, :2], hyp[:, :2])
+            valid = neighbors != -1
+            id_gt = gt[valid, 2]
+            id_hyp = hyp[neighbors[valid], -1]
+            mat = contingency_matrix(id_gt, id_hyp)
+            purity = mat.max(axis=0).sum() / mat.sum()
+            scores[i, 1] = purity
+    return scores
+
+
+def _benchmark_paf_graph(context, paf):
+    """Assemble and score all images with a single PAF graph."""
+    ass = context["assembler"]
+    ass.paf_inds = paf
+    ass.assemble(chunk_size=0)
+    oks = [
+        evaluate_assembly(ass.assemblies, ass_true_dict, **context["oks_kwargs"])
+        for ass_true_dict in context["ass_true_dicts"]
+    ]
+    if context["split_inds"] is None:
+        oks = oks[0]
+    scores = _score_assemblies(ass.assemblies, context["ground_truth"])
+    return scores, oks, ass.assemblies, ass.unique
+
+
+# Assembler, with its cached links, and ground truth of the graph workers
+_graph_context = None
+
+
+def _init_graph_worker(context):
+    global _graph_context
+    _graph_context = context
+    # Only the parent reports progress; the bars of concurrent workers
+    # would otherwise be interleaved. Errors are sent back to the parent.
+    sys.stderr = open(os.devnull, "w")
+
+
+def _benchmark_paf_graph_worker(paf):
+    return _benchmark_paf_graph(_graph_context, paf)
+
+
 def _benchmark_paf_graphs(
     config,
     inference_cfg,
@@ -182,7 +247,21 @@ def _benchmark_paf_graphs(
     margin=0,
     symmetric_kpts=None,
     split_inds=None,
+    n_processes=1,
+    patience=None,
 ):
+    """Assemble and score animals with every candidate PAF graph.
+
+    Detections are parsed, and the best links of every edge extracted, only once;
+    with ``n_processes`` > 1, graphs are then benchmarked by a pool of that many
+    spawned worker processes, so calling scripts must be guarded by
+    ``if __name__ == "__main__":``. Every worker receives its own copy of the
+    parsed detections, the cached links and the ground truth, so memory use grows
+    about ``n_processes`` times over that of a serial benchmark.
+    Graphs are benchmarked in order of increasing
+    size; with ``patience``, the sweep stops once that many successive graphs
+    failed to improve the score, (1 - miss) * purity, over the best graph so far.
+    """
     metadata = data.pop("metadata")
     multi_bpts_orig = auxfun_multianimal.extractindividualsandbodyparts(config)[2]
     multi_bpts = [j for j in metadata["all_joints_names"] if j in multi_bpts_orig]
@@ -199,6 +278,7 @@ def _benchmark_paf_graphs(
         min_affinity=inference_cfg.get("pafthreshold", 0.1),
         add_discarded=add_discarded,
         identity_only=identity_only,
+        cache_links=True,
     )
     if calibration_file:
         ass.calibrate(calibration_file)
@@ -232,70 +312,71 @@ def _benchmark_paf_graphs(
     ids = np.vectorize(map_.get)(idx.get_level_values("individuals").to_numpy())
     ground_truth = np.insert(ground_truth, 2, ids, axis=2)
 
+    if split_inds is not None:
+        ass_true_dicts = [
+            {k: v for k, v in ass_true_dict.items() if k in inds} for inds in split_inds
+        ]
+    else:
+        ass_true_dicts = [ass_true_dict]
+    context = {
+        "assembler": ass,
+        "ground_truth": ground_truth,
+        "ass_true_dicts": ass_true_dicts,
+        "split_inds": split_inds,
+        "oks_kwargs": {
+            "oks_sigma": oks_sigma,
+            "margin": margin,
+            "symmetric_kpts": symmetric_kpts,
+            "greedy_matching": inference_cfg.get("greedy_oks", False),
+        },
+    }
+
     # Assemble animals on the full set of detections
     paf_inds = sorted(paf_inds, key=len)
     n_graphs = len(paf_inds)
+    n_workers = max(1, min(n_processes, n_graphs))
+    pool = None
+    if n_workers > 1:
+        # Links are extracted once here rather than by every worker
+        ass.cache_links(sorted(set().union(*paf_inds)))
+        # TensorFlow, likely loaded by the caller, is not fork-safe
+        pool = multiprocessing.get_context("spawn").Pool(
+            n_workers, initializer=_init_graph_worker, initargs=(context,)
+        )
+    # Without early stopping, all graphs are benchmarked at once
+    n_per_round = n_graphs if patience is None else n_workers
     all_scores = []
     all_metrics = []
     all_assemblies = []
-    for j, paf in enumerate(paf_inds, start=1):
-        print(f"Graph {j}|{n_graphs}")
-        ass.paf_inds = paf
-        ass.assemble()
-        all_assemblies.append((ass.assemblies, ass.unique, ass.metadata["imnames"]))
-        if split_inds is not None:
-            oks = []
-            for inds in split_inds:
-                ass_gt = {k: v for k, v in ass_true_dict.items() if k in inds}
-                oks.append(
-                    evaluate_assembly(
-                        ass.assemblies,
-                        ass_gt,
-                        oks_sigma,
-                        margin=margin,
-                        symmetric_kpts=symmetric_kpts,
-                        greedy_matching=inference_cfg.get("greedy_oks", False),
-                    )
-                )
-        else:
-            oks = evaluate_assembly(
-                ass.assemblies,
-                ass_true_dict,
-                oks_sigma,
-                margin=margin,
-                symmetric_kpts=symmetric_kpts,
-                greedy_matching=inference_cfg.get("greedy_oks", False),
-            )
-        all_metrics.append(oks)
-        scores = np.full((len(image_paths), 2), np.nan)
-        for i, imname in enumerate(tqdm(image_paths)):
-            gt = ground_truth[i]
-            gt = gt[~np.isnan(gt).any(axis=1)]
-            if len(np.unique(gt[:, 2])) < 2:  # Only consider frames with 2+ animals
-                continue
-
-            # Count the number of unassembled bodyparts
-            n_dets = len(gt)
-            animals = ass.assemblies.get(i)
-            if animals is None:
-                if n_dets:
-                    scores[i, 0] = 1
+    best_score = -np.inf
+    n_stale = 0
+    try:
+        for start in range(0, n_graphs, n_per_round):
+            graphs = paf_inds[start : start + n_per_round]
+            if pool is None:
+                results = (_benchmark_paf_graph(context, paf) for paf in graphs)
             else:
-                animals = [
-                    np.c_[animal.data, np.ones(animal.data.shape[0]) * n]
-                    for n, animal in enumerate(animals)
-                ]
-                hyp = np.concatenate(animals)
-                hyp = hyp[~np.isnan(hyp).any(axis=1)]
-                scores[i, 0] = max(0, (n_dets - hyp.shape[0]) / n_dets)
-                neighbors = _find_closest_neighbors(gt[:, :2], hyp[:, :2])
-                valid = neighbors != -1
-                id_gt = gt[valid, 2]
-                id_hyp = hyp[neighbors[valid], -1]
-                mat = contingency_matrix(id_gt, id_hyp)
-                purity = mat.max(axis=0).sum() / mat.sum()
-                scores[i, 1] = purity
-        all_scores.append((scores, paf))
+                results = pool.map(_benchmark_paf_graph_worker, graphs)
+            for paf, (scores, oks, assemblies, unique) in zip(graphs, results):
+                all_scores.append((scores, paf))
+                all_metrics.append(oks)
+                all_assemblies.append((assemblies, unique, ass.metadata["imnames"]))
+                with np.errstate(invalid="ignore"):
+                    score = (1 - np.nanmean(scores[:, 0])) * np.nanmean(scores[:, 1])
+                print(f"Graph {len(all_scores)}|{n_graphs}: score={score:.3f}")
+                if score > best_score:
+                    best_score = score
+                    n_stale = 0
+                else:
+                    n_stale += 1
+                    if patience is not None and n_stale >= patience:
+                        break
+            if patience is not None and n_stale >= patience:
+                print("The score plateaued; larger graphs are not benchmarked.")
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
 
     dfs = []
     for score, inds in all_scores:
@@ -383,6 +464,8 @@ def cross_validate_paf_graphs(
     n_graphs=10,
     paf_inds=None,
     symmetric_kpts=None,
+    n_processes=1,
+    patience=None,
 ):
     cfg = auxiliaryfunctions.read_config(config)
     inf_cfg = auxiliaryfunctions.read_plainconfig(inference_config)
@@ -427,6 +510,8 @@ def cross_validate_paf_graphs(
         symmetric_kpts=symmetric_kpts,
         calibration_file=calibration_file,
         split_inds=[metadata["data"]["trainIndices"], metadata["data"]["testIndices"],],
+        n_processes=n_processes,
+        patience=patience,
     )
     # Select optimal PAF graph
     df = results[1]
@@ -434,7 +519,8 @@ def cross_validate_paf_graphs(
     pose_config = inference_config.replace("inference_cfg", "pose_cfg")
     if not overwrite_config:
         shutil.copy(pose_config, pose_config.replace(".yaml", "_old.yaml"))
-    inds = list(paf_inds[size_opt])
+    # Graphs were benchmarked by increasing size, possibly not all of them
+    inds = list(results[0][size_opt][1])
     auxiliaryfunctions.edit_config(
         pose_config, {"paf_best": [int(ind) for ind in inds]}
     )
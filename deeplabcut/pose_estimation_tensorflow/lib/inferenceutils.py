@@ -10,22 +10,23 @@ Licensed under GNU Lesser General Public License v3.0
 import heapq
 import itertools
 import multiprocessing
-import networkx as nx
 import numpy as np
 import operator
 import pandas as pd
 import pickle
 import warnings
-from collections import defaultdict
-from dataclasses import dataclass
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from deeplabcut.utils.detection_store import DetectionStore
 from math import sqrt, erf
+from numba import jit
 from scipy.optimize import linear_sum_assignment
 from scipy.spatial import cKDTree
 from scipy.spatial.distance import pdist, cdist
 from scipy.special import softmax
 from scipy.stats import gaussian_kde, chi2
 from tqdm import tqdm
-from typing import Tuple
+from typing import NamedTuple, Tuple
 
 
 def _conv_square_to_condensed_indices(ind_row, ind_col, n):
@@ -37,11 +38,78 @@ def _conv_square_to_condensed_indices(ind_row, ind_col, n):
     return n * ind_col - ind_col * (ind_col + 1) // 2 + ind_row - 1 - ind_col
 
 
+@jit(nopython=True)
+def _find_root(parent, node):
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]  # Path halving
+        node = parent[node]
+    return node
+
+
+@jit(nopython=True)
+def _label_components(edges, n_nodes):
+    """Union-find labelling of the connected components of an undirected graph.
+
+    Components are numbered in order of first appearance of their nodes
+    in ``edges``, i.e., in the order networkx.connected_components yields them.
+
+    Parameters
+    ----------
+    edges: numpy.ndarray
+        (n_edges, 2) array of node indices.
+
+    n_nodes: int
+        Number of nodes; must be greater than all indices in ``edges``.
+
+    Returns
+    -------
+    labels: numpy.ndarray
+        Component of every node, -1 for nodes absent from ``edges``.
+
+    sizes: numpy.ndarray
+        Number of nodes in every component.
+    """
+    parent = np.arange(n_nodes)
+    for k in range(edges.shape[0]):
+        root1 = _find_root(parent, edges[k, 0])
+        root2 = _find_root(parent, edges[k, 1])
+        if root1 != root2:
+            parent[max(root1, root2)] = min(root1, root2)
+    labels = np.full(n_nodes, -1)
+    root_labels = np.full(n_nodes, -1)
+    sizes = np.zeros(n_nodes, dtype=np.int64)
+    n_components = 0
+    for k in range(edges.shape[0]):
+        for node in edges[k]:
+            if labels[node] != -1:
+                continue
+            root = _find_root(parent, node)
+            if root_labels[root] == -1:
+                root_labels[root] = n_components
+                n_components += 1
+            labels[node] = root_labels[root]
+            sizes[labels[node]] += 1
+    return labels, sizes[:n_components]
+
+
+@jit(nopython=True)
+def _greedy_suppression(overlap, order, max_overlap):
+    suppressed = np.zeros(overlap.shape[0], dtype=np.bool_)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        for j in range(overlap.shape[1]):
+            if overlap[i, j] >= max_overlap:
+                suppressed[j] = True
+    return keep
+
+
 Position = Tuple[float, float]
 
 
-@dataclass(frozen=True)
-class Joint:
+class Joint(NamedTuple):
     pos: Position
     confidence: float = 1.0
     label: int = None
@@ -50,6 +118,8 @@ class Joint:
 
 
 class Link:
+    __slots__ = ("j1", "j2", "affinity", "_length")
+
     def __init__(self, j1, j2, affinity=1):
         self.j1 = j1
         self.j2 = j2
@@ -82,10 +152,13 @@ class Link:
 
 
 class Assembly:
+    __slots__ = ("data", "_affinity", "_n_links", "_links", "_visible", "_idx", "_dict")
+
     def __init__(self, size):
         self.data = np.full((size, 4), np.nan)
         self.confidence = 0  # 0 by default, overwritten otherwise with `add_joint`
         self._affinity = 0
+        self._n_links = 0
         self._links = []
         self._visible = set()
         self._idx = set()
@@ -158,7 +231,7 @@ class Assembly:
 
     @property
     def n_links(self):
-        return len(self._links)
+        return self._n_links
 
     def intersection_with(self, other):
         x11, y11, x21, y21 = self.extent
@@ -199,6 +272,7 @@ class Assembly:
             self._dict = {
                 "data": self.data.copy(),
                 "_affinity": self._affinity,
+                "_n_links": self._n_links,
                 "_links": self._links.copy(),
                 "_visible": self._visible.copy(),
                 "_idx": self._idx.copy(),
@@ -206,6 +280,7 @@ class Assembly:
         i1, i2 = link.idx
         if i1 in self._idx and i2 in self._idx:
             self._affinity += link.affinity
+            self._n_links += 1
             self._links.append(link)
             return False
         if link.j1.label in self._visible and link.j2.label in self._visible:
@@ -213,9 +288,20 @@ class Assembly:
         self.add_joint(link.j1)
         self.add_joint(link.j2)
         self._affinity += link.affinity
+        self._n_links += 1
         self._links.append(link)
         return True
 
+    def _restore(self):
+        """Revert to the state saved by the last ``add_link(..., store_dict=True)``."""
+        for name, value in self._dict.items():
+            setattr(self, name, value)
+        self._dict = dict()
+
+    def _update_from(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
+
     def calc_pairwise_distances(self):
         return pdist(self.xy, metric="sqeuclidean")
 
@@ -240,6 +326,7 @@ class Assembler:
         add_discarded=False,
         window_size=0,
         method="m1",
+        cache_links=False,
     ):
         self.data = data
         self.metadata = self.parse_metadata(self.data)
@@ -251,12 +338,10 @@ class Assembler:
         self.min_affinity = min_affinity
         self.min_n_links = min_n_links
         self.max_overlap = max_overlap
-        self._has_identity = "identity" in self[0]
-        if identity_only and not self._has_identity:
-            warnings.warn(
-                "The network was not trained with identity; setting `identity_only` to False."
-            )
-        self.identity_only = identity_only & self._has_identity
+        self.identity_only = identity_only
+        self._has_identity = None
+        if self.metadata["imnames"]:
+            self._set_has_identity("identity" in self[0])
         self.nan_policy = nan_policy
         self.force_fusion = force_fusion
         self.add_discarded = add_discarded
@@ -265,10 +350,17 @@ class Assembler:
         self.graph = graph or self.metadata["paf_graph"]
         self.paf_inds = paf_inds or self.metadata["paf"]
         self._gamma = 0.01
-        self._trees = dict()
+        # Only the trees of the last `window_size` frames are ever queried
+        self._trees = deque(maxlen=window_size)
         self.safe_edge = False
         self._kde = None
-        self.assemblies = dict()
+        # Detections and best links of every (frame, edge) are kept across calls
+        # to `assemble`, so that assembling with other PAF graphs (typically
+        # subsets of one another) does not parse and match them again.
+        # Links depend on the previous frames' if `window_size` > 0, so they
+        # are then always extracted anew.
+        self._cache = {"joints": dict(), "links": dict()} if cache_links else None
+        self.assemblies = Assemblies()
         self.unique = dict()
 
     def __getitem__(self, item):
@@ -278,6 +370,14 @@ class Assembler:
     def n_keypoints(self):
         return self.metadata["num_joints"]
 
+    def _set_has_identity(self, has_identity):
+        self._has_identity = has_identity
+        if self.identity_only and not has_identity:
+            warnings.warn(
+                "The network was not trained with identity; setting `identity_only` to False."
+            )
+        self.identity_only = self.identity_only & has_identity
+
     def calibrate(self, train_data_file):
         df = pd.read_hdf(train_data_file)
         try:
@@ -304,6 +404,8 @@ class Assembler:
             kde.mean = mu
             self._kde = kde
             self.safe_edge = True
+            if self._cache is not None:
+                self._cache["links"].clear()  # Links are weighted by the calibration
         except np.linalg.LinAlgError:
             # Covariance matrix estimation fails due to numerical singularities
             warnings.warn(
@@ -377,75 +479,132 @@ class Assembler:
     def extract_best_links(self, joints_dict, costs, trees=None):
         links = []
         for ind in self.paf_inds:
-            s, t = self.graph[ind]
-            dets_s = joints_dict.get(s, None)
-            dets_t = joints_dict.get(t, None)
-            if dets_s is None or dets_t is None:
-                continue
-            if ind not in costs:
-                continue
-            lengths = costs[ind]["distance"]
-            if np.isinf(lengths).all():
-                continue
-            aff = costs[ind][self.method].copy()
-            aff[np.isnan(aff)] = 0
+            links.extend(self._extract_edge_links(ind, joints_dict, costs, trees))
+        return links
 
-            if trees:
-                vecs = np.vstack(
-                    [[*det_s.pos, *det_t.pos] for det_s in dets_s for det_t in dets_t]
-                )
-                dists = []
-                for n, tree in enumerate(trees, start=1):
-                    d, _ = tree.query(vecs)
-                    dists.append(np.exp(-self._gamma * n * d))
-                w = np.mean(dists, axis=0)
-                aff *= w.reshape(aff.shape)
-
-            if self.greedy:
-                conf = np.asarray(
-                    [
-                        [det_s.confidence * det_t.confidence for det_t in dets_t]
-                        for det_s in dets_s
-                    ]
-                )
-                rows, cols = np.where(
-                    (conf >= self.pcutoff * self.pcutoff) & (aff >= self.min_affinity)
-                )
-                candidates = sorted(
-                    zip(rows, cols, aff[rows, cols], lengths[rows, cols]),
-                    key=lambda x: x[2],
-                    reverse=True,
-                )
-                i_seen = set()
-                j_seen = set()
-                for i, j, w, l in candidates:
-                    if i not in i_seen and j not in j_seen:
-                        i_seen.add(i)
-                        j_seen.add(j)
-                        links.append(Link(dets_s[i], dets_t[j], w))
-                        if len(i_seen) == self.max_n_individuals:
-                            break
-            else:  # Optimal keypoint pairing
-                inds_s = sorted(
-                    range(len(dets_s)), key=lambda x: dets_s[x].confidence, reverse=True
-                )[: self.max_n_individuals]
-                inds_t = sorted(
-                    range(len(dets_t)), key=lambda x: dets_t[x].confidence, reverse=True
-                )[: self.max_n_individuals]
-                keep_s = [
-                    ind for ind in inds_s if dets_s[ind].confidence >= self.pcutoff
-                ]
-                keep_t = [
-                    ind for ind in inds_t if dets_t[ind].confidence >= self.pcutoff
+    def _extract_edge_links(self, ind, joints_dict, costs, trees=None):
+        links = []
+        s, t = self.graph[ind]
+        dets_s = joints_dict.get(s, None)
+        dets_t = joints_dict.get(t, None)
+        if dets_s is None or dets_t is None:
+            return links
+        if ind not in costs:
+            return links
+        lengths = costs[ind]["distance"]
+        if np.isinf(lengths).all():
+            return links
+        aff = costs[ind][self.method].copy()
+        aff[np.isnan(aff)] = 0
+
+        if trees:
+            vecs = np.vstack(
+                [[*det_s.pos, *det_t.pos] for det_s in dets_s for det_t in dets_t]
+            )
+            dists = []
+            for n, tree in enumerate(trees, start=1):
+                d, _ = tree.query(vecs)
+                dists.append(np.exp(-self._gamma * n * d))
+            w = np.mean(dists, axis=0)
+            aff *= w.reshape(aff.shape)
+
+        if self.greedy:
+            conf = np.asarray(
+                [
+                    [det_s.confidence * det_t.confidence for det_t in dets_t]
+                    for det_s in dets_s
                 ]
-                aff = aff[np.ix_(keep_s, keep_t)]
-                rows, cols = linear_sum_assignment(aff, maximize=True)
-                for row, col in zip(rows, cols):
-                    w = aff[row, col]
-                    if w >= self.min_affinity:
-                        links.append(Link(dets_s[keep_s[row]], dets_t[keep_t[col]], w))
+            )
+            rows, cols = np.where(
+                (conf >= self.pcutoff * self.pcutoff) & (aff >= self.min_affinity)
+            )
+            candidates = sorted(
+                zip(rows, cols, aff[rows, cols], lengths[rows, cols]),
+                key=lambda x: x[2],
+                reverse=True,
+            )
+            i_seen = set()
+            j_seen = set()
+            for i, j, w, l in candidates:
+                if i not in i_seen and j not in j_seen:
+                    i_seen.add(i)
+                    j_seen.add(j)
+                    links.append(Link(dets_s[i], dets_t[j], w))
+                    if len(i_seen) == self.max_n_individuals:
+                        break
+        else:  # Optimal keypoint pairing
+            inds_s = sorted(
+                range(len(dets_s)), key=lambda x: dets_s[x].confidence, reverse=True
+            )[: self.max_n_individuals]
+            inds_t = sorted(
+                range(len(dets_t)), key=lambda x: dets_t[x].confidence, reverse=True
+            )[: self.max_n_individuals]
+            keep_s = [ind for ind in inds_s if dets_s[ind].confidence >= self.pcutoff]
+            keep_t = [ind for ind in inds_t if dets_t[ind].confidence >= self.pcutoff]
+            aff = aff[np.ix_(keep_s, keep_t)]
+            rows, cols = linear_sum_assignment(aff, maximize=True)
+            for row, col in zip(rows, cols):
+                w = aff[row, col]
+                if w >= self.min_affinity:
+                    links.append(Link(dets_s[keep_s[row]], dets_t[keep_t[col]], w))
+        return links
+
+    def _weigh_links(self, links):
+        if self._kde:
+            for link in links[::-1]:
+                p = max(self.calc_link_probability(link), 0.001)
+                link.affinity *= p
+                if link.affinity < self.min_affinity:
+                    links.remove(link)
         return links
 
+    def _get_joints(self, data_dict, ind_frame):
+        if self._cache is None:
+            return list(self._flatten_detections(data_dict))
+        joints = self._cache["joints"].get(ind_frame)
+        if joints is None:
+            joints = list(self._flatten_detections(data_dict))
+            self._cache["joints"][ind_frame] = joints
+        return joints
+
+    def _get_edge_links(self, ind, joints_dict, costs, ind_frame):
+        key = ind_frame, ind
+        links = self._cache["links"].get(key)
+        if links is None:
+            links = self._weigh_links(self._extract_edge_links(ind, joints_dict, costs))
+            self._cache["links"][key] = links
+        return links
+
+    def _extract_links(self, joints_dict, costs, trees, ind_frame):
+        if self._cache is None or self.window_size:
+            return self._weigh_links(self.extract_best_links(joints_dict, costs, trees))
+        links = []
+        for ind in self.paf_inds:
+            links.extend(self._get_edge_links(ind, joints_dict, costs, ind_frame))
+        return links
+
+    def cache_links(self, paf_inds=None):
+        """Extract the best links of some edges in all frames ahead of assembly.
+
+        Only relevant if the assembler was built with ``cache_links=True``.
+        Links that are already cached are not extracted again.
+
+        Parameters
+        ----------
+        paf_inds: list of int, optional
+            Indices of the edges in the graph; by default, the current ``paf_inds``.
+        """
+        if self._cache is None or self.window_size:
+            return
+        if paf_inds is None:
+            paf_inds = self.paf_inds
+        for i, data_dict in enumerate(self):
+            bag = defaultdict(list)
+            for joint in self._get_joints(data_dict, i):
+                bag[joint.label].append(joint)
+            for ind in paf_inds:
+                self._get_edge_links(ind, bag, data_dict["costs"], i)
+
     def _fill_assembly(self, assembly, lookup, assembled, safe_edge, nan_policy):
         stack = []
         visited = set()
@@ -493,7 +652,7 @@ class Assembler:
                         pass
                 else:
                     heapq.heappush(tabu, (d - d_old, next(counter), best))
-                    assembly.__dict__.update(assembly._dict)
+                    assembly._restore()
                 assembly._dict = dict()
             else:
                 assembly.add_link(best)
@@ -510,25 +669,33 @@ class Assembler:
         assembled = set()
 
         # Fill the subsets with unambiguous, complete individuals
-        G = nx.Graph([link.idx for link in links])
-        for chain in nx.connected_components(G):
-            if len(chain) == self.n_multibodyparts:
-                edges = [tuple(sorted(edge)) for edge in G.edges(chain)]
+        if links:
+            edges = np.asarray([link.idx for link in links], dtype=np.int64)
+            labels, sizes = _label_components(edges, edges.max() + 1)
+            links_per_component = defaultdict(list)
+            for link, (i, j) in zip(links, edges):
+                # Only links stored in (smaller, larger) index order are added,
+                # as in the former networkx-based implementation.
+                if i < j:
+                    links_per_component[labels[i]].append(link)
+            for label in np.flatnonzero(sizes == self.n_multibodyparts):
                 assembly = Assembly(self.n_multibodyparts)
-                for link in links:
-                    i, j = link.idx
-                    if (i, j) in edges:
-                        success = assembly.add_link(link)
-                        if success:
-                            lookup[i].pop(j)
-                            lookup[j].pop(i)
+                for link in links_per_component[label]:
+                    success = assembly.add_link(link)
+                    if success:
+                        i, j = link.idx
+                        lookup[i].pop(j)
+                        lookup[j].pop(i)
                 assembled.update(assembly._idx)
                 assemblies.append(assembly)
 
         if len(assemblies) == self.max_n_individuals:
             return assemblies, assembled
 
-        for link in sorted(links, key=lambda x: x.affinity, reverse=True):
+        # Stable sort, by decreasing affinity
+        affinities = np.asarray([link.affinity for link in links], dtype=float)
+        for ind in np.argsort(-affinities, kind="stable"):
+            link = links[ind]
             if any(i in assembled for i in link.idx):
                 continue
             assembly = Assembly(self.n_multibodyparts)
@@ -593,14 +760,14 @@ class Assembler:
                     if len(assembly) != self.n_multibodyparts:
                         for i in assembly._idx:
                             store[i] = assembly
-                used = [link for assembly in assemblies for link in assembly._links]
-                unconnected = [link for link in links if link not in used]
+                used = {id(link) for assembly in assemblies for link in assembly._links}
+                unconnected = [link for link in links if id(link) not in used]
                 for link in unconnected:
                     i, j = link.idx
                     try:
                         if store[j] not in store[i]:
                             temp = store[i] + store[j]
-                            store[i].__dict__.update(temp.__dict__)
+                            store[i]._update_from(temp)
                             assemblies.remove(store[j])
                             for idx in store[j]._idx:
                                 store[idx] = store[i]
@@ -616,7 +783,7 @@ class Assembler:
         return assemblies, assembled
 
     def _assemble(self, data_dict, ind_frame):
-        joints = list(self._flatten_detections(data_dict))
+        joints = self._get_joints(data_dict, ind_frame)
         if not joints:
             return None, None
 
@@ -690,23 +857,18 @@ class Assembler:
                     assembled.update(ass._idx)
         else:
             trees = []
+            recent_trees = dict(self._trees)
             for j in range(1, self.window_size + 1):
-                tree = self._trees.get(ind_frame - j, None)
+                tree = recent_trees.get(ind_frame - j, None)
                 if tree is not None:
                     trees.append(tree)
 
-            links = self.extract_best_links(bag, data_dict["costs"], trees)
-            if self._kde:
-                for link in links[::-1]:
-                    p = max(self.calc_link_probability(link), 0.001)
-                    link.affinity *= p
-                    if link.affinity < self.min_affinity:
-                        links.remove(link)
+            links = self._extract_links(bag, data_dict["costs"], trees, ind_frame)
 
             if self.window_size >= 1 and links:
                 # Store selected edges for subsequent frames
                 vecs = np.vstack([link.to_vector() for link in links])
-                self._trees[ind_frame] = cKDTree(vecs)
+                self._trees.append((ind_frame, cKDTree(vecs)))
 
             assemblies, assembled_ = self.build_assemblies(links)
             assembled.update(assembled_)
@@ -729,15 +891,14 @@ class Assembler:
                 ]
             else:
                 scores = [ass._affinity for ass in assemblies]
-            lst = list(zip(scores, assemblies))
-            assemblies = []
-            while lst:
-                temp = max(lst, key=lambda x: x[0])
-                lst.remove(temp)
-                assemblies.append(temp[1])
-                for pair in lst[::-1]:
-                    if temp[1].intersection_with(pair[1]) >= self.max_overlap:
-                        lst.remove(pair)
+            if assemblies:
+                keep = _non_max_suppression(
+                    np.stack([ass.data for ass in assemblies]),
+                    [len(ass) for ass in assemblies],
+                    scores,
+                    self.max_overlap,
+                )
+                assemblies = [assemblies[i] for i in keep]
         if len(assemblies) > self.max_n_individuals:
             assemblies = sorted(assemblies, key=len, reverse=True)
             for assembly in assemblies[self.max_n_individuals :]:
@@ -773,36 +934,115 @@ class Assembler:
 
         return assemblies, unique
 
-    def assemble(self, chunk_size=1, n_processes=None):
-        self.assemblies = dict()
+    def feed(self, frame_index, data_dict):
+        """Assemble the detections of a single frame as soon as they are available.
+
+        This allows assembly (and tracking) to run alongside video inference,
+        without first holding all detections in memory. Frames should be fed
+        in increasing order so that temporal coherence (``window_size``) is
+        computed as in :meth:`assemble`.
+
+        Parameters
+        ----------
+        frame_index: int
+            Index of the frame in the video.
+
+        data_dict: dict
+            Detections of that frame, as output by
+            ``predict_multianimal.predict_batched_peaks_and_costs``.
+
+        Returns
+        -------
+        assemblies: list of Assembly or None
+
+        unique: numpy.ndarray or None
+            Coordinates and confidence of the unique body parts.
+        """
+        if self._has_identity is None:
+            self._set_has_identity("identity" in data_dict)
+        assemblies, unique = self._assemble(data_dict, frame_index)
+        if assemblies:
+            self.assemblies.add(frame_index, assemblies)
+        if unique is not None:
+            self.unique[frame_index] = unique
+        return assemblies, unique
+
+    def _get_state(self):
+        # Everything but the detections and the results, for worker processes
+        excluded = "data", "assemblies", "unique", "_trees", "_cache"
+        state = {k: v for k, v in self.__dict__.items() if k not in excluded}
+        # Frame names can be numerous and are not needed by workers
+        state["metadata"] = {
+            k: v for k, v in self.metadata.items() if k != "imnames"
+        }
+        return state
+
+    @classmethod
+    def _from_state(cls, state):
+        assembler = cls.__new__(cls)
+        assembler.__dict__.update(state)
+        assembler.data = None
+        assembler.assemblies = Assemblies()
+        assembler.unique = dict()
+        assembler._trees = deque(maxlen=assembler.window_size)
+        assembler._cache = None
+        return assembler
+
+    def _make_chunks(self, chunk_size):
+        imnames = self.metadata["imnames"]
+        state = self._get_state()
+        for start in range(0, len(imnames), chunk_size):
+            # Frames preceding the chunk seed the temporal coherence trees
+            first = max(0, start - self.window_size)
+            stop = min(start + chunk_size, len(imnames))
+            if isinstance(self.data, DetectionStore):
+                frames = self.data.path, imnames[first:stop]
+            else:
+                frames = [self[i] for i in range(first, stop)]
+            yield state, frames, first, start - first
+
+    def assemble(self, chunk_size=None, n_processes=None):
+        """Assemble individuals in all frames.
+
+        Parameters
+        ----------
+        chunk_size: int, optional (default=None)
+            Number of consecutive frames assembled by a worker process at a time.
+            If 0, frames are assembled serially in the current process.
+            By default, chunks of 100 frames are assembled in parallel if
+            ``window_size`` is 0, and frames are assembled serially otherwise
+            so that temporal coherence is preserved.
+
+        n_processes: int, optional (default=None)
+            Number of worker processes; by default, as many as there are CPUs.
+            Workers only receive the detections of their chunk (or the path
+            to the memory-mapped store they are read from) and send back arrays,
+            so this also works with the "spawn" start method.
+            With ``window_size`` > 0, each chunk is preceded by ``window_size``
+            frames used to rebuild the temporal context, so links may occasionally
+            differ from a serial assembly at chunk boundaries.
+        """
+        self.assemblies = Assemblies()
         self.unique = dict()
-        # Spawning (rather than forking) multiple processes does not
-        # work nicely with the GUI or interactive sessions.
-        # In that case, we fall back to the serial assembly.
-        if chunk_size == 0 or multiprocessing.get_start_method() == "spawn":
+        self._trees.clear()
+        if chunk_size is None:
+            chunk_size = 0 if self.window_size else 100
+        if chunk_size == 0:
             for i, data_dict in enumerate(tqdm(self)):
-                assemblies, unique = self._assemble(data_dict, i)
-                if assemblies:
-                    self.assemblies[i] = assemblies
-                if unique is not None:
-                    self.unique[i] = unique
+                self.feed(i, data_dict)
         else:
-            global wrapped  # Hack to make the function pickable
-
-            def wrapped(i):
-                return i, self._assemble(self[i], i)
-
             n_frames = len(self.metadata["imnames"])
             with multiprocessing.Pool(n_processes) as p:
                 with tqdm(total=n_frames) as pbar:
-                    for i, (assemblies, unique) in p.imap_unordered(
-                        wrapped, range(n_frames), chunksize=chunk_size
+                    for results in p.imap_unordered(
+                        _assemble_chunk, self._make_chunks(chunk_size)
                     ):
-                        if assemblies:
-                            self.assemblies[i] = assemblies
-                        if unique is not None:
-                            self.unique[i] = unique
-                        pbar.update()
+                        for i, arrays, unique in results:
+                            if arrays is not None:
+                                self.assemblies.add_arrays(i, *arrays)
+                            if unique is not None:
+                                self.unique[i] = unique
+                        pbar.update(len(results))
 
     @staticmethod
     def parse_metadata(data):
@@ -827,9 +1067,9 @@ class Assembler:
             ),
             fill_value=np.nan,
         )
-        for ind, assemblies in self.assemblies.items():
-            for n, assembly in enumerate(assemblies):
-                data[ind, n] = assembly.data
+        for ind in self.assemblies:
+            block = self.assemblies.data(ind)
+            data[ind, : len(block)] = block
         index = pd.MultiIndex.from_product(
             [
                 ["scorer"],
@@ -845,14 +1085,121 @@ class Assembler:
 
     def to_pickle(self, output_name):
         data = dict()
-        for ind, assemblies in self.assemblies.items():
-            data[ind] = [ass.data for ass in assemblies]
+        for ind in self.assemblies:
+            data[ind] = list(self.assemblies.data(ind))
         if self.unique:
             data["single"] = self.unique
         with open(output_name, "wb") as file:
             pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
 
 
+def _assemble_chunk(args):
+    """Assemble a contiguous range of frames in a worker process.
+
+    ``args`` holds the assembler's state, the frames' detections
+    (or a tuple with the path to a DetectionStore and the frame keys),
+    the index of the first frame, and the number of leading frames
+    only used to seed temporal coherence.
+    Assemblies are returned as compact arrays rather than Assembly objects.
+    """
+    state, frames, first, n_warmup = args
+    if isinstance(frames, tuple):
+        path, keys = frames
+        store = DetectionStore(path)
+        frames = (store[key] for key in keys)
+    assembler = Assembler._from_state(state)
+    results = []
+    for i, data_dict in enumerate(frames, start=first):
+        assemblies, unique = assembler.feed(i, data_dict)
+        if i < first + n_warmup:
+            continue
+        arrays = assembler.assemblies._frames.get(i)
+        results.append((i, arrays, unique))
+    return results
+
+
+def _non_max_suppression(block, lengths, scores, max_overlap):
+    """Greedy pose NMS over a (n_assemblies, n_bodyparts, 4) block.
+
+    Two assemblies overlap by the smallest fraction of their respective
+    keypoints lying within the intersection of their bounding boxes
+    (see ``Assembly.intersection_with``).
+    Returns the indices of the kept assemblies, by decreasing score.
+    """
+    xy = block[..., :2]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN slices
+        mins = np.nanmin(xy, axis=1)
+        maxs = np.nanmax(xy, axis=1)
+    lower = np.maximum(mins[:, None], mins[None])
+    upper = np.minimum(maxs[:, None], maxs[None])
+    valid = np.all(upper >= lower, axis=2)
+    lo = lower[:, :, None]
+    up = upper[:, :, None]
+    inside = np.all((xy[:, None] >= lo) & (xy[:, None] <= up), axis=3)
+    lengths = np.asarray(lengths)
+    frac = inside.sum(axis=2) / lengths[:, None]
+    overlap = np.where(valid, np.minimum(frac, frac.T), 0)
+    order = np.argsort(-np.asarray(scores, dtype=float), kind="stable")
+    return list(_greedy_suppression(overlap, order, max_overlap))
+
+
+class Assemblies(Mapping):
+    """Compact storage of the assemblies found in every frame.
+
+    Rather than keeping (millions of) Assembly objects alive, each frame is
+    stored as a (n_assemblies, n_bodyparts, 4) block, the affinity of each
+    assembly, and an integer link table with one (assembly, joint index,
+    joint index) row per link. Indexing a frame rebuilds lightweight
+    Assembly objects, without their links.
+    """
+
+    def __init__(self):
+        self._frames = dict()
+
+    def add(self, ind, assemblies):
+        links = [
+            (n, *link.idx) for n, assembly in enumerate(assemblies)
+            for link in assembly._links
+        ]
+        self.add_arrays(
+            ind,
+            np.stack([assembly.data for assembly in assemblies]),
+            np.asarray([assembly._affinity for assembly in assemblies], dtype=float),
+            np.asarray(links, dtype=np.int32).reshape((-1, 3)),
+        )
+
+    def add_arrays(self, ind, block, affinities, links):
+        self._frames[ind] = block, affinities, links
+
+    def data(self, ind):
+        """Return the (n_assemblies, n_bodyparts, 4) block of a frame."""
+        return self._frames[ind][0]
+
+    def links(self, ind):
+        return self._frames[ind][2]
+
+    def __getitem__(self, ind):
+        block, affinities, links = self._frames[ind]
+        n_links = np.bincount(links[:, 0], minlength=len(block))
+        assemblies = []
+        for data, affinity, n in zip(block, affinities, n_links):
+            assembly = Assembly.from_array(data)
+            assembly._affinity = affinity
+            assembly._n_links = n
+            assemblies.append(assembly)
+        return assemblies
+
+    def __iter__(self):
+        return iter(self._frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, ind):
+        return ind in self._frames
+
+
 def calc_object_keypoint_similarity(
     xy_pred, xy_true, sigma, margin=0, symmetric_kpts=None,
 ):
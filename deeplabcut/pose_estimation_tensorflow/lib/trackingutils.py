@@ -47,6 +47,84 @@ def calc_iou(bbox1, bbox2):
     )
 
 
+def calc_iou_matrix(bboxes1, bboxes2):
+    """Intersection over union of every pair of boxes.
+
+    Parameters
+    ----------
+    bboxes1, bboxes2 : array_like
+        Boxes in the form [x1, y1, x2, y2, ...], of shape (n, >=4) and (m, >=4).
+
+    Returns
+    -------
+    numpy.ndarray
+        Matrix of shape (n, m), as calc_iou would compute it pair by pair.
+    """
+    bboxes1 = np.asarray(bboxes1, dtype=float).reshape((len(bboxes1), -1))[:, None]
+    bboxes2 = np.asarray(bboxes2, dtype=float).reshape((len(bboxes2), -1))[None]
+    x1 = np.maximum(bboxes1[..., 0], bboxes2[..., 0])
+    y1 = np.maximum(bboxes1[..., 1], bboxes2[..., 1])
+    x2 = np.minimum(bboxes1[..., 2], bboxes2[..., 2])
+    y2 = np.minimum(bboxes1[..., 3], bboxes2[..., 3])
+    w = np.maximum(0, x2 - x1)
+    h = np.maximum(0, y2 - y1)
+    wh = w * h
+    return wh / (
+        (bboxes1[..., 2] - bboxes1[..., 0]) * (bboxes1[..., 3] - bboxes1[..., 1])
+        + (bboxes2[..., 2] - bboxes2[..., 0]) * (bboxes2[..., 3] - bboxes2[..., 1])
+        - wh
+    )
+
+
+def calc_similarity_matrix(params1, params2):
+    """Similarity of every pair of ellipses.
+
+    Parameters
+    ----------
+    params1, params2 : array_like
+        Ellipse parameters (x, y, width, height, theta), of shape (n, 5) and (m, 5).
+
+    Returns
+    -------
+    numpy.ndarray
+        Matrix of shape (n, m), as Ellipse.calc_similarity_with would compute it
+        pair by pair.
+    """
+    params1 = np.asarray(params1, dtype=float).reshape((-1, 5))[:, None]
+    params2 = np.asarray(params2, dtype=float).reshape((-1, 5))[None]
+    max_dist = np.maximum(
+        np.maximum(params1[..., 3], params1[..., 2]),
+        np.maximum(params2[..., 3], params2[..., 2]),
+    )
+    dist = np.sqrt(
+        (params1[..., 0] - params2[..., 0]) ** 2
+        + (params1[..., 1] - params2[..., 1]) ** 2
+    )
+    cost1 = 1 - np.minimum(dist / max_dist, 1)
+    cost2 = np.abs(np.cos(params1[..., 4] - params2[..., 4]))
+    return 0.8 * cost1 + 0.2 * cost2 * cost1
+
+
+def _kalman_predict(x, P, F, Q):
+    # Stacked version of filterpy's KalmanFilter.predict, without control input
+    x = F @ x
+    P = F @ P @ np.swapaxes(F, 1, 2) + Q
+    return x, P
+
+
+def _kalman_update(x, P, z, H, R):
+    # Stacked version of filterpy's KalmanFilter.update
+    y = z - H @ x
+    PHT = P @ np.swapaxes(H, 1, 2)
+    S = H @ PHT + R
+    SI = np.linalg.inv(S)
+    K = PHT @ SI
+    x = x + K @ y
+    I_KH = np.eye(x.shape[1]) - K @ H
+    P = I_KH @ P @ np.swapaxes(I_KH, 1, 2) + K @ R @ np.swapaxes(K, 1, 2)
+    return x, P, y, S, SI, K
+
+
 class BaseTracker:
     """Base class for a constant-velocity Kalman filter-based tracker."""
 
@@ -62,18 +140,106 @@ class BaseTracker:
         self.hit_streak = 0
 
     def update(self, z):
+        self._count_hit()
+        self.kf.update(self._to_measurement(z))
+
+    def predict(self):
+        self._constrain()
+        self.kf.predict()
+        self._count_step()
+        return self.state
+
+    @staticmethod
+    def update_many(trackers, measurements):
+        """Update several trackers at once.
+
+        Equivalent to calling ``update`` on every tracker, with the Kalman
+        filter equations evaluated on the stacked states of all trackers.
+
+        Parameters
+        ----------
+        trackers : list of BaseTracker
+            Trackers to update, whose filters all have the same dimensions.
+
+        measurements : list
+            Measurement of every tracker, as passed to ``update``.
+        """
+        if not len(trackers):
+            return
+        kfs = [tracker.kf for tracker in trackers]
+        z = np.stack(
+            [tracker._to_measurement(m) for tracker, m in zip(trackers, measurements)]
+        )
+        x, P, y, S, SI, K = _kalman_update(
+            np.stack([kf.x for kf in kfs]),
+            np.stack([kf.P for kf in kfs]),
+            z,
+            np.stack([kf.H for kf in kfs]),
+            np.stack([kf.R for kf in kfs]),
+        )
+        for n, (tracker, kf) in enumerate(zip(trackers, kfs)):
+            tracker._count_hit()
+            kf.x, kf.P, kf.y, kf.S, kf.SI, kf.K = x[n], P[n], y[n], S[n], SI[n], K[n]
+            kf.z = z[n].copy()
+            kf.x_post = kf.x.copy()
+            kf.P_post = kf.P.copy()
+            kf._log_likelihood = None
+            kf._likelihood = None
+            kf._mahalanobis = None
+
+    @staticmethod
+    def predict_many(trackers):
+        """Predict the next state of several trackers at once.
+
+        Equivalent to calling ``predict`` on every tracker, with the Kalman
+        filter equations evaluated on the stacked states of all trackers.
+
+        Parameters
+        ----------
+        trackers : list of BaseTracker
+            Trackers, whose filters all have the same dimensions.
+
+        Returns
+        -------
+        numpy.ndarray
+            Predicted states, one row per tracker.
+        """
+        if not len(trackers):
+            return np.empty((0, 0))
+        for tracker in trackers:
+            tracker._constrain()
+        kfs = [tracker.kf for tracker in trackers]
+        x, P = _kalman_predict(
+            np.stack([kf.x for kf in kfs]),
+            np.stack([kf.P for kf in kfs]),
+            np.stack([kf.F for kf in kfs]),
+            np.stack([kf.Q for kf in kfs]),
+        )
+        states = []
+        for n, (tracker, kf) in enumerate(zip(trackers, kfs)):
+            kf.x, kf.P = x[n], P[n]
+            kf.x_prior = kf.x.copy()
+            kf.P_prior = kf.P.copy()
+            tracker._count_step()
+            states.append(tracker.state)
+        return np.stack(states)
+
+    def _to_measurement(self, z):
+        return np.asarray(z, dtype=float).reshape((-1, 1))
+
+    def _constrain(self):
+        """Constrain the state before a prediction."""
+
+    def _count_hit(self):
         self.time_since_update = 0
         self.hits += 1
         self.hit_streak += 1
-        self.kf.update(z)
 
-    def predict(self):
-        self.kf.predict()
+    def _count_step(self):
         self.age += 1
         if self.time_since_update > 0:
             self.hit_streak = 0
         self.time_since_update += 1
-        return self.state
 
     @property
     def state(self):
@@ -183,6 +349,96 @@ class EllipseFitter:
             return el
         return None
 
+    def fit_many(self, xy):
+        """Fit ellipses to many poses at once.
+
+        Parameters
+        ----------
+        xy : array_like
+            Keypoint coordinates of shape (n_poses, n_bodyparts, 2);
+            non-finite keypoints are ignored.
+
+        Returns
+        -------
+        numpy.ndarray
+            Ellipse parameters (x, y, width, height, theta) of shape (n_poses, 5);
+            rows are NaN where no ellipse could be fitted, i.e. where ``fit``
+            would return None.
+        """
+        xy = np.asarray(xy, dtype=float)
+        params = np.full((len(xy), 5), np.nan)
+        if not xy.size:
+            return params
+        valid = np.isfinite(xy).all(axis=2)
+        n = valid.sum(axis=1)
+        enough = n >= 3
+        xy = np.where(valid[..., None], xy, 0)[enough]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.sd:
+                params[enough] = self._fit_error_many(
+                    xy, valid[enough], n[enough], self.sd
+                )
+            else:
+                params[enough] = self.calc_parameters_many(
+                    self._fit_many(xy, valid[enough])
+                )
+        params[np.isnan(params).any(axis=1)] = np.nan
+        return params
+
+    @staticmethod
+    def _fit_many(xy, valid):
+        # Batched _fit; missing keypoints are zeroed and carry no weight
+        x, y = xy[..., 0], xy[..., 1]
+        D1 = np.stack((x * x, x * y, y * y), axis=1)
+        D2 = np.stack((x, y, valid.astype(float)), axis=1)
+        S1 = D1 @ D1.transpose((0, 2, 1))
+        S2 = D1 @ D2.transpose((0, 2, 1))
+        S3 = D2 @ D2.transpose((0, 2, 1))
+        singular = ~(np.abs(np.linalg.det(S3)) > 0)
+        S3[singular] = np.eye(3)
+        T = -np.linalg.inv(S3) @ S2.transpose((0, 2, 1))
+        temp = S1 + S2 @ T
+        M = np.stack((temp[:, 2] * 0.5, -temp[:, 1], temp[:, 0] * 0.5), axis=1)
+        _, V = np.linalg.eig(M)
+        real = (np.imag(V) == 0).all(axis=(1, 2))
+        V = np.real(V)
+        cond = 4 * V[:, 0] * V[:, 2] - V[:, 1] ** 2
+        found = (cond > 0).any(axis=1) & real & ~singular
+        a1 = V[np.arange(len(V)), :, np.argmax(cond > 0, axis=1)]
+        a2 = (T @ a1[..., None])[..., 0]
+        coeffs = np.concatenate((a1, a2), axis=1)
+        coeffs[~found] = np.nan
+        return coeffs
+
+    @staticmethod
+    def _fit_error_many(xy, valid, n, sd):
+        # Batched _fit_error; missing keypoints are zeroed and carry no weight
+        mean = xy.sum(axis=1) / n[:, None]
+        xy = (xy - mean[:, None]) * valid[..., None]
+        cov = xy.transpose((0, 2, 1)) @ xy / (n - 1)[:, None, None]
+        E, V = np.linalg.eigh(cov)  # Returns the eigenvalues in ascending order
+        height, width = 2 * sd * np.sqrt(E.T)
+        rotation = np.arctan2(V[:, 1, 1], V[:, 0, 1]) % np.pi
+        return np.c_[mean, width, height, rotation]
+
+    @staticmethod
+    def calc_parameters_many(coeffs):
+        """Vectorized calc_parameters, for coefficients of shape (n_ellipses, 6)."""
+        a, b, c, d, f, g = np.asarray(coeffs, dtype=float).T
+        b = b * 0.5
+        d = d * 0.5
+        f = f * 0.5
+        x0 = (c * d - b * f) / (b * b - a * c)
+        y0 = (a * f - b * d) / (b * b - a * c)
+        num = 2 * (a * f * f + c * d * d + g * b * b - 2 * b * d * f - a * c * g)
+        den1 = (b * b - a * c) * (np.sqrt((a - c) ** 2 + 4 * b * b) - (a + c))
+        den2 = (b * b - a * c) * (-np.sqrt((a - c) ** 2 + 4 * b * b) - (a + c))
+        major = np.sqrt(num / den1)
+        minor = np.sqrt(num / den2)
+        phi = np.arctan(2 * b / (a - c)) / 2
+        phi = np.where(b == 0, 0, phi) + np.where(a < c, 0, np.pi / 2)
+        return np.c_[x0, y0, 2 * major, 2 * minor, phi]
+
     @staticmethod
     @jit(nopython=True)
     def _fit(x, y):
@@ -353,13 +609,12 @@ class BoxTracker(BaseTracker):
         self.kf.Q[4:, 4:] *= 0.01
         self.state = bbox
 
-    def update(self, bbox):
-        super().update(self.convert_bbox_to_z(bbox))
+    def _to_measurement(self, bbox):
+        return self.convert_bbox_to_z(bbox)
 
-    def predict(self):
+    def _constrain(self):
         if (self.kf.x[6] + self.kf.x[2]) <= 0:
             self.kf.x[6] *= 0.0
-        return super().predict()
 
     @property
     def state(self):
@@ -426,75 +681,46 @@ class SORTEllipse(SORTBase):
         self.n_frames += 1
 
         trackers = np.zeros((len(self.trackers), 6))
-        for i in range(len(trackers)):
-            trackers[i, :5] = self.trackers[i].predict()
+        if len(trackers):
+            trackers[:, :5] = EllipseTracker.predict_many(self.trackers)
         empty = np.isnan(trackers).any(axis=1)
         trackers = trackers[~empty]
         for ind in np.flatnonzero(empty)[::-1]:
             self.trackers.pop(ind)
 
-        ellipses = []
+        ellipses = self.fitter.fit_many(poses)
+        fitted = np.flatnonzero(~np.isnan(ellipses).any(axis=1))
+        ellipses = ellipses[fitted]
         pred_ids = []
-        for i, pose in enumerate(poses):
-            el = self.fitter.fit(pose)
-            if el is not None:
-                ellipses.append(el)
-                if identities is not None:
-                    pred_ids.append(mode(identities[i])[0][0])
+        if identities is not None:
+            pred_ids = [mode(identities[i])[0][0] for i in fitted]
         if not len(trackers):
             matches = np.empty((0, 2), dtype=int)
             unmatched_detections = np.arange(len(ellipses))
-            unmatched_trackers = np.empty((0, 6), dtype=int)
         else:
-            ellipses_trackers = [Ellipse(*t[:5]) for t in trackers]
-            cost_matrix = np.zeros((len(ellipses), len(ellipses_trackers)))
-            for i, el in enumerate(ellipses):
-                for j, el_track in enumerate(ellipses_trackers):
-                    cost = el.calc_similarity_with(el_track)
-                    if identities is not None:
-                        match = 2 if pred_ids[i] == self.trackers[j].id_ else 1
-                        cost *= match
-                    cost_matrix[i, j] = cost
+            cost_matrix = calc_similarity_matrix(ellipses, trackers[:, :5])
+            if identities is not None:
+                tracker_ids = [tracker.id_ for tracker in self.trackers]
+                cost_matrix *= np.where(
+                    np.equal.outer(pred_ids, tracker_ids), 2, 1
+                ).reshape(cost_matrix.shape)
             row_indices, col_indices = linear_sum_assignment(cost_matrix, maximize=True)
-            unmatched_detections = [
-                i for i, _ in enumerate(ellipses) if i not in row_indices
-            ]
-            unmatched_trackers = [
-                j for j, _ in enumerate(trackers) if j not in col_indices
+            low = cost_matrix[row_indices, col_indices] < self.iou_threshold
+            unmatched_detections = np.r_[
+                np.setdiff1d(np.arange(len(ellipses)), row_indices), row_indices[low]
             ]
-            matches = []
-            for row, col in zip(row_indices, col_indices):
-                val = cost_matrix[row, col]
-                # diff = val - cost_matrix
-                # diff[row, col] += val
-                # if (
-                #         val < self.iou_threshold
-                #         or np.any(diff[row] <= 0.2)
-                #         or np.any(diff[:, col] <= 0.2)
-                # ):
-                if val < self.iou_threshold:
-                    unmatched_detections.append(row)
-                    unmatched_trackers.append(col)
-                else:
-                    matches.append([row, col])
-            if not len(matches):
-                matches = np.empty((0, 2), dtype=int)
-            else:
-                matches = np.stack(matches)
-            unmatched_trackers = np.asarray(unmatched_trackers)
-            unmatched_detections = np.asarray(unmatched_detections)
-
-        animalindex = []
-        for t, tracker in enumerate(self.trackers):
-            if t not in unmatched_trackers:
-                ind = matches[matches[:, 1] == t, 0][0]
-                animalindex.append(ind)
-                tracker.update(ellipses[ind].parameters)
-            else:
-                animalindex.append(-1)
+            matches = np.c_[row_indices[~low], col_indices[~low]]
+
+        animalindex = [-1] * len(self.trackers)
+        for row, col in matches:
+            animalindex[col] = row
+        EllipseTracker.update_many(
+            [self.trackers[col] for col in matches[:, 1]],
+            ellipses[matches[:, 0]],
+        )
 
         for i in unmatched_detections:
-            trk = EllipseTracker(ellipses[i].parameters)
+            trk = EllipseTracker(ellipses[i])
             if identities is not None:
                 trk.id_ = mode(identities[i])[0][0]
             self.trackers.append(trk)
@@ -566,11 +792,16 @@ class SORTSkeleton(SORTBase):
         return np.mean(oks)
 
     def calc_pairwise_hausdorff_dist(self, poses, poses_ref):
+        # Same as weighted_hausdorff for every pair of poses, ignoring missing keypoints
         mat = np.zeros((len(poses), len(poses_ref)))
-        for i, pose in enumerate(poses):
-            for j, pose_ref in enumerate(poses_ref):
-                mat[i, j] = self.weighted_hausdorff(pose, pose_ref)
-        return mat
+        if not mat.size:
+            return mat
+        x = np.asarray(poses)[:, None, :, None]
+        y = np.asarray(poses_ref)[None, :, None]
+        d = (x[..., 0] - y[..., 0]) ** 2 + (x[..., 1] - y[..., 1]) ** 2
+        cmin = np.where(np.isnan(d), np.inf, d).min(axis=3, initial=np.inf)
+        cmin[~np.isfinite(cmin)] = 0
+        return np.sqrt(cmin.max(axis=2, initial=0), out=mat)
 
     def calc_pairwise_oks(self, poses, poses_ref):
         mat = np.zeros((len(poses), len(poses_ref)))
@@ -588,19 +819,17 @@ class SORTSkeleton(SORTBase):
                 tracker.state = pose
                 self.trackers.append(tracker)
 
-        poses_ref = []
-        for i, tracker in enumerate(self.trackers):
-            pose_ref = tracker.predict()
-            poses_ref.append(pose_ref.reshape((-1, 2)))
+        poses_ref = [
+            pose_ref.reshape((-1, 2))
+            for pose_ref in SkeletonTracker.predict_many(self.trackers)
+        ]
 
         # mat = self.calc_pairwise_oks(poses, poses_ref)
         mat = self.calc_pairwise_hausdorff_dist(poses, poses_ref)
         row_indices, col_indices = linear_sum_assignment(mat, maximize=False)
 
-        unmatched_poses = [p for p, _ in enumerate(poses) if p not in row_indices]
-        unmatched_trackers = [
-            t for t, _ in enumerate(poses_ref) if t not in col_indices
-        ]
+        unmatched_poses = np.setdiff1d(np.arange(len(poses)), row_indices)
+        unmatched_trackers = np.setdiff1d(np.arange(len(poses_ref)), col_indices)
         # Remove matched detections with low OKS
         # matches = []
         # for row, col in zip(row_indices, col_indices):
@@ -615,14 +844,10 @@ class SORTSkeleton(SORTBase):
         #     matches = np.stack(matches)
         matches = np.c_[row_indices, col_indices]
 
-        animalindex = []
-        for t, tracker in enumerate(self.trackers):
-            if t not in unmatched_trackers:
-                ind = matches[matches[:, 1] == t, 0][0]
-                animalindex.append(ind)
-                tracker.update(poses[ind])
-            else:
-                animalindex.append(-1)
+        animalindex = [-1] * len(self.trackers)
+        for row, col in matches:
+            animalindex[col] = row
+            self.trackers[col].update(poses[row])
 
         for i in unmatched_poses:
             tracker = SkeletonTracker(self.n_bodyparts)
@@ -656,8 +881,8 @@ class SORTBox(SORTBase):
         self.n_frames += 1
 
         trackers = np.zeros((len(self.trackers), 5))
-        for i in range(len(trackers)):
-            trackers[i, :4] = self.trackers[i].predict()
+        if len(trackers):
+            trackers[:, :4] = BoxTracker.predict_many(self.trackers)
         empty = np.isnan(trackers).any(axis=1)
         trackers = trackers[~empty]
         for ind in np.flatnonzero(empty)[::-1]:
@@ -668,14 +893,12 @@ class SORTBox(SORTBase):
         )
 
         # update matched trackers with assigned detections
-        animalindex = []
-        for t, trk in enumerate(self.trackers):
-            if t not in unmatched_trks:
-                d = matched[np.where(matched[:, 1] == t)[0], 0]
-                animalindex.append(d[0])
-                trk.update(dets[d, :][0])  # update coordinates
-            else:
-                animalindex.append("nix")  # lost trk!
+        animalindex = ["nix"] * len(self.trackers)  # lost trk!
+        for d, t in matched:
+            animalindex[t] = d
+        BoxTracker.update_many(
+            [self.trackers[t] for t in matched[:, 1]], dets[matched[:, 0]]
+        )  # update coordinates
 
         # create and initialise new trackers for unmatched detections
         for i in unmatched_dets:
@@ -718,35 +941,19 @@ class SORTBox(SORTBase):
                 np.arange(len(detections)),
                 np.empty((0, 5), dtype=int),
             )
-        iou_matrix = np.zeros((len(detections), len(trackers)), dtype=np.float32)
-
-        for d, det in enumerate(detections):
-            for t, trk in enumerate(trackers):
-                iou_matrix[d, t] = calc_iou(det, trk)
+        iou_matrix = calc_iou_matrix(detections, trackers).astype(np.float32)
         row_indices, col_indices = linear_sum_assignment(-iou_matrix)
 
-        unmatched_detections = []
-        for d, det in enumerate(detections):
-            if d not in row_indices:
-                unmatched_detections.append(d)
-        unmatched_trackers = []
-        for t, trk in enumerate(trackers):
-            if t not in col_indices:
-                unmatched_trackers.append(t)
-
         # filter out matched with low IOU
-        matches = []
-        for row, col in zip(row_indices, col_indices):
-            if iou_matrix[row, col] < iou_threshold:
-                unmatched_detections.append(row)
-                unmatched_trackers.append(col)
-            else:
-                matches.append([row, col])
-        if not len(matches):
-            matches = np.empty((0, 2), dtype=int)
-        else:
-            matches = np.stack(matches)
-        return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+        low = iou_matrix[row_indices, col_indices] < iou_threshold
+        unmatched_detections = np.r_[
+            np.setdiff1d(np.arange(len(detections)), row_indices), row_indices[low]
+        ]
+        unmatched_trackers = np.r_[
+            np.setdiff1d(np.arange(len(trackers)), col_indices), col_indices[low]
+        ]
+        matches = np.c_[row_indices[~low], col_indices[~low]]
+        return matches, unmatched_detections, unmatched_trackers
 
 
 def fill_tracklets(tracklets, trackers, animals, imname):
@@ -787,10 +994,7 @@ def reconstruct_all_ellipses(data, sd):
     fitter = EllipseFitter(sd)
     for n, animal in enumerate(animals):
         data = xy.xs(animal, axis=1, level="individuals").values.reshape((nrows, -1, 2))
-        for i, coords in enumerate(tqdm(data)):
-            el = fitter.fit(coords.astype(np.float64))
-            if el is not None:
-                ellipses[n, i] = el.parameters
+        ellipses[n] = fitter.fit_many(data)
     return ellipses
 
 
@@ -3,7 +3,7 @@ import tensorflow as tf
 from deeplabcut.pose_estimation_tensorflow.datasets import Batch
 from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal
 from .layers import prediction_layer
-from .utils import make_2d_gaussian_kernel
+from .utils import extract_poses, make_2d_gaussian_kernel
 
 
 class BasePoseNet(metaclass=abc.ABCMeta):
@@ -111,10 +111,16 @@ class BasePoseNet(metaclass=abc.ABCMeta):
     def inference(self, inputs):
         """Direct TF inference on GPU.
         Added with: https://arxiv.org/abs/1909.11229
+
+        "pose" is the legacy (batch * num_joints, 3) output in y, x, likelihood
+        order that exported models (DLC-Live, OpenVINO) rely on; "poses" holds
+        the (batch, num_joints * num_outputs, 3) x, y, likelihood arrays used
+        for video analysis.
         """
         heads = self.get_net(inputs)
         locref = heads["locref"]
         probs = tf.sigmoid(heads["part_pred"])
+        probs_batch = probs
 
         if self.cfg["batch_size"] == 1:
             probs = tf.squeeze(probs, axis=0)
@@ -167,7 +173,16 @@ class BasePoseNet(metaclass=abc.ABCMeta):
             + offset * self.cfg["locref_stdev"]
         )
         pose = tf.concat([pose, likelihood], axis=1)
-        return {"pose": pose}
+        # Built last so that the names of the legacy nodes (e.g., "concat_1")
+        # remain stable for model export.
+        poses = extract_poses(
+            probs_batch,
+            heads["locref"],
+            self.cfg["stride"],
+            self.cfg["locref_stdev"],
+            self.cfg.get("num_outputs", 1),
+        )
+        return {"pose": pose, "poses": poses}
 
     def add_inference_layers(self, heads):
         """initialized during inference"""
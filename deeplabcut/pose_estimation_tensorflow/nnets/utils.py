@@ -90,6 +90,53 @@ def make_2d_gaussian_kernel(sigma, size):
     return tf.einsum("i,j->ij", k, k)
 
 
+def extract_poses(probs, locref, stride, locref_stdev, num_outputs=1):
+    """Graph-side pose extraction from batched score maps.
+
+    Finds the ``num_outputs`` best locations of every keypoint, gathers the
+    corresponding location refinement offsets and likelihoods, and maps them
+    to image coordinates, all on the device.
+
+    Parameters
+    ----------
+    probs: tf.Tensor
+        Score maps of shape (batch, ny, nx, num_joints).
+
+    locref: tf.Tensor or None
+        Location refinement maps of shape (batch, ny, nx, num_joints * 2);
+        offsets are ignored if None.
+
+    stride: float
+        Network stride.
+
+    locref_stdev: float
+        Scale of the location refinement offsets.
+
+    num_outputs: int, optional (default=1)
+        Number of candidate locations per keypoint, sorted by decreasing score.
+
+    Returns
+    -------
+    tf.Tensor
+        Poses of shape (batch, num_joints * num_outputs, 3), with columns
+        x, y and likelihood; candidates of a keypoint are contiguous.
+    """
+    shape = tf.shape(probs)
+    batch, ny, nx, num_joints = shape[0], shape[1], shape[2], shape[3]
+    # (batch, num_joints, ny * nx) so that top_k runs over image locations
+    probs = tf.transpose(tf.reshape(probs, (batch, ny * nx, num_joints)), (0, 2, 1))
+    likelihood, maxloc = tf.math.top_k(probs, k=num_outputs, sorted=True)
+    xy = tf.stack([maxloc % nx, maxloc // nx], axis=-1)
+    xy = tf.cast(xy, tf.float32) * stride + 0.5 * stride
+    if locref is not None:
+        locref = tf.reshape(locref, (batch, ny * nx, num_joints, 2))
+        locref = tf.transpose(locref, (0, 2, 1, 3))
+        offset = tf.gather(locref, maxloc, axis=2, batch_dims=2)
+        xy += offset * locref_stdev
+    pose = tf.concat([xy, likelihood[..., tf.newaxis]], axis=-1)
+    return tf.reshape(pose, (batch, num_joints * num_outputs, 3))
+
+
 def build_learning_rate(
     initial_lr,
     global_step,
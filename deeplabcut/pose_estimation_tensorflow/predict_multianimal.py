@@ -21,6 +21,7 @@ from tqdm import tqdm
 from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal as predict
 from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal
 from deeplabcut.utils.auxfun_videos import VideoWriter
+from deeplabcut.utils.detection_store import DetectionStore, STORE_SUFFIX
 import pickle
 
 
@@ -114,8 +115,15 @@ def AnalyzeMultiAnimalVideo(
     destfolder=None,
     robust_nframes=False,
     use_shelve=False,
+    use_store=False,
+    assembler=None,
 ):
-    """Helper function for analyzing a video with multiple individuals"""
+    """Helper function for analyzing a video with multiple individuals
+
+    If an ``inferenceutils.Assembler`` is given, individuals are assembled on the
+    fly, and detections are written to a store unless ``use_shelve`` is True.
+    Returns False if the video was already analyzed, True otherwise.
+    """
 
     print("Starting to analyze % ", video)
     vname = Path(video).stem
@@ -125,8 +133,12 @@ def AnalyzeMultiAnimalVideo(
     auxiliaryfunctions.attempttomakefolder(destfolder)
     dataname = os.path.join(destfolder, vname + DLCscorer + ".h5")
 
-    if os.path.isfile(dataname.split(".h5")[0] + "_full.pickle"):
+    basename = dataname.split(".h5")[0]
+    if os.path.isfile(basename + "_full.pickle") or DetectionStore.exists(
+        basename + STORE_SUFFIX
+    ):
         print("Video already analyzed!", dataname)
+        return False
     else:
         print("Loading ", video)
         vid = VideoWriter(video)
@@ -160,10 +172,18 @@ def AnalyzeMultiAnimalVideo(
             "Starting to extract posture from the video(s) with batchsize:",
             dlc_cfg["batch_size"],
         )
-        if use_shelve:
+        if assembler is not None and not use_shelve:
+            # Detections are consumed by the assembler as they are computed, so
+            # they are written to disk rather than all kept in memory.
+            use_store = True
+        if use_store:
+            shelf_path = ""
+            store_path = basename + STORE_SUFFIX
+        elif use_shelve:
             shelf_path = dataname.split(".h5")[0] + "_full.pickle"
+            store_path = ""
         else:
-            shelf_path = ""
+            shelf_path = store_path = ""
         if int(dlc_cfg["batch_size"]) > 1:
             PredicteData, nframes = GetPoseandCostsF(
                 cfg,
@@ -175,10 +195,21 @@ def AnalyzeMultiAnimalVideo(
                 nframes,
                 int(dlc_cfg["batch_size"]),
                 shelf_path,
+                store_path,
+                assembler,
             )
         else:
             PredicteData, nframes = GetPoseandCostsS(
-                cfg, dlc_cfg, sess, inputs, outputs, vid, nframes, shelf_path,
+                cfg,
+                dlc_cfg,
+                sess,
+                inputs,
+                outputs,
+                vid,
+                nframes,
+                shelf_path,
+                store_path,
+                assembler,
             )
 
         stop = time.time()
@@ -206,7 +237,7 @@ def AnalyzeMultiAnimalVideo(
         metadata = {"data": dictionary}
         print("Video Analyzed. Saving results in %s..." % (destfolder))
 
-        if use_shelve:
+        if use_shelve or use_store:
             metadata_path = dataname.split(".h5")[0] + "_meta.pickle"
             with open(metadata_path, "wb") as f:
                 pickle.dump(metadata, f, pickle.HIGHEST_PROTOCOL)
@@ -214,6 +245,7 @@ def AnalyzeMultiAnimalVideo(
             _ = auxfun_multianimal.SaveFullMultiAnimalData(
                 PredicteData, metadata, dataname
             )
+        return True
 
 
 def _get_features_dict(raw_coords, features, stride):
@@ -350,9 +382,23 @@ def GetPoseandCostsF_from_assemblies(
 
 
 def GetPoseandCostsF(
-    cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize, shelf_path,
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    cap,
+    nframes,
+    batchsize,
+    shelf_path,
+    store_path="",
+    assembler=None,
 ):
-    """Batchwise prediction of pose"""
+    """Batchwise prediction of pose
+
+    If an ``inferenceutils.Assembler`` is passed, detections are also fed
+    to it as they are computed, so individuals are assembled on the fly.
+    """
     strwidth = int(np.ceil(np.log10(nframes)))  # width for strings
     batch_ind = 0  # keeps track of which image within a batch should be written to
     batch_num = 0  # keeps track of which batch you are at
@@ -367,7 +413,9 @@ def GetPoseandCostsF(
     counter = 0
     inds = []
 
-    if shelf_path:
+    if store_path:
+        db = DetectionStore(store_path, mode="w")
+    elif shelf_path:
         db = shelve.open(shelf_path, protocol=pickle.DEFAULT_PROTOCOL,)
     else:
         db = dict()
@@ -403,6 +451,8 @@ def GetPoseandCostsF(
                 )
                 for ind, data in zip(inds, D):
                     db["frame" + str(ind).zfill(strwidth)] = data
+                    if assembler is not None:
+                        assembler.feed(ind, data)
                 del D
                 batch_ind = 0
                 inds.clear()
@@ -416,6 +466,8 @@ def GetPoseandCostsF(
                 )
                 for ind, data in zip(inds, D):
                     db["frame" + str(ind).zfill(strwidth)] = data
+                    if assembler is not None:
+                        assembler.feed(ind, data)
                 del D
             break
         counter += 1
@@ -430,13 +482,29 @@ def GetPoseandCostsF(
     return db, nframes
 
 
-def GetPoseandCostsS(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, shelf_path):
-    """Non batch wise pose estimation for video cap."""
+def GetPoseandCostsS(
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    cap,
+    nframes,
+    shelf_path,
+    store_path="",
+    assembler=None,
+):
+    """Non batch wise pose estimation for video cap.
+
+    Detections are fed to ``assembler`` as they are computed, if given.
+    """
     strwidth = int(np.ceil(np.log10(nframes)))  # width for strings
     if cfg["cropping"]:
         cap.set_bbox(cfg["x1"], cfg["x2"], cfg["y1"], cfg["y2"])
 
-    if shelf_path:
+    if store_path:
+        db = DetectionStore(store_path, mode="w")
+    elif shelf_path:
         db = shelve.open(shelf_path, protocol=pickle.DEFAULT_PROTOCOL,)
     else:
         db = dict()
@@ -470,6 +538,8 @@ def GetPoseandCostsS(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, shelf_pa
                 dlc_cfg, np.expand_dims(frame, axis=0), sess, inputs, outputs,
             )
             db[key] = dets[0]
+            if assembler is not None:
+                assembler.feed(counter, dets[0])
             del dets
         elif counter >= nframes:
             break
@@ -13,11 +13,14 @@ Licensed under GNU Lesser General Public License v3.0
 ####################################################
 
 import argparse
+import multiprocessing
 import os
 import os.path
 import pickle
+import queue
 import re
 import time
+import traceback
 import warnings
 from pathlib import Path
 
@@ -31,10 +34,14 @@ from tqdm import tqdm
 
 from deeplabcut.pose_estimation_tensorflow.config import load_config
 from deeplabcut.pose_estimation_tensorflow.core import predict
+from deeplabcut.pose_estimation_tensorflow.core.inference_pipeline import (
+    PipelinedPoseEstimator,
+)
 from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils, trackingutils
 
 from deeplabcut.refine_training_dataset.stitch import stitch_tracklets
 from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal
+from deeplabcut.utils.auxfun_videos import VideoReader
 from deeplabcut.pose_estimation_tensorflow.core.openvino.session import (
     GetPoseF_OV,
     is_openvino_available,
@@ -282,6 +289,12 @@ def analyze_videos(
     calibrate=False,
     identity_only=False,
     use_openvino="CPU" if is_openvino_available else None,
+    use_pipeline=False,
+    n_processes=None,
+    checkpoint_every=None,
+    use_store=False,
+    assemble_online=False,
+    assembly_chunk_size=None,
 ):
     """Makes prediction based on a trained network.
 
@@ -370,6 +383,13 @@ def analyze_videos(
         pickle-based, persistent, database-like object by default, resulting in
         constant memory footprint.
 
+    use_store: bool, optional, default=False
+        Only relevant for multi-animal projects. If ``True``, detections are written
+        on the fly to a columnar, memory-mapped "*_full.store" directory instead of
+        a pickle file. Any frame can then be read without loading the others,
+        which makes assembly and outlier search on long videos faster and far less
+        memory hungry. Takes precedence over ``use_shelve``.
+
     The following parameters are only relevant for multi-animal projects:
 
     auto_track: bool, optional, default=True
@@ -386,6 +406,20 @@ def analyze_videos(
         If ``True`` and animal identity was learned by the model, assembly and tracking
         rely exclusively on identity prediction.
 
+    assemble_online: bool, optional, default=False
+        Only relevant with ``auto_track``. If ``True``, individuals are assembled
+        as soon as the detections of a frame are computed, rather than in a second
+        pass over the stored detections, which are then not loaded again for
+        tracking. Unless ``use_shelve`` is True, detections are written on the fly
+        to a store (see ``use_store``), so that memory use does not grow with the
+        length of the video. Videos that were already analyzed are assembled as
+        usual.
+
+    assembly_chunk_size: int or None, optional, default=None
+        Only relevant with ``auto_track``. Number of consecutive frames assembled by
+        a worker process at a time (see ``n_processes``). If 0, frames are assembled
+        serially. By default, chunks of 100 frames are assembled in parallel.
+
     calibrate: bool, optional, default=False
         If ``True``, use training data to calibrate the animal assembly procedure. This
         improves its robustness to wrong body part links, but requires very little
@@ -400,6 +434,37 @@ def analyze_videos(
     use_openvino: str, optional
         Use "CPU" for inference if OpenVINO is available in the Python environment.
 
+    use_pipeline: bool, optional, default=False
+        Only relevant for single-animal projects. If ``True``, frames are decoded on
+        a background thread into a ring of preallocated batches, and the extraction
+        of poses from the network outputs runs on another thread, so that decoding,
+        inference and writing overlap. Per-stage throughputs are printed once a video
+        is analyzed. Not used with dynamic cropping nor OpenVINO (which already runs
+        asynchronously).
+
+    n_processes: int or None, optional, default=None
+        Only relevant for single-animal projects. If greater than 1, videos are
+        sharded across that many worker processes, each loading the model once.
+        Videos are handed out longest first, and idle workers pick up the next
+        pending video, so that workers finish at about the same time. Videos that
+        were already analyzed are skipped, so that an interrupted batch can simply
+        be resumed. Workers are started with the "spawn" method, so calling scripts
+        must be guarded by ``if __name__ == "__main__":``. Workers share the GPU,
+        allocating its memory as they need it (``TF_FORCE_GPU_ALLOW_GROWTH``)
+        rather than all of it upfront.
+        For multi-animal projects, videos are analyzed sequentially, and this is
+        instead the number of processes individuals are assembled with when
+        ``auto_track`` is ``True`` (by default, as many as there are CPUs).
+
+    checkpoint_every: int or None, optional, default=None
+        Only relevant for single-animal projects. If given, a video is analyzed in
+        chunks of that many frames, and predictions are flushed to a memory-mapped
+        ``*_partial.npy`` file after every chunk, together with a progress marker.
+        If the analysis is interrupted, calling ``analyze_videos`` again resumes
+        from the last completed chunk. The partial files are deleted once the h5
+        file is written. Memory usage is bounded during inference, but all
+        predictions are still loaded to write the final h5 file.
+
     Returns
     -------
     pandas array
@@ -560,10 +625,9 @@ def analyze_videos(
         # (state,detectiontreshold,margin)=dynamic
         print("Starting analysis in dynamic cropping mode with parameters:", dynamic)
         dlc_cfg["num_outputs"] = 1
-        TFGPUinference = False
         dlc_cfg["batch_size"] = 1
         print(
-            "Switching batchsize to 1, num_outputs (per animal) to 1 and TFGPUinference to False (all these features are not supported in this mode)."
+            "Switching batchsize to 1 and num_outputs (per animal) to 1 (these features are not supported in this mode)."
         )
 
     # Name for scorer:
@@ -575,11 +639,6 @@ def analyze_videos(
         modelprefix=modelprefix,
     )
     if dlc_cfg["num_outputs"] > 1:
-        if TFGPUinference:
-            print(
-                "Switching to numpy-based keypoint extraction code, as multiple point extraction is not supported by TF code currently."
-            )
-            TFGPUinference = False
         print("Extracting ", dlc_cfg["num_outputs"], "instances per bodypart")
         xyz_labs_orig = ["x", "y", "likelihood"]
         suffix = [str(s + 1) for s in range(dlc_cfg["num_outputs"])]
@@ -588,18 +647,21 @@ def analyze_videos(
     else:
         xyz_labs = ["x", "y", "likelihood"]
 
-    if use_openvino:
-        sess, inputs, outputs = predict.setup_openvino_pose_prediction(
-            dlc_cfg, device=use_openvino
-        )
-    elif TFGPUinference:
-        sess, inputs, outputs = predict.setup_GPUpose_prediction(
-            dlc_cfg, allow_growth=allow_growth
-        )
-    else:
-        sess, inputs, outputs = predict.setup_pose_prediction(
-            dlc_cfg, allow_growth=allow_growth
+    use_scheduler = n_processes is not None and n_processes > 1
+    if use_scheduler and "multi-animal" in dlc_cfg["dataset_type"]:
+        print(
+            "Sharding videos across processes is only supported for single-animal projects; videos are analyzed sequentially."
         )
+        use_scheduler = False
+
+    setup_kwargs = dict(
+        dlc_cfg=dlc_cfg,
+        TFGPUinference=TFGPUinference,
+        allow_growth=allow_growth,
+        use_openvino=use_openvino,
+    )
+    if not use_scheduler:  # Otherwise, the model is loaded by each worker
+        sess, inputs, outputs = _setup_pose_prediction(**setup_kwargs)
 
     pdindex = pd.MultiIndex.from_product(
         [[DLCscorer], dlc_cfg["all_joints_names"], xyz_labs],
@@ -617,7 +679,28 @@ def analyze_videos(
             )
 
             for video in Videos:
-                AnalyzeMultiAnimalVideo(
+                assembler = None
+                if auto_track and assemble_online:
+                    inferencecfg = auxfun_multianimal.read_inferencecfg(
+                        Path(modelfolder) / "test" / "inference_cfg.yaml", cfg
+                    )
+                    # Built from the metadata only; frames are fed during analysis
+                    metadata = {
+                        "all_joints_names": dlc_cfg["all_joints_names"],
+                        "PAFgraph": dlc_cfg["partaffinityfield_graph"],
+                        "PAFinds": dlc_cfg.get(
+                            "paf_best",
+                            np.arange(len(dlc_cfg["partaffinityfield_graph"])),
+                        ),
+                    }
+                    assembler = _build_assembler(
+                        cfg,
+                        inferencecfg,
+                        {"metadata": metadata},
+                        calibrate=calibrate,
+                        identity_only=identity_only,
+                    )
+                analyzed = AnalyzeMultiAnimalVideo(
                     video,
                     DLCscorer,
                     trainFraction,
@@ -629,6 +712,8 @@ def analyze_videos(
                     destfolder,
                     robust_nframes=robust_nframes,
                     use_shelve=use_shelve,
+                    use_store=use_store,
+                    assembler=assembler,
                 )
                 if auto_track:  # tracker type is taken from default in cfg
                     convert_detections2tracklets(
@@ -641,6 +726,9 @@ def analyze_videos(
                         modelprefix=modelprefix,
                         calibrate=calibrate,
                         identity_only=identity_only,
+                        assembler=assembler if analyzed else None,
+                        chunk_size=assembly_chunk_size,
+                        n_processes=n_processes,
                     )
                     stitch_tracklets(
                         config,
@@ -653,6 +741,27 @@ def analyze_videos(
                         modelprefix=modelprefix,
                         save_as_csv=save_as_csv,
                     )
+        elif use_scheduler:
+            _analyze_videos_sharded(
+                Videos,
+                n_processes,
+                setup_kwargs,
+                dict(
+                    DLCscorer=DLCscorer,
+                    DLCscorerlegacy=DLCscorerlegacy,
+                    trainFraction=trainFraction,
+                    cfg=cfg,
+                    dlc_cfg=dlc_cfg,
+                    pdindex=pdindex,
+                    save_as_csv=save_as_csv,
+                    destfolder=destfolder,
+                    TFGPUinference=TFGPUinference,
+                    dynamic=dynamic,
+                    use_openvino=use_openvino,
+                    use_pipeline=use_pipeline,
+                    checkpoint_every=checkpoint_every,
+                ),
+            )
         else:
             for video in Videos:
                 DLCscorer = AnalyzeVideo(
@@ -671,6 +780,8 @@ def analyze_videos(
                     TFGPUinference,
                     dynamic,
                     use_openvino,
+                    use_pipeline,
+                    checkpoint_every,
                 )
 
         os.chdir(str(start_path))
@@ -694,6 +805,137 @@ def analyze_videos(
         return DLCscorer
 
 
+def _setup_pose_prediction(dlc_cfg, TFGPUinference, allow_growth, use_openvino):
+    if use_openvino:
+        return predict.setup_openvino_pose_prediction(dlc_cfg, device=use_openvino)
+    elif TFGPUinference:
+        return predict.setup_GPUpose_prediction(dlc_cfg, allow_growth=allow_growth)
+    else:
+        return predict.setup_pose_prediction(dlc_cfg, allow_growth=allow_growth)
+
+
+def _is_analyzed(video, destfolder, DLCscorer):
+    folder = destfolder or str(Path(video).parents[0])
+    try:
+        _ = auxiliaryfunctions.find_analyzed_data(folder, Path(video).stem, DLCscorer)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _list_analysis_jobs(videos, destfolder, DLCscorer):
+    """List the (video, number of frames) pairs left to analyze, longest first."""
+    jobs = []
+    for video in videos:
+        if _is_analyzed(video, destfolder, DLCscorer):
+            print(f"{video} was already analyzed; skipping it.")
+        else:
+            jobs.append((video, len(VideoReader(video))))
+    jobs.sort(key=lambda job: job[1], reverse=True)
+    return jobs
+
+
+def _run_analysis_jobs(jobs, progress, sess, inputs, outputs, analysis_kwargs):
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        video, n_frames = job
+        try:
+            # AnalyzeVideo does not propagate errors, so success is only
+            # reported once the data file was actually written.
+            AnalyzeVideo(
+                video, sess=sess, inputs=inputs, outputs=outputs, **analysis_kwargs
+            )
+            if _is_analyzed(
+                video, analysis_kwargs["destfolder"], analysis_kwargs["DLCscorer"]
+            ):
+                progress.put((video, n_frames, None))
+            else:
+                progress.put((video, n_frames, "No data file was written."))
+        except Exception:
+            progress.put((video, n_frames, traceback.format_exc()))
+
+
+def _analyze_videos_worker(jobs, progress, n_threads, setup_kwargs, analysis_kwargs):
+    """Load the model once, then analyze videos from the job queue until a sentinel is met."""
+    # Must be set before TensorFlow initializes the GPU; otherwise, the first
+    # worker's session would claim the memory of the GPU for itself. The GPU
+    # selection (CUDA_VISIBLE_DEVICES) is inherited from the parent process.
+    os.environ.setdefault("TF_FORCE_GPU_ALLOW_GROWTH", "true")
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    sess, inputs, outputs = _setup_pose_prediction(**setup_kwargs)
+    _run_analysis_jobs(jobs, progress, sess, inputs, outputs, analysis_kwargs)
+
+
+def _collect_analysis_progress(progress, jobs, workers):
+    """Report progress until all jobs are done or all workers have exited.
+
+    Returns the videos that could not be analyzed.
+    """
+    pending = {video for video, _ in jobs}
+    failed = []
+    pbar = tqdm(total=sum(n for _, n in jobs), unit="frames")
+    while pending:
+        try:
+            video, n_frames, error = progress.get(timeout=5)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break
+            continue
+        pending.discard(video)
+        pbar.update(n_frames)
+        if error is not None:
+            failed.append(video)
+            print(f"Analysis of {video} failed:\n{error}")
+    pbar.close()
+    return sorted(pending) + failed
+
+
+def _analyze_videos_sharded(videos, n_processes, setup_kwargs, analysis_kwargs):
+    """Analyze videos across a pool of worker processes.
+
+    Videos whose data files already exist are skipped. The remaining ones are
+    queued by decreasing number of frames and pulled by whichever worker is idle.
+    """
+    jobs = _list_analysis_jobs(
+        videos, analysis_kwargs["destfolder"], analysis_kwargs["DLCscorer"]
+    )
+    if not jobs:
+        return
+
+    n_workers = min(n_processes, len(jobs))
+    n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    print(
+        f"Analyzing {len(jobs)} videos with {n_workers} processes ({n_threads} threads each)..."
+    )
+    ctx = multiprocessing.get_context("spawn")  # TensorFlow is not fork-safe
+    job_queue = ctx.Queue()
+    for job in jobs:
+        job_queue.put(job)
+    for _ in range(n_workers):
+        job_queue.put(None)
+    progress = ctx.Queue()
+    workers = [
+        ctx.Process(
+            target=_analyze_videos_worker,
+            args=(job_queue, progress, n_threads, setup_kwargs, analysis_kwargs),
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    failed = _collect_analysis_progress(progress, jobs, workers)
+    for worker in workers:
+        worker.join()
+    if failed:
+        warnings.warn(
+            f"The following videos could not be analyzed: {failed}. "
+            "Run `analyze_videos` again to resume the analysis."
+        )
+
+
 def checkcropping(cfg, cap):
     print(
         "Cropping based on the x1 = %s x2 = %s y1 = %s y2 = %s. You can adjust the cropping coordinates in the config.yaml file."
@@ -815,7 +1057,9 @@ def GetPoseS_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes):
     pose_tensor = predict.extract_GPUprediction(
         outputs, dlc_cfg
     )  # extract_output_tensor(outputs, dlc_cfg)
-    PredictedData = np.zeros((nframes, 3 * len(dlc_cfg["all_joints_names"])))
+    PredictedData = np.zeros(
+        (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
+    )
     pbar = tqdm(total=nframes)
     counter = 0
     step = max(10, int(nframes / 100))
@@ -837,12 +1081,8 @@ def GetPoseS_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes):
                 pose_tensor,
                 feed_dict={inputs: np.expand_dims(frame, axis=0).astype(float)},
             )
-            pose[:, [0, 1, 2]] = pose[:, [1, 0, 2]]
-            # pose = predict.getpose(frame, dlc_cfg, sess, inputs, outputs)
-            PredictedData[
-                counter, :
-            ] = (
-                pose.flatten()
+            PredictedData[counter, :] = predict.format_GPUprediction(
+                pose, 1
             )  # NOTE: thereby cfg['all_joints_names'] should be same order as bodyparts!
         elif counter >= nframes:
             break
@@ -854,7 +1094,9 @@ def GetPoseS_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes):
 
 def GetPoseF_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize):
     """Batchwise prediction of pose"""
-    PredictedData = np.zeros((nframes, 3 * len(dlc_cfg["all_joints_names"])))
+    PredictedData = np.zeros(
+        (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
+    )
     batch_ind = 0  # keeps track of which image within a batch should be written to
     batch_num = 0  # keeps track of which batch you are at
     ny, nx = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -887,11 +1129,8 @@ def GetPoseF_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize):
             if batch_ind == batchsize - 1:
                 # pose = predict.getposeNP(frames,dlc_cfg, sess, inputs, outputs)
                 pose = sess.run(pose_tensor, feed_dict={inputs: frames})
-                pose[:, [0, 1, 2]] = pose[
-                    :, [1, 0, 2]
-                ]  # change order to have x,y,confidence
-                pose = np.reshape(
-                    pose, (batchsize, -1)
+                pose = predict.format_GPUprediction(
+                    pose, batchsize
                 )  # bring into batchsize times x,y,conf etc.
                 PredictedData[inds] = pose
                 batch_ind = 0
@@ -903,8 +1142,7 @@ def GetPoseF_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize):
             if batch_ind > 0:
                 # pose = predict.getposeNP(frames, dlc_cfg, sess, inputs, outputs) #process the whole batch (some frames might be from previous batch!)
                 pose = sess.run(pose_tensor, feed_dict={inputs: frames})
-                pose[:, [0, 1, 2]] = pose[:, [1, 0, 2]]
-                pose = np.reshape(pose, (batchsize, -1))
+                pose = predict.format_GPUprediction(pose, batchsize)
                 PredictedData[inds[:batch_ind]] = pose[:batch_ind]
             break
         counter += 1
@@ -913,6 +1151,40 @@ def GetPoseF_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize):
     return PredictedData, nframes
 
 
+def GetPoseF_Pipelined(
+    cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize, TFGPUinference
+):
+    """Batchwise prediction of pose, overlapping decoding, inference and writing."""
+    ny, nx = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    crop = None
+    if cfg["cropping"]:
+        ny, nx = checkcropping(cfg, cap)
+        crop = cfg["x1"], cfg["x2"], cfg["y1"], cfg["y2"]
+
+    n_columns = dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"])
+    if TFGPUinference:
+        pose_tensor = predict.extract_GPUprediction(outputs, dlc_cfg)
+
+        def run_batch(frames):
+            return sess.run(pose_tensor, feed_dict={inputs: frames})
+
+        def extract_poses(pose):
+            return predict.format_GPUprediction(pose, batchsize)
+
+    else:
+
+        def run_batch(frames):
+            return sess.run(outputs, feed_dict={inputs: frames})
+
+        def extract_poses(outputs_np):
+            return predict.extract_poses_from_outputs(outputs_np, dlc_cfg)
+
+    engine = PipelinedPoseEstimator(run_batch, extract_poses, batchsize, crop=crop)
+    PredictedData = engine.run(cap, nframes, (ny, nx), n_columns)
+    engine.report()
+    return PredictedData, nframes
+
+
 def getboundingbox(x, y, nx, ny, margin):
     x1 = max([0, int(np.amin(x)) - margin])
     x2 = min([nx, int(np.amax(x)) + margin])
@@ -922,9 +1194,30 @@ def getboundingbox(x, y, nx, ny, margin):
 
 
 def GetPoseDynamic(
-    cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, detectiontreshold, margin
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    cap,
+    nframes,
+    detectiontreshold,
+    margin,
+    TFGPUinference=False,
 ):
     """Non batch wise pose estimation for video cap by dynamically cropping around previously detected parts."""
+    if TFGPUinference:
+        pose_tensor = predict.extract_GPUprediction(outputs, dlc_cfg)
+
+        def getpose(frame):
+            pose = sess.run(pose_tensor, feed_dict={inputs: frame[np.newaxis]})
+            return predict.format_GPUprediction(pose, 1).flatten()
+
+    else:
+
+        def getpose(frame):
+            return predict.getpose(frame, dlc_cfg, sess, inputs, outputs).flatten()
+
     if cfg["cropping"]:
         ny, nx = checkcropping(cfg, cap)
     else:
@@ -952,7 +1245,7 @@ def GetPoseDynamic(
             else:
                 frame = img_as_ubyte(originalframe[y1:y2, x1:x2])
 
-            pose = predict.getpose(frame, dlc_cfg, sess, inputs, outputs).flatten()
+            pose = getpose(frame)
             detection = np.any(pose[2::3] > detectiontreshold)  # is anything detected?
             if detection:
                 pose[0::3], pose[1::3] = (
@@ -975,9 +1268,7 @@ def GetPoseDynamic(
                         )
                     else:
                         frame = img_as_ubyte(originalframe)
-                    pose = predict.getpose(
-                        frame, dlc_cfg, sess, inputs, outputs
-                    ).flatten()  # no offset is necessary
+                    pose = getpose(frame)  # no offset is necessary
 
                 x0, y0 = x1, y1
                 x1, x2, y1, y2 = 0, nx, 0, ny
@@ -992,6 +1283,67 @@ def GetPoseDynamic(
     return PredictedData, nframes
 
 
+class _FrameRangeCapture:
+    """Expose only the next ``n_frames`` frames of an opened video capture."""
+
+    def __init__(self, cap, n_frames):
+        self.cap = cap
+        self.n_frames = n_frames
+        self._n_read = 0
+
+    def read(self):
+        if self._n_read >= self.n_frames:
+            return False, None
+        self._n_read += 1
+        return self.cap.read()
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def _get_pose_in_chunks(get_pose, cap, nframes, chunksize, filepath):
+    """Run pose estimation on ``chunksize`` frames at a time, checkpointing each chunk.
+
+    Predictions are flushed to the memory-mapped file ``filepath_partial.npy``
+    and the number of completed frames to ``filepath_partial.pickle``.
+    If both exist, the analysis resumes after the last completed chunk.
+    """
+    data_path = filepath + "_partial.npy"
+    progress_path = filepath + "_partial.pickle"
+    data = None
+    n_done = 0
+    if os.path.isfile(data_path) and os.path.isfile(progress_path):
+        with open(progress_path, "rb") as f:
+            progress = pickle.load(f)
+        if progress["nframes"] == nframes:
+            data = np.lib.format.open_memmap(data_path, mode="r+")
+            n_done = progress["n_frames_done"]
+            print(f"Resuming analysis from frame {n_done}...")
+            cap.set(cv2.CAP_PROP_POS_FRAMES, n_done)
+
+    while n_done < nframes:
+        n = min(chunksize, nframes - n_done)
+        chunk, _ = get_pose(_FrameRangeCapture(cap, n), n)
+        if data is None:
+            data = np.lib.format.open_memmap(
+                data_path, mode="w+", dtype=chunk.dtype, shape=(nframes, chunk.shape[1])
+            )
+        data[n_done : n_done + n] = chunk[:n]
+        data.flush()
+        n_done += n
+        # Write the marker atomically so that it never points past flushed data
+        with open(progress_path + ".tmp", "wb") as f:
+            pickle.dump({"nframes": nframes, "n_frames_done": n_done}, f)
+        os.replace(progress_path + ".tmp", progress_path)
+    return data
+
+
+def _remove_checkpoint(filepath):
+    for suffix in ("_partial.npy", "_partial.pickle"):
+        if os.path.isfile(filepath + suffix):
+            os.remove(filepath + suffix)
+
+
 def AnalyzeVideo(
     video,
     DLCscorer,
@@ -1008,6 +1360,8 @@ def AnalyzeVideo(
     TFGPUinference=True,
     dynamic=(False, 0.5, 10),
     use_openvino="CPU" if is_openvino_available else None,
+    use_pipeline=False,
+    checkpoint_every=None,
 ):
     """Helper function for analyzing a video."""
     print("Starting to analyze % ", video)
@@ -1047,24 +1401,25 @@ def AnalyzeVideo(
         )
 
         dynamic_analysis_state, detectiontreshold, margin = dynamic
-        start = time.time()
-        print("Starting to extract posture")
-        if dynamic_analysis_state:
-            PredictedData, nframes = GetPoseDynamic(
-                cfg,
-                dlc_cfg,
-                sess,
-                inputs,
-                outputs,
-                cap,
-                nframes,
-                detectiontreshold,
-                margin,
-            )
-            # GetPoseF_GTF(cfg,dlc_cfg, sess, inputs, outputs,cap,nframes,int(dlc_cfg["batch_size"]))
-        else:
-            if int(dlc_cfg["batch_size"]) > 1:
-                args = (
+        batchsize = int(dlc_cfg["batch_size"])
+
+        def get_pose(cap, nframes):
+            if dynamic_analysis_state:
+                return GetPoseDynamic(
+                    cfg,
+                    dlc_cfg,
+                    sess,
+                    inputs,
+                    outputs,
+                    cap,
+                    nframes,
+                    detectiontreshold,
+                    margin,
+                    TFGPUinference and not use_openvino,
+                )
+                # GetPoseF_GTF(cfg,dlc_cfg, sess, inputs, outputs,cap,nframes,int(dlc_cfg["batch_size"]))
+            elif use_pipeline and not use_openvino:
+                return GetPoseF_Pipelined(
                     cfg,
                     dlc_cfg,
                     sess,
@@ -1072,23 +1427,31 @@ def AnalyzeVideo(
                     outputs,
                     cap,
                     nframes,
-                    int(dlc_cfg["batch_size"]),
+                    batchsize,
+                    TFGPUinference,
                 )
+            elif batchsize > 1:
+                args = (cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize)
                 if use_openvino:
-                    PredictedData, nframes = GetPoseF_OV(*args)
+                    return GetPoseF_OV(*args)
                 elif TFGPUinference:
-                    PredictedData, nframes = GetPoseF_GTF(*args)
+                    return GetPoseF_GTF(*args)
                 else:
-                    PredictedData, nframes = GetPoseF(*args)
+                    return GetPoseF(*args)
+            elif TFGPUinference:
+                return GetPoseS_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes)
             else:
-                if TFGPUinference:
-                    PredictedData, nframes = GetPoseS_GTF(
-                        cfg, dlc_cfg, sess, inputs, outputs, cap, nframes
-                    )
-                else:
-                    PredictedData, nframes = GetPoseS(
-                        cfg, dlc_cfg, sess, inputs, outputs, cap, nframes
-                    )
+                return GetPoseS(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes)
+
+        start = time.time()
+        print("Starting to extract posture")
+        checkpoint = os.path.join(destfolder, vname + DLCscorer)
+        if checkpoint_every:
+            PredictedData = _get_pose_in_chunks(
+                get_pose, cap, nframes, checkpoint_every, checkpoint
+            )
+        else:
+            PredictedData, nframes = get_pose(cap, nframes)
 
         stop = time.time()
         if cfg["cropping"] == True:
@@ -1124,6 +1487,9 @@ def AnalyzeVideo(
             range(nframes),
             save_as_csv,
         )
+        if checkpoint_every:
+            del PredictedData  # Release the memory map before deleting its file
+            _remove_checkpoint(checkpoint)
     finally:
         return DLCscorer
 
@@ -1541,6 +1907,37 @@ def _convert_detections_to_tracklets(
         pickle.dump(tracklets, f, pickle.HIGHEST_PROTOCOL)
 
 
+def _build_assembler(
+    cfg,
+    inferencecfg,
+    data,
+    greedy=False,
+    window_size=0,
+    identity_only=False,
+    calibrate=False,
+):
+    """Build the assembler of individuals parametrized by the inference config."""
+    ass = inferenceutils.Assembler(
+        data,
+        max_n_individuals=inferencecfg["topktoretain"],
+        n_multibodyparts=len(cfg["multianimalbodyparts"]),
+        greedy=greedy,
+        pcutoff=inferencecfg.get("pcutoff", 0.1),
+        min_affinity=inferencecfg.get("pafthreshold", 0.05),
+        window_size=window_size,
+        identity_only=identity_only,
+    )
+    if calibrate:
+        trainingsetfolder = auxiliaryfunctions.get_training_set_folder(cfg)
+        train_data_file = os.path.join(
+            cfg["project_path"],
+            str(trainingsetfolder),
+            "CollectedData_" + cfg["scorer"] + ".h5",
+        )
+        ass.calibrate(train_data_file)
+    return ass
+
+
 def convert_detections2tracklets(
     config,
     videos,
@@ -1557,6 +1954,9 @@ def convert_detections2tracklets(
     window_size=0,
     identity_only=False,
     track_method="",
+    assembler=None,
+    chunk_size=None,
+    n_processes=None,
 ):
     """
     This should be called at the end of deeplabcut.analyze_videos for multianimal projects!
@@ -1615,6 +2015,21 @@ def convert_detections2tracklets(
          For multiple animals, must be either 'box', 'skeleton', or 'ellipse'
          and will be taken from the config.yaml file if none is given.
 
+    assembler: inferenceutils.Assembler, optional
+        Assembler that was fed the detections of the (single) video during its
+        analysis. Individuals are then not assembled again from the stored
+        detections, which are not loaded.
+
+    chunk_size: int, optional (default=None)
+        Number of consecutive frames assembled by a worker process at a time.
+        If 0, frames are assembled serially. By default, chunks of 100 frames
+        are assembled in parallel if ``window_size`` is 0, and frames are
+        assembled serially otherwise.
+
+    n_processes: int, optional (default=None)
+        Number of processes individuals are assembled with;
+        by default, as many as there are CPUs.
+
 
     Examples
     --------
@@ -1732,7 +2147,11 @@ def convert_detections2tracklets(
             auxiliaryfunctions.attempttomakefolder(destfolder)
             vname = Path(video).stem
             dataname = os.path.join(destfolder, vname + DLCscorer + ".h5")
-            data, metadata = auxfun_multianimal.LoadFullMultiAnimalData(dataname)
+            if assembler is None:
+                data, metadata = auxfun_multianimal.LoadFullMultiAnimalData(dataname)
+            else:
+                with open(dataname.split(".h5")[0] + "_meta.pickle", "rb") as f:
+                    metadata = pickle.load(f)
             if track_method == "ellipse":
                 method = "el"
             elif track_method == "box":
@@ -1750,7 +2169,10 @@ def convert_detections2tracklets(
             else:
                 print("Analyzing", dataname)
                 DLCscorer = metadata["data"]["Scorer"]
-                all_jointnames = data["metadata"]["all_joints_names"]
+                if assembler is None:
+                    all_jointnames = data["metadata"]["all_joints_names"]
+                else:
+                    all_jointnames = assembler.metadata["joint_names"]
 
                 numjoints = len(all_jointnames)
 
@@ -1766,7 +2188,13 @@ def convert_detections2tracklets(
                     names=["scorer", "bodyparts", "coords"],
                 )
 
-                imnames = [fn for fn in data if fn != "metadata"]
+                if assembler is None:
+                    imnames = [fn for fn in data if fn != "metadata"]
+                else:
+                    # Frames were fed under their index in the video
+                    nframes = metadata["data"]["nframes"]
+                    strwidth = int(np.ceil(np.log10(nframes)))
+                    imnames = ["frame" + str(i).zfill(strwidth) for i in range(nframes)]
 
                 if track_method == "box":
                     mot_tracker = trackingutils.SORTBox(
@@ -1789,30 +2217,24 @@ def convert_detections2tracklets(
                     )
                 tracklets = {}
                 multi_bpts = cfg["multianimalbodyparts"]
-                ass = inferenceutils.Assembler(
-                    data,
-                    max_n_individuals=inferencecfg["topktoretain"],
-                    n_multibodyparts=len(multi_bpts),
-                    greedy=greedy,
-                    pcutoff=inferencecfg.get("pcutoff", 0.1),
-                    min_affinity=inferencecfg.get("pafthreshold", 0.05),
-                    window_size=window_size,
-                    identity_only=identity_only,
-                )
-                if calibrate:
-                    trainingsetfolder = auxiliaryfunctions.get_training_set_folder(cfg)
-                    train_data_file = os.path.join(
-                        cfg["project_path"],
-                        str(trainingsetfolder),
-                        "CollectedData_" + cfg["scorer"] + ".h5",
+                if assembler is None:
+                    ass = _build_assembler(
+                        cfg,
+                        inferencecfg,
+                        data,
+                        greedy=greedy,
+                        window_size=window_size,
+                        identity_only=identity_only,
+                        calibrate=calibrate,
                     )
-                    ass.calibrate(train_data_file)
-                ass.assemble()
+                    ass.assemble(chunk_size, n_processes)
+                    try:
+                        data.close()
+                    except AttributeError:
+                        pass
+                else:
+                    ass = assembler
                 ass.to_pickle(dataname.split(".h5")[0] + "_assemblies.pickle")
-                try:
-                    data.close()
-                except AttributeError:
-                    pass
 
                 if cfg[
                     "uniquebodyparts"
@@ -57,6 +57,24 @@ class DLCTrans:
 
         return vec_a, vec_b
 
+    def embed(self, vecs):
+        """Embed keypoint features in a single batched forward pass.
+
+        Parameters
+        ----------
+        vecs : np.ndarray
+            Keypoint features of shape (n, num_kpts, feature_dim).
+
+        Returns
+        -------
+        np.ndarray
+            Embeddings of shape (n, embedding_dim).
+        """
+        device = next(self.model.parameters()).device
+        vecs = torch.from_numpy(np.asarray(vecs)).double().to(device)
+        with torch.no_grad():
+            return self.model(vecs).cpu().numpy()
+
     def __call__(self, inp_a, inp_b, zfill_width, feature_dict, return_features=False):
         # tracklets
         device = default_device('cuda')
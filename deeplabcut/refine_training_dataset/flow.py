@@ -0,0 +1,267 @@
+"""
+DeepLabCut2.2 Toolbox (deeplabcut.org)
+© A. & M. Mathis Labs
+https://github.com/DeepLabCut/DeepLabCut
+
+Please see AUTHORS for contributors.
+https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+Licensed under GNU Lesser General Public License v3.0
+
+Min-cost flow backends used to stitch tracklets.
+Every solver takes a networkx DiGraph whose nodes may have a "demand" and
+whose edges may have a "capacity" and an integer "weight", and returns the
+cost and the flow dictionary as networkx.capacity_scaling does.
+The compiled solver assumes the network has no negative cost cycle, which
+holds for the acyclic stitching graphs.
+"""
+import heapq
+
+import networkx as nx
+import numpy as np
+from numba import jit
+
+
+def graph_to_arrays(G):
+    """Convert a flow network into integer-indexed arrays.
+
+    Parameters
+    ----------
+    G : networkx.DiGraph
+        Flow network; missing capacities are infinite, missing weights are 0.
+
+    Returns
+    -------
+    nodes : list
+        Node labels, in graph order.
+    tails, heads, capacities, costs : numpy.ndarray
+        Integer edge arrays, in the order of ``G.edges``.
+    demands : numpy.ndarray
+        Node demands; negative values denote supplies.
+    """
+    nodes = list(G)
+    index = {node: i for i, node in enumerate(nodes)}
+    demands = np.array(
+        [G.nodes[node].get("demand", 0) for node in nodes], dtype=np.int64
+    )
+    n_edges = G.number_of_edges()
+    tails = np.empty(n_edges, dtype=np.int64)
+    heads = np.empty(n_edges, dtype=np.int64)
+    capacities = np.empty(n_edges, dtype=np.int64)
+    costs = np.empty(n_edges, dtype=np.int64)
+    # No more than the total supply can flow through any edge
+    infinite = max(1, int(demands[demands > 0].sum()))
+    for e, (u, v, attr) in enumerate(G.edges(data=True)):
+        tails[e] = index[u]
+        heads[e] = index[v]
+        capacities[e] = min(attr.get("capacity", infinite), infinite)
+        costs[e] = attr.get("weight", 0)
+    return nodes, tails, heads, capacities, costs, demands
+
+
+@jit(nopython=True, cache=True)
+def _initial_potentials(n_nodes, indptr, arc_heads, arc_caps, arc_costs):
+    # Shortest distances from a virtual root linked to all nodes,
+    # relaxing arcs in topological order when the network is acyclic.
+    potentials = np.zeros(n_nodes, dtype=np.int64)
+    indegree = np.zeros(n_nodes, dtype=np.int64)
+    for a in range(len(arc_heads)):
+        if arc_caps[a] > 0:
+            indegree[arc_heads[a]] += 1
+    stack = [u for u in range(n_nodes) if indegree[u] == 0]
+    n_sorted = 0
+    while stack:
+        u = stack.pop()
+        n_sorted += 1
+        for a in range(indptr[u], indptr[u + 1]):
+            if arc_caps[a] > 0:
+                v = arc_heads[a]
+                potentials[v] = min(potentials[v], potentials[u] + arc_costs[a])
+                indegree[v] -= 1
+                if indegree[v] == 0:
+                    stack.append(v)
+    if n_sorted < n_nodes:  # Cycles; fall back to Bellman-Ford
+        for _ in range(n_nodes):
+            changed = False
+            for u in range(n_nodes):
+                for a in range(indptr[u], indptr[u + 1]):
+                    if arc_caps[a] > 0:
+                        v = arc_heads[a]
+                        if potentials[u] + arc_costs[a] < potentials[v]:
+                            potentials[v] = potentials[u] + arc_costs[a]
+                            changed = True
+            if not changed:
+                break
+    return potentials
+
+
+@jit(nopython=True, cache=True)
+def _successive_shortest_paths(
+    n_nodes, indptr, arc_heads, arc_caps, arc_costs, arc_rev, source, sink, required
+):
+    potentials = _initial_potentials(n_nodes, indptr, arc_heads, arc_caps, arc_costs)
+    inf = np.iinfo(np.int64).max
+    dist = np.empty(n_nodes, dtype=np.int64)
+    visited = np.empty(n_nodes, dtype=np.bool_)
+    prev_arc = np.empty(n_nodes, dtype=np.int64)
+    flow = 0
+    while flow < required:
+        dist[:] = inf
+        visited[:] = False
+        dist[source] = 0
+        heap = [(np.int64(0), source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if visited[u]:
+                continue
+            visited[u] = True
+            if u == sink:
+                break
+            for a in range(indptr[u], indptr[u + 1]):
+                v = arc_heads[a]
+                if arc_caps[a] > 0 and not visited[v]:
+                    nd = d + arc_costs[a] + potentials[u] - potentials[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        prev_arc[v] = a
+                        heapq.heappush(heap, (nd, v))
+        if not visited[sink]:
+            break
+        # Keep reduced costs nonnegative;
+        # unsettled nodes are at least as far as the sink.
+        for v in range(n_nodes):
+            if visited[v]:
+                potentials[v] += dist[v] - dist[sink]
+        push = required - flow
+        v = sink
+        while v != source:
+            a = prev_arc[v]
+            push = min(push, arc_caps[a])
+            v = arc_heads[arc_rev[a]]
+        v = sink
+        while v != source:
+            a = prev_arc[v]
+            arc_caps[a] -= push
+            arc_caps[arc_rev[a]] += push
+            v = arc_heads[arc_rev[a]]
+        flow += push
+    return flow
+
+
+def min_cost_flow(n_nodes, tails, heads, capacities, costs, demands):
+    """Solve a min-cost flow problem by successive shortest paths.
+
+    Parameters
+    ----------
+    n_nodes : int
+        Number of nodes.
+    tails, heads, capacities, costs : numpy.ndarray
+        Integer edge arrays.
+    demands : numpy.ndarray
+        Node demands; negative values denote supplies.
+
+    Returns
+    -------
+    numpy.ndarray
+        Flow through every edge.
+
+    Raises
+    ------
+    networkx.NetworkXUnfeasible
+        If the demands cannot be satisfied.
+    """
+    if demands.sum() != 0:
+        raise nx.NetworkXUnfeasible("Total node demand is not zero.")
+    # Route supplies and demands through a super source and a super sink.
+    source, sink = n_nodes, n_nodes + 1
+    supplies = np.flatnonzero(demands < 0)
+    sinks = np.flatnonzero(demands > 0)
+    all_tails = np.concatenate((tails, np.full(supplies.size, source), sinks))
+    all_heads = np.concatenate((heads, supplies, np.full(sinks.size, sink)))
+    all_caps = np.concatenate((capacities, -demands[supplies], demands[sinks]))
+    all_costs = np.concatenate(
+        (costs, np.zeros(supplies.size + sinks.size, dtype=np.int64))
+    )
+
+    # Residual arcs: every edge e yields a forward arc 2e and a backward arc 2e + 1,
+    # stored in CSR order by tail node.
+    n_edges = all_tails.size
+    n_original = tails.size
+    arc_tails = np.empty(2 * n_edges, dtype=np.int64)
+    arc_tails[::2] = all_tails
+    arc_tails[1::2] = all_heads
+    arc_heads = np.empty_like(arc_tails)
+    arc_heads[::2] = all_heads
+    arc_heads[1::2] = all_tails
+    arc_caps = np.zeros_like(arc_tails)
+    arc_caps[::2] = all_caps
+    arc_costs = np.empty_like(arc_tails)
+    arc_costs[::2] = all_costs
+    arc_costs[1::2] = -all_costs
+    order = np.argsort(arc_tails, kind="stable")
+    position = np.empty_like(order)
+    position[order] = np.arange(order.size)
+    arc_rev = position[order ^ 1]
+    indptr = np.zeros(n_nodes + 3, dtype=np.int64)
+    np.cumsum(np.bincount(arc_tails, minlength=n_nodes + 2), out=indptr[1:])
+    arc_caps = arc_caps[order]
+
+    required = int(-demands[supplies].sum())
+    flow = _successive_shortest_paths(
+        n_nodes + 2,
+        indptr,
+        arc_heads[order],
+        arc_caps,
+        arc_costs[order],
+        arc_rev,
+        source,
+        sink,
+        required,
+    )
+    if flow < required:
+        raise nx.NetworkXUnfeasible("No flow satisfying all demands.")
+    # Flow through an edge is the residual capacity of its backward arc.
+    return arc_caps[position[1 : 2 * n_original : 2]]
+
+
+def successive_shortest_paths(G):
+    """Compiled min-cost flow solver with the interface of nx.capacity_scaling."""
+    nodes, tails, heads, capacities, costs, demands = graph_to_arrays(G)
+    flow = min_cost_flow(len(nodes), tails, heads, capacities, costs, demands)
+    flow_dict = {node: dict() for node in nodes}
+    for u, v, f in zip(tails, heads, flow):
+        flow_dict[nodes[u]][nodes[v]] = int(f)
+    return int(flow @ costs), flow_dict
+
+
+FLOW_SOLVERS = {
+    "ssp": successive_shortest_paths,
+    "networkx": nx.capacity_scaling,
+}
+
+
+def solve_min_cost_flow(G, solver="networkx"):
+    """Solve the min-cost flow problem of a network with the given backend.
+
+    Parameters
+    ----------
+    G : networkx.DiGraph
+        Flow network.
+    solver : str or callable, optional (default="networkx")
+        Either a key of ``FLOW_SOLVERS`` ("ssp" for the compiled successive
+        shortest path solver, "networkx" for networkx.capacity_scaling),
+        or a function with the same signature.
+
+    Returns
+    -------
+    cost : int
+        Cost of the optimal flow.
+    flow_dict : dict
+        Flow through every edge, keyed by tail then head nodes.
+    """
+    if not callable(solver):
+        if solver not in FLOW_SOLVERS:
+            raise ValueError(
+                f"Unknown solver {solver}; must be one of {list(FLOW_SOLVERS)}."
+            )
+        solver = FLOW_SOLVERS[solver]
+    return solver(G)
@@ -29,6 +29,7 @@ from deeplabcut.utils import (
     frameselectiontools,
 )
 from deeplabcut.utils.auxfun_videos import VideoWriter
+from deeplabcut.utils.detection_store import DetectionStore, STORE_SUFFIX
 
 
 def find_outliers_in_raw_data(
@@ -50,7 +51,7 @@ def find_outliers_in_raw_data(
         Absolute path to the project config.yaml.
 
     pickled_file : str
-        Path to a *_full.pickle or *_assemblies.pickle.
+        Path to a *_full.pickle, *_full.store or *_assemblies.pickle.
 
     video_file : str
         Path to the corresponding video file for frame extraction.
@@ -83,12 +84,19 @@ def find_outliers_in_raw_data(
     if not pickle_name.startswith(video_name):
         raise ValueError("Video and pickle files do not match.")
 
-    with open(pickle_file, "rb") as file:
-        data = pickle.load(file)
-    if pickle_file.endswith("_full.pickle"):
+    if pickle_file.rstrip(os.sep).endswith(STORE_SUFFIX):
+        inds, data = find_outliers_in_raw_detections(
+            DetectionStore(pickle_file), threshold=pcutoff
+        )
+        with_annotations = False
+    elif pickle_file.endswith("_full.pickle"):
+        with open(pickle_file, "rb") as file:
+            data = pickle.load(file)
         inds, data = find_outliers_in_raw_detections(data, threshold=pcutoff)
         with_annotations = False
     elif pickle_file.endswith("_assemblies.pickle"):
+        with open(pickle_file, "rb") as file:
+            data = pickle.load(file)
         assemblies = dict()
         for k, lst in data.items():
             if k == "single":
@@ -125,8 +133,9 @@ def find_outliers_in_raw_detections(
 
     Parameter
     ----------
-    pickled_data : dict
-        Data in the *_full.pickle file obtained after `analyze_videos`.
+    pickled_data : dict or DetectionStore
+        Data in the *_full.pickle file (or *_full.store directory)
+        obtained after `analyze_videos`.
 
     algo : string, optional (default="uncertain")
         Outlier detection algorithm. Currently, only 'uncertain' is supported
@@ -148,10 +157,10 @@ def find_outliers_in_raw_detections(
     if algo != "uncertain":
         raise ValueError(f"Only method 'uncertain' is currently supported.")
 
-    try:
-        _ = pickled_data.pop("metadata")
-    except KeyError:
-        pass
+    if isinstance(pickled_data, DetectionStore):
+        return _find_outliers_in_detection_store(
+            pickled_data, threshold, kept_keypoints
+        )
 
     def get_frame_ind(s):
         return int(re.findall(r"\d+", s)[0])
@@ -159,6 +168,8 @@ def find_outliers_in_raw_detections(
     candidates = []
     data = dict()
     for frame_name, dict_ in pickled_data.items():
+        if frame_name == "metadata":
+            continue
         frame_ind = get_frame_ind(frame_name)
         temp_coords = dict_["coordinates"][0]
         temp = dict_["confidence"]
@@ -173,6 +184,33 @@ def find_outliers_in_raw_detections(
     return candidates, data
 
 
+def _find_outliers_in_detection_store(store, threshold, kept_keypoints=None):
+    """Columnar equivalent of the loop in `find_outliers_in_raw_detections`."""
+    peaks = store.peaks()
+    bpts = np.asarray(peaks["bodypart"])
+    frame_rows = store.peak_frames()
+    if kept_keypoints is None:
+        order = np.arange(len(bpts))
+    else:
+        # Keep peaks of the selected keypoints only, in the order they are listed
+        rank = np.full(store.n_bodyparts, -1)
+        rank[kept_keypoints] = np.arange(len(kept_keypoints))
+        rank = rank[bpts]
+        order = np.flatnonzero(rank >= 0)
+        order = order[np.lexsort((rank[order], frame_rows[order]))]
+    frame_rows = frame_rows[order]
+    values = np.c_[np.asarray(peaks["xy"])[order], np.asarray(peaks["confidence"])[order]]
+    frame_inds = store.frame_inds
+    n_low = np.bincount(
+        frame_rows, weights=values[:, 2] < threshold, minlength=len(frame_inds)
+    )
+    bounds = np.searchsorted(frame_rows, np.arange(len(frame_inds) + 1))
+    data = dict()
+    for row, frame_ind in enumerate(frame_inds):
+        data[frame_ind] = values[bounds[row] : bounds[row + 1]].squeeze()
+    return frame_inds[n_low > 0].tolist(), data
+
+
 def extract_outlier_frames(
     config,
     videos,
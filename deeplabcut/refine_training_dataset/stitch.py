@@ -1,4 +1,5 @@
 import matplotlib.pyplot as plt
+import multiprocessing
 import networkx as nx
 import numpy as np
 import os
@@ -11,8 +12,9 @@ import warnings
 from collections import defaultdict
 
 import deeplabcut
+from deeplabcut.refine_training_dataset.flow import solve_min_cost_flow
 from deeplabcut.utils.auxfun_videos import VideoWriter
-from functools import partial
+from functools import cached_property
 from deeplabcut.pose_estimation_tensorflow.lib.trackingutils import (
     calc_iou, TRACK_METHODS,
 )
@@ -21,9 +23,10 @@ from itertools import combinations, cycle
 from networkx.algorithms.flow import preflow_push
 from pathlib import Path
 from scipy.linalg import hankel
+from scipy.optimize import linear_sum_assignment
 from scipy.spatial.distance import directed_hausdorff
 from scipy.stats import mode
-from tqdm import trange
+from tqdm import tqdm
 
 
 class Tracklet:
@@ -86,6 +89,11 @@ class Tracklet:
 
     def __contains__(self, other_tracklet):
         """Test whether tracklets temporally overlap."""
+        if not (len(self) and len(other_tracklet)):
+            return False
+        # Disjoint time spans cannot share frames; only compare indices otherwise.
+        if self.start > other_tracklet.end or other_tracklet.start > self.end:
+            return False
         return np.isin(self.inds, other_tracklet.inds, assume_unique=True).any()
 
     def __repr__(self):
@@ -419,6 +427,295 @@ class Tracklet:
         return lines
 
 
+class TrackletIntervalIndex:
+    """Sorted-interval index over the time spans of tracklets.
+
+    Tracklets are sorted by start frame so that those starting in a given
+    frame range are found by binary search. Overlapping time spans are only
+    a necessary condition for tracklets to share frames; the frame indices
+    of such candidate pairs are compared exactly.
+
+    Parameters
+    ----------
+    tracklets : list of Tracklet
+        Tracklets to index; their order is only preserved among tracklets
+        starting at the same frame.
+    """
+
+    def __init__(self, tracklets):
+        self.tracklets = sorted(tracklets, key=lambda t: t.start)
+        self.starts = np.array([t.start for t in self.tracklets], dtype=float)
+        self.ends = np.array([t.end for t in self.tracklets], dtype=float)
+
+    def __len__(self):
+        return len(self.tracklets)
+
+    def following_pairs(self, max_gap):
+        """Return the index pairs (i, j) of tracklets j starting after tracklet i
+        ends, at most ``max_gap`` frames later; pairs are sorted by i, then j."""
+        lo = np.searchsorted(self.starts, self.ends, side="right")
+        hi = np.searchsorted(self.starts, self.ends + max_gap, side="right")
+        counts = hi - lo
+        inds1 = np.repeat(np.arange(len(self)), counts)
+        offsets = np.cumsum(counts) - counts
+        inds2 = lo[inds1] + np.arange(counts.sum()) - offsets[inds1]
+        return inds1, inds2
+
+    def overlapping_pairs(self):
+        """Yield the index pairs (i, j), with i < j, of tracklets sharing frames."""
+        stops = np.searchsorted(self.starts, self.ends, side="right")
+        for i, stop in enumerate(stops):
+            tracklet1 = self.tracklets[i]
+            for j in range(i + 1, stop):
+                if self.tracklets[j] in tracklet1:
+                    yield i, j
+
+    def max_gap(self):
+        """Return the largest time gap separating a tracklet from the next one.
+
+        For every tracklet, only the tracklet starting first after it ends
+        is considered, as it yields the smallest positive gap.
+        """
+        if len(self) < 2:
+            return 0
+        next_ = np.searchsorted(self.starts, self.ends[:-1], side="right")
+        valid = next_ < len(self)
+        if not valid.any():
+            return 0
+        return int((self.starts[next_[valid]] - self.ends[:-1][valid]).max())
+
+
+class TrackletFeatures:
+    """Endpoint features of tracklets, computed once to score many pairs at a time.
+
+    Affinities mirror the corresponding Tracklet methods, but are evaluated
+    for arrays of tracklet indices. The tracklets of a pair must not overlap
+    in time, which is always the case for the edges of the stitching graph.
+
+    Parameters
+    ----------
+    tracklets : list of Tracklet
+        Tracklets to be paired.
+    """
+
+    def __init__(self, tracklets):
+        self.tracklets = list(tracklets)
+        self.starts = np.array([t.start for t in self.tracklets])
+        self.ends = np.array([t.end for t in self.tracklets])
+        self._grams = dict()
+
+    def __len__(self):
+        return len(self.tracklets)
+
+    @cached_property
+    def centroids(self):
+        """First and last centroids, of shape (n_tracklets, 2, 2)."""
+        return np.stack([t.centroid[[0, -1]] for t in self.tracklets])
+
+    @cached_property
+    def velocities(self):
+        """Tail and head velocities, of shape (n_tracklets, 2, 2)."""
+        return np.stack(
+            [
+                [t.calc_velocity("tail", False), t.calc_velocity("head", False)]
+                for t in self.tracklets
+            ]
+        )
+
+    @cached_property
+    def bboxes(self):
+        """First and last bounding boxes, of shape (n_tracklets, 2, 4)."""
+        return np.stack([[t.calc_bbox(0), t.calc_bbox(-1)] for t in self.tracklets])
+
+    @cached_property
+    def xy(self):
+        """First and last keypoint coordinates.
+
+        Array of shape (n_tracklets, 2, n_bodyparts, 2).
+        """
+        return np.stack([t.xy[[0, -1]] for t in self.tracklets])
+
+    @cached_property
+    def identities(self):
+        return np.array([t.identity for t in self.tracklets])
+
+    def _order(self, inds1, inds2):
+        """Return the indices of the earlier and later tracklets of each pair."""
+        inds1, inds2 = np.asarray(inds1), np.asarray(inds2)
+        before = self.ends[inds1] < self.starts[inds2]
+        return np.where(before, inds1, inds2), np.where(before, inds2, inds1)
+
+    def distance(self, inds1, inds2):
+        """Distance between the facing centroids of the tracklets."""
+        first, second = self._order(inds1, inds2)
+        delta = self.centroids[first, 1] - self.centroids[second, 0]
+        return np.sqrt(np.sum(delta ** 2, axis=1))
+
+    def motion_affinity(self, inds1, inds2):
+        """Vectorized :meth:`Tracklet.motion_affinity_with`."""
+        first, second = self._order(inds1, inds2)
+        gap = (self.starts[second] - self.ends[first])[:, np.newaxis]
+        d1 = self.centroids[first, 1] + gap * self.velocities[first, 1]
+        d2 = self.centroids[second, 0] - gap * self.velocities[second, 0]
+        delta1 = self.centroids[second, 0] - d1
+        delta2 = self.centroids[first, 1] - d2
+        affinity = (
+            np.sqrt(np.sum(delta1 ** 2, axis=1)) + np.sqrt(np.sum(delta2 ** 2, axis=1))
+        ) / 2
+        return np.where(gap[:, 0] > 0, affinity, 0)
+
+    def box_overlap(self, inds1, inds2):
+        """Vectorized :meth:`Tracklet.box_overlap_with`."""
+        first, second = self._order(inds1, inds2)
+        bbox1 = self.bboxes[first, 1]
+        bbox2 = self.bboxes[second, 0]
+        x1 = np.maximum(bbox1[:, 0], bbox2[:, 0])
+        y1 = np.maximum(bbox1[:, 1], bbox2[:, 1])
+        x2 = np.minimum(bbox1[:, 2], bbox2[:, 2])
+        y2 = np.minimum(bbox1[:, 3], bbox2[:, 3])
+        wh = np.fmax(0, x2 - x1) * np.fmax(0, y2 - y1)
+        return wh / (
+            (bbox1[:, 2] - bbox1[:, 0]) * (bbox1[:, 3] - bbox1[:, 1])
+            + (bbox2[:, 2] - bbox2[:, 0]) * (bbox2[:, 3] - bbox2[:, 1])
+            - wh
+        )
+
+    def shape_dissimilarity(self, inds1, inds2):
+        """Vectorized :meth:`Tracklet.shape_dissimilarity_with`."""
+        first, second = self._order(inds1, inds2)
+        u = self.xy[first, 1]
+        v = self.xy[second, 0]
+        sqdist = np.sum((u[:, :, np.newaxis] - v[:, np.newaxis]) ** 2, axis=3)
+        dist_uv = sqdist.min(axis=2).max(axis=1)
+        dist_vu = sqdist.min(axis=1).max(axis=1)
+        dist = np.sqrt(np.maximum(dist_uv, dist_vu))
+        # scipy's handling of missing keypoints is kept for those pairs
+        for n in np.flatnonzero(np.isnan(dist)):
+            dist[n] = Tracklet.undirected_hausdorff(u[n], v[n])
+        return dist
+
+    def _gram(self, ind):
+        gram = self._grams.get(ind)
+        if gram is None:
+            hk = self.tracklets[ind].to_hankelet()
+            hk /= np.linalg.norm(hk)
+            size = min(hk.shape)
+            gram = (hk @ hk.T)[:size, :size]
+            self._grams[ind] = gram
+        return gram
+
+    def dynamic_dissimilarity(self, inds1, inds2):
+        """:meth:`Tracklet.dynamic_dissimilarity_with`, with each
+        tracklet's Hankel matrix built only once."""
+        dissimilarity = np.empty(len(inds1))
+        for n, (i, j) in enumerate(zip(inds1, inds2)):
+            gram1 = self._gram(i)
+            gram2 = self._gram(j)
+            size = min(gram1.shape[0], gram2.shape[0])
+            dissimilarity[n] = 2 - np.linalg.norm(
+                gram1[:size, :size] + gram2[:size, :size]
+            )
+        return dissimilarity
+
+
+class TrackletReIDScorer:
+    """Transformer re-ID costs of linking tracklets, computed in batch.
+
+    Keypoint features at the endpoints of the tracklets are read from the
+    feature shelf one frame at a time, embedded in batches, and cached, so that
+    every endpoint is looked up and embedded only once however many candidate
+    edges it belongs to. Instances are meant to be passed as
+    ``batch_weight_func`` to :meth:`TrackletStitcher.build_graph`.
+
+    Parameters
+    ----------
+    embed_func : callable
+        Function mapping keypoint features of shape (n, n_bodyparts, n_features)
+        to embeddings of shape (n, n_dims), such as
+        :meth:`deeplabcut.pose_tracking_pytorch.inference.DLCTrans.embed`.
+
+    feature_dict : dict-like
+        Keypoint features and coordinates of the assemblies, keyed by frame
+        name, as stored by ``transformer_reID``.
+
+    n_frames : int
+        Number of frames in the video, from which frame names are padded.
+
+    batch_size : int, optional (default=256)
+        Number of endpoints embedded per call to ``embed_func``.
+    """
+
+    def __init__(self, embed_func, feature_dict, n_frames, batch_size=256):
+        self.embed_func = embed_func
+        self.feature_dict = feature_dict
+        self.zfill_width = int(np.ceil(np.log10(n_frames)))
+        self.batch_size = batch_size
+        self._cache = dict()
+
+    @staticmethod
+    def _match_features(record, coords):
+        # Batched equivalent of query_feature_by_coord_in_img_space
+        diff = record["coordinates"][np.newaxis] - coords[:, np.newaxis]
+        diff[(diff > 9000) | (diff < 0)] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            match = np.argmin(np.nanmean(diff, axis=(2, 3)), axis=1)
+        return record["features"][match]
+
+    def embed(self, endpoints):
+        """Return the unit-norm embeddings of tracklet endpoints.
+
+        Parameters
+        ----------
+        endpoints : list of tuple
+            Frame indices and keypoint coordinates, of shape (n_bodyparts, 2).
+
+        Returns
+        -------
+        numpy.ndarray
+            Embeddings of shape (n_endpoints, n_dims).
+        """
+        keys = [(frame, coords.tobytes()) for frame, coords in endpoints]
+        to_query = defaultdict(dict)
+        for key, (frame, coords) in zip(keys, endpoints):
+            if key not in self._cache:
+                to_query[frame][key] = coords
+        new_keys = []
+        vecs = []
+        for frame, queries in to_query.items():
+            record = self.feature_dict["frame" + str(frame).zfill(self.zfill_width)]
+            new_keys.extend(queries)
+            vecs.append(self._match_features(record, np.stack(list(queries.values()))))
+        if vecs:
+            vecs = np.concatenate(vecs)
+            for i in range(0, len(vecs), self.batch_size):
+                embeddings = np.asarray(
+                    self.embed_func(vecs[i : i + self.batch_size]), dtype=float
+                )
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                embeddings /= np.maximum(norms, 1e-6)
+                self._cache.update(zip(new_keys[i : i + self.batch_size], embeddings))
+        return np.stack([self._cache[key] for key in keys])
+
+    def similarity(self, tracklets1, tracklets2):
+        """Cosine similarity between the last detection of every tracklet
+        in ``tracklets1`` and the first detection of its counterpart
+        in ``tracklets2``."""
+        emb1 = self.embed([(t.inds[-1], t.data[-1, :, :2]) for t in tracklets1])
+        emb2 = self.embed([(t.inds[0], t.data[0, :, :2]) for t in tracklets2])
+        return np.einsum("ij,ij->i", emb1, emb2)
+
+    def __call__(self, features, inds1, inds2):
+        """Costs of linking the pairs of tracklets, in [-1, 0]."""
+        if not len(inds1):
+            return np.empty(0)
+        tracklets = features.tracklets
+        similarity = self.similarity(
+            [tracklets[i] for i in inds1], [tracklets[j] for j in inds2]
+        )
+        return -(similarity + 1) / 2
+
+
 class TrackletStitcher:
     def __init__(
         self,
@@ -485,11 +782,12 @@ class TrackletStitcher:
         }
 
         # Store tracklets and corresponding negatives (those that overlap in time)
+        self._index = TrackletIntervalIndex(self.tracklets)
         self._lu_overlap = defaultdict(list)
-        for tracklet1, tracklet2 in combinations(self, 2):
-            if tracklet2 in tracklet1:
-                self._lu_overlap[tracklet1].append(tracklet2)
-                self._lu_overlap[tracklet2].append(tracklet1)
+        for i, j in self._index.overlapping_pairs():
+            tracklet1, tracklet2 = self._index.tracklets[i], self._index.tracklets[j]
+            self._lu_overlap[tracklet1].append(tracklet2)
+            self._lu_overlap[tracklet2].append(tracklet1)
 
     def __getitem__(self, item):
         return self.tracklets[item]
@@ -571,20 +869,9 @@ class TrackletStitcher:
     def n_frames(self):
         return self._last_frame - self._first_frame + 1
 
-    # TODO Avoid looping over all pairs of tracklets
     @staticmethod
     def compute_max_gap(tracklets):
-        gap = defaultdict(list)
-        for tracklet1, tracklet2 in combinations(tracklets, 2):
-            gap[tracklet1].append(tracklet1.time_gap_to(tracklet2))
-        max_gap = 0
-        for vals in gap.values():
-            for val in sorted(vals):
-                if val > 0:
-                    if val > max_gap:
-                        max_gap = val
-                    break
-        return max_gap
+        return TrackletIntervalIndex(tracklets).max_gap()
 
     def mine(self, n_samples):
         p = np.asarray([t.likelihood for t in self])
@@ -615,14 +902,37 @@ class TrackletStitcher:
         nodes=None,
         max_gap=None,
         weight_func=None,
+        batch_weight_func=None,
     ):
+        """Build the flow graph linking tracklets that may belong to the same track.
+
+        Parameters
+        ----------
+        nodes : list of Tracklet, optional
+            Tracklets to link; by default, all tracklets.
+
+        max_gap : int, optional
+            Maximal temporal gap between a pair of linked tracklets.
+            Automatically determined by default.
+
+        weight_func : callable, optional
+            Function of two tracklets returning the cost of linking them.
+
+        batch_weight_func : callable, optional
+            Function of a :class:`TrackletFeatures` and two arrays of tracklet
+            indices returning the costs of linking all pairs at once.
+            Used instead of ``weight_func`` if given. If neither is given,
+            costs default to :meth:`calculate_edge_weights`.
+        """
         if nodes is None:
-            nodes = self.tracklets
-        nodes = sorted(nodes, key=lambda t: t.start)
+            index = self._index
+        else:
+            index = TrackletIntervalIndex(nodes)
+        nodes = index.tracklets
         n_nodes = len(nodes)
 
         if not max_gap:
-            max_gap = int(1.5 * self.compute_max_gap(nodes))
+            max_gap = int(1.5 * index.max_gap())
 
         self.G = nx.DiGraph()
         self.G.add_node("source", demand=-self.n_tracks)
@@ -635,26 +945,24 @@ class TrackletStitcher:
         self.G.add_edges_from(zip(nodes_in, nodes_out), capacity=1)
         self.G.add_edges_from(zip(["source"] * n_nodes, nodes_in), capacity=1)
         self.G.add_edges_from(zip(nodes_out, ["sink"] * n_nodes), capacity=1)
-        if weight_func is None:
-            weight_func = self.calculate_edge_weight
-        for i in trange(n_nodes):
-            node_i = nodes[i]
-            end = node_i.end
-            for j in range(i + 1, n_nodes):
-                node_j = nodes[j]
-                start = node_j.start
-                gap = start - end
-                if gap > max_gap:
-                    break
-                elif gap > 0:
-                    # The algorithm works better with integer weights
-                    w = int(100 * weight_func(node_i, node_j))
-                    self.G.add_edge(
-                        self._mapping[node_i]["out"],
-                        self._mapping[node_j]["in"],
-                        weight=w,
-                        capacity=1,
-                    )
+        inds1, inds2 = index.following_pairs(max_gap)
+        if batch_weight_func is None and weight_func is None:
+            batch_weight_func = self.calculate_edge_weights
+        if batch_weight_func is not None:
+            weights = batch_weight_func(TrackletFeatures(nodes), inds1, inds2)
+        else:
+            weights = [
+                weight_func(nodes[i], nodes[j]) for i, j in zip(tqdm(inds1), inds2)
+            ]
+        self.G.add_edges_from(
+            (
+                self._mapping[nodes[i]]["out"],
+                self._mapping[nodes[j]]["in"],
+                # The algorithm works better with integer weights
+                {"weight": int(100 * w), "capacity": 1},
+            )
+            for i, j, w in zip(inds1, inds2, weights)
+        )
 
     def _update_edge_weights(self, weight_func):
         if self.G is None:
@@ -665,12 +973,26 @@ class TrackletStitcher:
                 w = weight_func(self._mapping_inv[node1], self._mapping_inv[node2])
                 self.G.edges[(node1, node2)]["weight"] = w
 
-    def stitch(self, add_back_residuals=True):
+    def stitch(self, add_back_residuals=True, solver="networkx"):
+        """Stitch tracklets by solving the min-cost flow problem on the graph.
+
+        Parameters
+        ----------
+        add_back_residuals : bool, optional (default=True)
+            Whether to add residuals back to the tracks.
+
+        solver : str or callable, optional (default="networkx")
+            Min-cost flow backend; "networkx" for networkx.capacity_scaling,
+            or "ssp" for the compiled successive shortest path solver, which
+            is much faster on large graphs. Both find a flow of minimal cost,
+            but may pick different paths among equally good ones.
+            See :func:`deeplabcut.refine_training_dataset.flow.solve_min_cost_flow`.
+        """
         if self.G is None:
             raise ValueError("Inexistent graph. Call `build_graph` first")
 
         try:
-            _, self.flow = nx.capacity_scaling(self.G)
+            _, self.flow = solve_min_cost_flow(self.G, solver)
             self.paths = self.reconstruct_paths()
         except nx.exception.NetworkXUnfeasible:
             warnings.warn("No optimal solution found. Employing black magic...")
@@ -741,7 +1063,7 @@ class TrackletStitcher:
                 self.build_graph(list(remaining_nodes), max_gap=np.inf)
                 self.G.nodes["source"]["demand"] = -incomplete_tracks
                 self.G.nodes["sink"]["demand"] = incomplete_tracks
-                _, self.flow = nx.capacity_scaling(self.G)
+                _, self.flow = solve_min_cost_flow(self.G, solver)
                 paths += self.reconstruct_paths()
             self.paths = paths
             if len(self.paths) != self.n_tracks:
@@ -757,6 +1079,178 @@ class TrackletStitcher:
             if add_back_residuals:
                 _ = self._finalize_tracks()
 
+    def stitch_windowed(
+        self,
+        window_size,
+        overlap=None,
+        max_gap=None,
+        weight_func=None,
+        batch_weight_func=None,
+        n_processes=1,
+        add_back_residuals=True,
+        solver="networkx",
+    ):
+        """Stitch tracklets over overlapping temporal windows.
+
+        Every window is solved independently as a small min-cost flow problem,
+        so that memory and time grow linearly with the video length. Tracks of
+        consecutive windows are then matched by solving an assignment problem
+        on the tracklets they share in the overlap; ties (e.g., when no
+        tracklet straddles a seam) are broken by the distance between tracks
+        at the seam. Each tracklet is finally kept in the window whose
+        central part contains its first frame.
+
+        Parameters
+        ----------
+        window_size : int
+            Number of frames per window.
+
+        overlap : int, optional
+            Number of frames shared by consecutive windows.
+            By default, a quarter of the window size.
+
+        max_gap : int, optional
+            Maximal temporal gap to allow between a pair of tracklets.
+            Automatically determined from all tracklets by default.
+
+        weight_func, batch_weight_func : callable, optional
+            Cost functions; see :meth:`build_graph`.
+            They must be picklable if windows are solved in parallel.
+
+        n_processes : int, optional (default=1)
+            Number of processes solving windows in parallel.
+
+        add_back_residuals : bool, optional (default=True)
+            Whether to add residuals back to the tracks.
+
+        solver : str or callable, optional (default="networkx")
+            Min-cost flow backend; see :meth:`stitch`.
+        """
+        if overlap is None:
+            overlap = window_size // 4
+        if not 0 <= overlap < window_size:
+            raise ValueError("The overlap must be smaller than the window size.")
+        if not max_gap:
+            max_gap = int(1.5 * self._index.max_gap())
+
+        step = window_size - overlap
+        n_windows = max(1, int(np.ceil((self.n_frames - overlap) / step)))
+        window_starts = self._first_frame + step * np.arange(n_windows)
+        # Seams lie in the middle of the overlaps, and split the video into
+        # the central parts of the windows.
+        seams = window_starts[1:] + overlap // 2
+        tracklets = self._index.tracklets
+        starts, ends = self._index.starts, self._index.ends
+        owners = np.searchsorted(seams, starts, side="right")
+
+        members = []
+        jobs = []
+        for start in window_starts:
+            inds = np.flatnonzero((starts < start + window_size) & (ends >= start))
+            members.append(inds)
+            jobs.append(
+                (
+                    [tracklets[i] for i in inds],
+                    self.n_tracks,
+                    self.min_length,
+                    max_gap,
+                    weight_func,
+                    batch_weight_func,
+                    solver,
+                )
+            )
+        if n_processes > 1 and n_windows > 1:
+            with multiprocessing.Pool(n_processes) as p:
+                window_paths = p.map(_stitch_window, jobs)
+        else:
+            window_paths = list(map(_stitch_window, jobs))
+        # Map paths back onto indices into all tracklets
+        window_paths = [
+            [inds[path] for path in paths] for inds, paths in zip(members, window_paths)
+        ]
+
+        # Chain the tracks of consecutive windows
+        lengths = np.array([len(t) for t in tracklets])
+        labels = [np.arange(len(window_paths[0]))]
+        n_labels = len(labels[0])
+        for k in range(1, n_windows):
+            paths1, paths2 = window_paths[k - 1], window_paths[k]
+            labels_ = np.full(len(paths2), -1)
+            if paths1 and paths2:
+                cost = self._seam_cost(paths1, paths2, seams[k - 1], lengths)
+                rows, cols = linear_sum_assignment(cost)
+                labels_[cols] = labels[k - 1][rows]
+            unmatched = labels_ == -1
+            labels_[unmatched] = n_labels + np.arange(unmatched.sum())
+            n_labels += unmatched.sum()
+            labels.append(labels_)
+
+        track_inds = [[] for _ in range(n_labels)]
+        assigned = np.zeros(len(tracklets), dtype=bool)
+        for k, (paths, labels_) in enumerate(zip(window_paths, labels)):
+            for path, label in zip(paths, labels_):
+                owned = path[owners[path] == k]
+                track_inds[label].extend(owned)
+                assigned[owned] = True
+        self.residuals.extend(tracklets[i] for i in np.flatnonzero(~assigned))
+
+        # Windows may disagree at the seams; tracklets overlapping
+        # others of the same track are treated as residuals.
+        paths = []
+        for inds in track_inds:
+            path, active = [], []
+            for i in sorted(inds, key=lambda i: starts[i]):
+                tracklet = tracklets[i]
+                active = [t for t in active if t.end >= tracklet.start]
+                if any(tracklet in other for other in active):
+                    self.residuals.append(tracklet)
+                else:
+                    path.append(tracklet)
+                    active.append(tracklet)
+            paths.append(path)
+        # Only keep the longest tracks, should windows disagree on their number.
+        n_frames = [sum(len(t) for t in path) for path in paths]
+        keep = set(np.argsort(n_frames, kind="stable")[::-1][: self.n_tracks])
+        for n, path in enumerate(paths):
+            if n not in keep:
+                self.residuals.extend(path)
+        self.paths = [path for n, path in enumerate(paths) if n in keep and path]
+        if len(self.paths) != self.n_tracks:
+            warnings.warn(f"Only {len(self.paths)} tracks could be reconstructed.")
+        if not self.paths:
+            raise ValueError(
+                f"Could not reconstruct {self.n_tracks} tracks from the tracklets given."
+            )
+
+        self.tracks = np.asarray([sum(path) for path in self.paths])
+        if add_back_residuals:
+            _ = self._finalize_tracks()
+
+    def _seam_cost(self, paths1, paths2, seam, lengths):
+        """Cost of matching the tracks of two consecutive windows."""
+        labels2 = dict()
+        for n, path in enumerate(paths2):
+            labels2.update(dict.fromkeys(path.tolist(), n))
+        shared = np.zeros((len(paths1), len(paths2)))
+        for n, path in enumerate(paths1):
+            for i in path:
+                if i in labels2:
+                    shared[n, labels2[i]] += lengths[i]
+        pos1 = np.stack([self._position_at(path, seam) for path in paths1])
+        pos2 = np.stack([self._position_at(path, seam) for path in paths2])
+        dist = np.linalg.norm(pos1[:, np.newaxis] - pos2, axis=2)
+        dist = np.nan_to_num(dist, nan=np.nanmax(dist, initial=0))
+        # Shared frames prevail over distances
+        return dist - shared * (dist.max() + 1)
+
+    def _position_at(self, path, frame):
+        """Centroid of a track at the frame closest to ``frame``."""
+        tracklets = [self._index.tracklets[i] for i in path]
+        gaps = [max(t.start - frame, frame - t.end, 0) for t in tracklets]
+        tracklet = tracklets[int(np.argmin(gaps))]
+        ind = np.clip(np.searchsorted(tracklet.inds, frame), 0, len(tracklet) - 1)
+        return tracklet.centroid[ind]
+
     def _finalize_tracks(self):
         residuals = [res for res in sorted(self.residuals, key=len) if len(res) > 1]
         # Cycle through the residuals and incorporate back those
@@ -903,6 +1397,11 @@ class TrackletStitcher:
         # Default to the distance cost function
         return tracklet1.distance_to(tracklet2)
 
+    @staticmethod
+    def calculate_edge_weights(features, inds1, inds2):
+        # Batched counterpart of `calculate_edge_weight`
+        return features.distance(inds1, inds2)
+
     @property
     def weights(self):
         if self.G is None:
@@ -987,6 +1486,54 @@ class TrackletStitcher:
                 return path
 
 
+def _identity_weight_func(features, inds1, inds2):
+    """Favor stitching tracklets of the same predicted identity."""
+    w = np.where(features.identities[inds1] == features.identities[inds2], 0.01, 1)
+    return w * TrackletStitcher.calculate_edge_weights(features, inds1, inds2)
+
+
+def _stitch_window(args):
+    """Stitch the tracklets of a temporal window in a (worker) process.
+
+    ``args`` holds the window's tracklets sorted by start frame, followed by
+    the number of tracks, the minimal tracklet length, the maximal gap, the
+    cost functions and the min-cost flow solver. Paths are returned as arrays
+    of indices into the tracklets.
+    """
+    (
+        tracklets,
+        n_tracks,
+        min_length,
+        max_gap,
+        weight_func,
+        batch_weight_func,
+        solver,
+    ) = args
+    if not tracklets:
+        return []
+    stitcher = TrackletStitcher(
+        tracklets,
+        n_tracks,
+        min_length,
+        split_tracklets=False,
+        prestitch_residuals=False,
+    )
+    stitcher.build_graph(
+        max_gap=max_gap,
+        weight_func=weight_func,
+        batch_weight_func=batch_weight_func,
+    )
+    try:
+        stitcher.stitch(add_back_residuals=False, solver=solver)
+    except ValueError:
+        return []
+    # Tracklets are already pure and sorted, so the stitcher preserves their order.
+    inds = {tracklet: i for i, tracklet in enumerate(stitcher.tracklets)}
+    return [
+        np.array([inds[t] for t in path], dtype=int) for path in stitcher.paths if path
+    ]
+
+
 def stitch_tracklets(
     config_path,
     videos,
@@ -1005,6 +1552,9 @@ def stitch_tracklets(
     output_name="",
     transformer_checkpoint="",
     save_as_csv=False,
+    window_size=None,
+    n_processes=1,
+    solver="networkx",
 ):
     """
     Stitch sparse tracklets into full tracks via a graph-based,
@@ -1086,6 +1636,20 @@ def stitch_tracklets(
     save_as_csv: bool, optional
         Whether to write the tracks to a CSV file too (False by default).
 
+    window_size : int, optional
+        If given, tracklets are stitched over overlapping windows of that many
+        frames rather than all at once, which bounds memory and computation
+        time on very long recordings. See ``TrackletStitcher.stitch_windowed``.
+
+    n_processes : int, optional
+        Number of processes stitching windows in parallel (1 by default).
+        Custom ``weight_func`` must then be picklable. Windows are always
+        stitched sequentially with ``transformer_checkpoint``.
+
+    solver : str, optional
+        Min-cost flow backend; "networkx" by default, or "ssp" for a compiled
+        solver that is much faster on long videos. See ``TrackletStitcher.stitch``.
+
     Returns
     -------
     A TrackletStitcher object
@@ -1114,26 +1678,6 @@ def stitch_tracklets(
 
         dlctrans = inference.DLCTrans(checkpoint=transformer_checkpoint)
 
-    def trans_weight_func(tracklet1, tracklet2, nframe, feature_dict):
-        zfill_width = int(np.ceil(np.log10(nframe)))
-        if tracklet1 < tracklet2:
-            ind_img1 = tracklet1.inds[-1]
-            coord1 = tracklet1.data[-1][:, :2]
-            ind_img2 = tracklet2.inds[0]
-            coord2 = tracklet2.data[0][:, :2]
-        else:
-            ind_img2 = tracklet2.inds[-1]
-            ind_img1 = tracklet1.inds[0]
-            coord2 = tracklet2.data[-1][:, :2]
-            coord1 = tracklet1.data[0][:, :2]
-        t1 = (coord1, ind_img1)
-        t2 = (coord2, ind_img2)
-
-        dist = dlctrans(t1, t2, zfill_width, feature_dict)
-        dist = (dist + 1) / 2
-
-        return -dist
-
     for video in vids:
         print("Processing... ", video)
         nframe = len(VideoWriter(video))
@@ -1162,23 +1706,34 @@ def stitch_tracklets(
                 pickle_file, n_tracks, min_length, split_tracklets, prestitch_residuals
             )
             with_id = any(tracklet.identity != -1 for tracklet in stitcher)
+            batch_weight_func = None
             if with_id and weight_func is None:
                 # Add in identity weighing before building the graph
-                def weight_func(t1, t2):
-                    w = 0.01 if t1.identity == t2.identity else 1
-                    return w * stitcher.calculate_edge_weight(t1, t2)
+                batch_weight_func = _identity_weight_func
 
             if transformer_checkpoint:
-                stitcher.build_graph(
-                    max_gap=max_gap,
-                    weight_func=partial(
-                        trans_weight_func, nframe=nframe, feature_dict=feature_dict
+                graph_kwargs = dict(
+                    batch_weight_func=TrackletReIDScorer(
+                        dlctrans.embed, feature_dict, nframe
                     ),
                 )
             else:
-                stitcher.build_graph(max_gap=max_gap, weight_func=weight_func)
-
-            stitcher.stitch()
+                graph_kwargs = dict(
+                    weight_func=weight_func,
+                    batch_weight_func=batch_weight_func,
+                )
+            if window_size:
+                stitcher.stitch_windowed(
+                    window_size,
+                    max_gap=max_gap,
+                    # The re-ID features cannot be shared across processes
+                    n_processes=1 if transformer_checkpoint else n_processes,
+                    solver=solver,
+                    **graph_kwargs,
+                )
+            else:
+                stitcher.build_graph(max_gap=max_gap, **graph_kwargs)
+                stitcher.stitch(solver=solver)
             if transformer_checkpoint:
                 stitcher.write_tracks(
                     output_name=output_name,
@@ -22,6 +22,7 @@ import numpy as np
 import pandas as pd
 
 from deeplabcut.utils import auxiliaryfunctions, conversioncode
+from deeplabcut.utils.detection_store import DetectionStore, STORE_SUFFIX
 from deeplabcut.generate_training_dataset import trainingsetmanipulation
 from deeplabcut.pose_estimation_tensorflow.lib.trackingutils import TRACK_METHODS
 
@@ -203,11 +204,15 @@ def SaveFullMultiAnimalData(data, metadata, dataname, suffix="_full"):
 def LoadFullMultiAnimalData(dataname):
     """ Save predicted data as h5 file and metadata as pickle file; created by predict_videos.py """
     data_file = dataname.split(".h5")[0] + "_full.pickle"
-    try:
-        with open(data_file, "rb") as handle:
-            data = pickle.load(handle)
-    except (pickle.UnpicklingError, FileNotFoundError):
-        data = shelve.open(data_file, flag="r")
+    store_path = dataname.split(".h5")[0] + STORE_SUFFIX
+    if DetectionStore.exists(store_path):
+        data = DetectionStore(store_path)
+    else:
+        try:
+            with open(data_file, "rb") as handle:
+                data = pickle.load(handle)
+        except (pickle.UnpicklingError, FileNotFoundError):
+            data = shelve.open(data_file, flag="r")
     with open(data_file.replace("_full.", "_meta."), "rb") as handle:
         metadata = pickle.load(handle)
     return data, metadata
@@ -0,0 +1,257 @@
+"""
+DeepLabCut2.2 Toolbox (deeplabcut.org)
+© A. & M. Mathis Labs
+https://github.com/DeepLabCut/DeepLabCut
+
+Please see AUTHORS for contributors.
+https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+Licensed under GNU Lesser General Public License v3.0
+"""
+import os
+import pickle
+import shutil
+from collections.abc import Mapping
+
+import numpy as np
+
+
+STORE_SUFFIX = "_full.store"
+
+
+class DetectionStore(Mapping):
+    """Columnar, memory-mapped storage of the raw multi-animal detections of a video.
+
+    The store behaves like the dictionary found in *_full.pickle files,
+    i.e., it maps "metadata" to the analysis metadata and frame names
+    (e.g., "frame0042") to dictionaries with "coordinates", "confidence",
+    and, if available, "identity" and "costs".
+    Detections are however kept in flat arrays on disk (one row per peak,
+    sorted by body part within a frame; one row per cost matrix), and
+    a frame is only rebuilt when it is accessed. Random access to any frame
+    is therefore cheap, and nothing needs to be unpickled upfront.
+
+    Frames are appended with ``store[frame_name] = detections`` when opened
+    with ``mode="w"``; ``close`` must then be called to persist the index.
+    Until then, the store is written to a temporary "*.partial" directory,
+    which is only renamed to ``path`` once complete; an interrupted analysis
+    therefore never leaves a store behind that looks complete.
+
+    Parameters
+    ----------
+    path: str
+        Path to the store directory, conventionally ending with "_full.store".
+
+    mode: str, optional (default="r")
+        "r" to read an existing store, "w" to create a new one.
+    """
+
+    def __init__(self, path, mode="r"):
+        if mode not in ("r", "w"):
+            raise ValueError(f"Invalid mode {mode}; must be either 'r' or 'w'.")
+        self.path = path
+        self.mode = mode
+        if mode == "w":
+            self._dir = path.rstrip(os.sep) + ".partial"
+            # Left over by an interrupted analysis
+            shutil.rmtree(self._dir, ignore_errors=True)
+            os.makedirs(self._dir)
+            self.metadata = dict()
+            self._keys = []
+            self._shapes = dict()
+            self._dtypes = dict()
+            self._cost_names = None
+            self._n_bodyparts = None
+            self._files = dict()
+        else:
+            with open(os.path.join(path, "index.pickle"), "rb") as file:
+                index = pickle.load(file)
+            self.metadata = index["metadata"]
+            self._keys = index["keys"]
+            self._shapes = index["shapes"]
+            self._dtypes = index["dtypes"]
+            self._cost_names = index["cost_names"]
+            self._n_bodyparts = index["n_bodyparts"]
+            self._dir = path
+            self._arrays = {name: self._load_column(name) for name in self._shapes}
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+
+    @staticmethod
+    def exists(path):
+        """Whether a complete store, i.e. with its index, exists at ``path``."""
+        return os.path.isfile(os.path.join(path, "index.pickle"))
+
+    def _column_path(self, name):
+        return os.path.join(self._dir, f"{name}.bin")
+
+    def _load_column(self, name):
+        shape = tuple(self._shapes[name])
+        dtype = np.dtype(self._dtypes[name])
+        if not np.prod(shape):  # Empty files cannot be memory-mapped
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=shape)
+
+    def _append(self, name, array):
+        array = np.ascontiguousarray(array)
+        if name not in self._files:
+            self._files[name] = open(self._column_path(name), "wb")
+            self._shapes[name] = [0, *array.shape[1:]]
+            self._dtypes[name] = array.dtype.str
+        elif array.dtype.str != self._dtypes[name]:
+            array = array.astype(self._dtypes[name])
+        self._files[name].write(array.tobytes())
+        self._shapes[name][0] += array.shape[0]
+
+    def __setitem__(self, key, value):
+        if self.mode != "w":
+            raise IOError("The store was opened in read-only mode.")
+        if key == "metadata":
+            self.metadata = value
+            return
+        if key in self._rows:
+            raise KeyError(f"{key} is already stored; frames cannot be overwritten.")
+
+        coords = value["coordinates"][0]
+        if self._n_bodyparts is None:
+            self._n_bodyparts = len(coords)
+        n_peaks = [len(xy) for xy in coords]
+        n = sum(n_peaks)
+        peak_start = self._shapes.get("xy", [0])[0]
+        if n:
+            self._append(
+                "bodypart",
+                np.repeat(np.arange(len(coords), dtype=np.int16), n_peaks),
+            )
+            self._append("xy", np.concatenate(coords))
+            self._append(
+                "confidence", np.concatenate(value["confidence"]).reshape((-1, 1))
+            )
+            if "identity" in value:
+                self._append("identity", np.concatenate(value["identity"]))
+
+        costs = value.get("costs")
+        block_start = self._shapes.get("blocks", [0])[0]
+        blocks = []
+        if costs:
+            if self._cost_names is None:
+                self._cost_names = list(next(iter(costs.values())))
+            for k, mats in costs.items():
+                n_sources, n_targets = mats[self._cost_names[0]].shape
+                value_start = self._shapes.get(self._cost_names[0], [0])[0]
+                blocks.append([k, n_sources, n_targets, value_start])
+                for name in self._cost_names:
+                    self._append(name, mats[name].ravel())
+        if blocks:
+            self._append("blocks", np.asarray(blocks, dtype=np.int64))
+        self._append(
+            "frames",
+            np.asarray(
+                [[peak_start, n, block_start, len(blocks), costs is not None]],
+                dtype=np.int64,
+            ),
+        )
+        self._keys.append(key)
+        self._rows[key] = len(self._keys) - 1
+
+    def __getitem__(self, key):
+        if key == "metadata":
+            return self.metadata
+        if self.mode == "w":
+            raise IOError("Frames can only be read once the store is closed.")
+        row = self._rows[key]
+        peak_start, n, block_start, n_blocks, has_costs = self._arrays["frames"][row]
+        sl = slice(peak_start, peak_start + n)
+        peaks = self.peaks()
+        splits = np.searchsorted(peaks["bodypart"][sl], np.arange(1, self._n_bodyparts))
+        xy = np.split(np.array(peaks["xy"][sl]), splits)
+        conf = np.split(np.array(peaks["confidence"][sl]), splits)
+        dict_ = {"coordinates": (xy,), "confidence": conf}
+        if "identity" in peaks:
+            dict_["identity"] = np.split(np.array(peaks["identity"][sl]), splits)
+        if has_costs:
+            costs = dict()
+            for k, n_sources, n_targets, start in self._arrays["blocks"][
+                block_start : block_start + n_blocks
+            ]:
+                stop = start + n_sources * n_targets
+                costs[int(k)] = {
+                    name: np.array(self._arrays[name][start:stop]).reshape(
+                        (n_sources, n_targets)
+                    )
+                    for name in self._cost_names
+                }
+            dict_["costs"] = costs
+        return dict_
+
+    def __iter__(self):
+        yield "metadata"
+        yield from self._keys
+
+    def __len__(self):
+        return len(self._keys) + 1
+
+    def __contains__(self, key):
+        return key == "metadata" or key in self._rows
+
+    @property
+    def n_bodyparts(self):
+        return self._n_bodyparts
+
+    @property
+    def frame_inds(self):
+        """Integer indices of the stored frames, in storage order."""
+        return np.asarray([int(key.replace("frame", "")) for key in self._keys])
+
+    def peaks(self):
+        """Return the flat peak table of all frames.
+
+        Returns
+        -------
+        dict
+            Memory-mapped arrays "bodypart", "xy", "confidence",
+            and "identity" if available, with one row per peak.
+        """
+        peaks = {
+            "bodypart": self._arrays.get("bodypart", np.empty(0, dtype=np.int16)),
+            "xy": self._arrays.get("xy", np.empty((0, 2))),
+            "confidence": self._arrays.get("confidence", np.empty((0, 1))),
+        }
+        if "identity" in self._arrays:
+            peaks["identity"] = self._arrays["identity"]
+        return peaks
+
+    def peak_frames(self):
+        """Return, for every peak, the row of its frame in storage order."""
+        frames = self._arrays.get("frames", np.empty((0, 5), dtype=np.int64))
+        return np.repeat(np.arange(len(frames)), frames[:, 1])
+
+    def close(self):
+        if self.mode != "w":
+            return
+        for file in self._files.values():
+            file.close()
+        self._files.clear()
+        index = {
+            "metadata": self.metadata,
+            "keys": self._keys,
+            "shapes": self._shapes,
+            "dtypes": self._dtypes,
+            "cost_names": self._cost_names,
+            "n_bodyparts": self._n_bodyparts or 0,
+        }
+        with open(os.path.join(self._dir, "index.pickle"), "wb") as file:
+            pickle.dump(index, file, pickle.HIGHEST_PROTOCOL)
+        if os.path.isdir(self.path):  # E.g., an incomplete or outdated store
+            shutil.rmtree(self.path)
+        os.replace(self._dir, self.path)
+        self._dir = self.path
+        self.mode = "r"
+        self._arrays = {name: self._load_column(name) for name in self._shapes}
+
+    @classmethod
+    def from_dict(cls, data, path):
+        """Convert detections loaded from a *_full.pickle file into a store."""
+        store = cls(path, mode="w")
+        for key, value in data.items():
+            store[key] = value
+        store.close()
+        return store
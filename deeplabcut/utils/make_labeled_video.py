@@ -18,11 +18,14 @@ import os
 # Dependencies
 ####################################################
 import os.path
+import subprocess
+import tempfile
 from pathlib import Path
 from functools import partial
 from multiprocessing import Pool
 from typing import Iterable
 
+import cv2
 import matplotlib.colors as mcolors
 import matplotlib.pyplot as plt
 import numpy as np
@@ -31,7 +34,7 @@ from matplotlib.animation import FFMpegWriter
 from matplotlib.collections import LineCollection
 from skimage.draw import disk, line_aa
 from skimage.util import img_as_ubyte
-from tqdm import trange
+from tqdm import tqdm, trange
 
 from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal, visualization
 from deeplabcut.utils.video_processor import (
@@ -55,6 +58,146 @@ def get_segment_indices(bodyparts2connect, all_bpts):
     return bpts2connect
 
 
+def _disk_offsets(radius):
+    """Row and column offsets of the pixels of a disk centered on a pixel,
+    as drawn by skimage.draw.disk."""
+    r = int(np.ceil(radius))
+    rr, cc = np.mgrid[-r : r + 1, -r : r + 1]
+    inside = rr ** 2 + cc ** 2 < radius ** 2
+    return rr[inside], cc[inside]
+
+
+class _LabelPainter:
+    """Draw the keypoints, their trails and the skeleton onto video frames.
+
+    Keypoints are stamped all at once with a precomputed disk mask,
+    centered on the pixel nearest to each keypoint.
+    """
+
+    def __init__(
+        self,
+        df_x,
+        df_y,
+        df_likelihood,
+        pcutoff,
+        dotsize,
+        trailpoints,
+        inds,
+        colors,
+        links,
+        skeleton_color,
+        shape,
+    ):
+        self.df_x = df_x
+        self.df_y = df_y
+        self.df_likelihood = df_likelihood
+        self.pcutoff = pcutoff
+        self.trailpoints = trailpoints
+        self.inds = np.asarray(inds, dtype=int)
+        self.colors = np.asarray(colors, dtype=np.uint8).reshape((-1, 3))
+        self.links = np.asarray(links, dtype=int).reshape((-1, 2))
+        self.skeleton_color = skeleton_color
+        self.shape = shape
+        self._rr, self._cc = _disk_offsets(dotsize)
+
+    def draw(self, image, index):
+        ny, nx = self.shape
+        # Draw the skeleton for specific bodyparts to be connected as
+        # specified in the config file
+        if self.links.size:
+            x = self.df_x[self.links, index]
+            y = self.df_y[self.links, index]
+            valid = np.all(self.df_likelihood[self.links, index] > self.pcutoff, axis=1)
+            valid &= ~(np.isnan(x).any(axis=1) | np.isnan(y).any(axis=1))
+            for (x1, x2), (y1, y2) in zip(x[valid], y[valid]):
+                rr, cc, _ = line_aa(
+                    int(np.clip(y1, 0, ny - 1)),
+                    int(np.clip(x1, 0, nx - 1)),
+                    int(np.clip(y2, 1, ny - 1)),
+                    int(np.clip(x2, 1, nx - 1)),
+                )
+                image[rr, cc] = self.skeleton_color
+
+        # Stamp the trails, then the current position, of all visible keypoints
+        shown = self.df_likelihood[self.inds, index] > self.pcutoff
+        frames = np.r_[index - np.arange(1, min(self.trailpoints, index + 1)), index]
+        x = self.df_x[self.inds[shown, None], frames].ravel()
+        y = self.df_y[self.inds[shown, None], frames].ravel()
+        colors = np.repeat(self.colors[shown], frames.size, axis=0)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        rows = np.rint(y[valid]).astype(int)[:, None] + self._rr
+        cols = np.rint(x[valid]).astype(int)[:, None] + self._cc
+        inside = (rows >= 0) & (rows < ny) & (cols >= 0) & (cols < nx)
+        colors = np.broadcast_to(colors[valid, None], (*rows.shape, 3))
+        image[rows[inside], cols[inside]] = colors[inside]
+        return image
+
+
+def _seek(cap, index):
+    """Position a cv2.VideoCapture at a frame, even if seeking is inaccurate."""
+    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != index:
+        # With inter-frame codecs, OpenCV may land on a nearby keyframe instead;
+        # decode the frames up to the requested one from the start of the video.
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        for _ in range(index):
+            if not cap.grab():
+                break
+
+
+def _render_frames(video, output_path, codec, fps, sw, sh, bbox, painter, start, stop):
+    """Render the frames [start, stop) of a video into its own file."""
+    clip = vp(fname=video, sname=output_path, codec=codec, sw=sw, sh=sh, fps=fps)
+    _seek(clip.vid, start)
+    with np.errstate(invalid="ignore"):
+        for index in range(start, stop):
+            image = clip.load_frame()
+            if image is None:
+                break
+            if bbox is not None:
+                x1, x2, y1, y2 = bbox
+                image = image[y1:y2, x1:x2]
+            clip.save_frame(painter.draw(image, index))
+    clip.close()
+    return stop - start
+
+
+def _render_segment(job):
+    return _render_frames(*job)
+
+
+def _concatenate_videos(videos, output_path):
+    """Concatenate videos encoded alike into one file, without re-encoding them."""
+    import imageio_ffmpeg
+
+    list_file = output_path + ".txt"
+    with open(list_file, "w") as f:
+        for video in videos:
+            path = os.path.abspath(video).replace("'", r"'\''")
+            f.write(f"file '{path}'\n")
+    try:
+        subprocess.run(
+            [
+                imageio_ffmpeg.get_ffmpeg_exe(),
+                "-y",
+                "-v",
+                "error",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_file,
+                "-c",
+                "copy",
+                output_path,
+            ],
+            check=True,
+        )
+    finally:
+        os.remove(list_file)
+
+
 def CreateVideo(
     clip,
     Dataframe,
@@ -73,10 +216,18 @@ def CreateVideo(
     draw_skeleton,
     displaycropped,
     color_by,
+    n_processes=1,
 ):
-    """Creating individual frames with labeled body parts and making a video"""
+    """Creating individual frames with labeled body parts and making a video
+
+    With n_processes > 1, the video is split into as many frame ranges,
+    each rendered by its own process into a separate file;
+    these are then concatenated without re-encoding.
+    """
     bpts = Dataframe.columns.get_level_values("bodyparts")
     all_bpts = bpts.values[::3]
+    bpts2connect = []
+    color_for_skeleton = None
     if draw_skeleton:
         color_for_skeleton = (
             np.array(mcolors.to_rgba(skeleton_color))[:3] * 255
@@ -130,56 +281,65 @@ def CreateVideo(
         for i, j in enumerate(nbpts_per_ind):
             map2id.extend([i] * j)
     keep = np.flatnonzero(np.isin(all_bpts, bodyparts2plot))
-    bpts2color = [(ind, map2bp[ind], map2id[ind]) for ind in keep]
 
     if color_by == "bodypart":
         C = colorclass.to_rgba(np.linspace(0, 1, nbodyparts))
+        color_inds = [map2bp[ind] for ind in keep]
     else:
         C = colorclass.to_rgba(np.linspace(0, 1, nindividuals))
+        color_inds = [map2id[ind] for ind in keep]
     colors = (C[:, :3] * 255).astype(np.uint8)
 
+    painter = _LabelPainter(
+        df_x,
+        df_y,
+        df_likelihood,
+        pcutoff,
+        dotsize,
+        trailpoints,
+        keep,
+        colors[color_inds],
+        bpts2connect,
+        color_for_skeleton,
+        (ny, nx),
+    )
+    nframes = min(nframes, len(Dataframe))
+    bbox = (x1, x2, y1, y2) if displaycropped else None
+    if n_processes > 1:
+        # The output is written by ffmpeg from the rendered segments
+        clip.close()
+        output_path = os.path.abspath(clip.sname)
+        name, ext = os.path.splitext(os.path.basename(output_path))
+        bounds = np.linspace(0, nframes, n_processes + 1).astype(int)
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path)) as tmpdir:
+            jobs = [
+                (
+                    clip.fname,
+                    os.path.join(tmpdir, f"{name}_{i}{ext}"),
+                    clip.codec,
+                    clip.FPS,
+                    clip.sw,
+                    clip.sh,
+                    bbox,
+                    painter,
+                    start,
+                    stop,
+                )
+                for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))
+                if stop > start
+            ]
+            with Pool(len(jobs)) as pool, tqdm(total=nframes) as pbar:
+                for n in pool.imap_unordered(_render_segment, jobs):
+                    pbar.update(n)
+            _concatenate_videos([job[1] for job in jobs], output_path)
+        return
+
     with np.errstate(invalid="ignore"):
-        for index in trange(min(nframes, len(Dataframe))):
+        for index in trange(nframes):
             image = clip.load_frame()
-            if displaycropped:
+            if bbox is not None:
                 image = image[y1:y2, x1:x2]
-
-            # Draw the skeleton for specific bodyparts to be connected as
-            # specified in the config file
-            if draw_skeleton:
-                for bpt1, bpt2 in bpts2connect:
-                    if np.all(df_likelihood[[bpt1, bpt2], index] > pcutoff) and not (
-                        np.any(np.isnan(df_x[[bpt1, bpt2], index]))
-                        or np.any(np.isnan(df_y[[bpt1, bpt2], index]))
-                    ):
-                        rr, cc, val = line_aa(
-                            int(np.clip(df_y[bpt1, index], 0, ny - 1)),
-                            int(np.clip(df_x[bpt1, index], 0, nx - 1)),
-                            int(np.clip(df_y[bpt2, index], 1, ny - 1)),
-                            int(np.clip(df_x[bpt2, index], 1, nx - 1)),
-                        )
-                        image[rr, cc] = color_for_skeleton
-
-            for ind, num_bp, num_ind in bpts2color:
-                if df_likelihood[ind, index] > pcutoff:
-                    if color_by == "bodypart":
-                        color = colors[num_bp]
-                    else:
-                        color = colors[num_ind]
-                    if trailpoints > 0:
-                        for k in range(1, min(trailpoints, index + 1)):
-                            rr, cc = disk(
-                                (df_y[ind, index - k], df_x[ind, index - k]),
-                                dotsize,
-                                shape=(ny, nx),
-                            )
-                            image[rr, cc] = color
-                    rr, cc = disk(
-                        (df_y[ind, index], df_x[ind, index]), dotsize, shape=(ny, nx)
-                    )
-                    image[rr, cc] = color
-
-            clip.save_frame(image)
+            clip.save_frame(painter.draw(image, index))
     clip.close()
 
 
@@ -364,6 +524,7 @@ def create_labeled_video(
     color_by="bodypart",
     modelprefix="",
     track_method="",
+    n_processes=1,
 ):
     """Labels the bodyparts in a video.
 
@@ -472,6 +633,13 @@ def create_labeled_video(
         For multiple animals, must be either 'box', 'skeleton', or 'ellipse' and will
         be taken from the config.yaml file if none is given.
 
+    n_processes: int, optional, default=1
+        Number of processes rendering every video in fast mode. If greater than 1,
+        each video is split into as many frame ranges rendered in parallel, which
+        are then concatenated without re-encoding; videos are then processed one
+        after the other rather than in parallel. Ignored if ``fastmode`` is False
+        or ``keypoints_only`` is True.
+
     Returns
     -------
     None
@@ -574,10 +742,16 @@ def create_labeled_video(
         displaycropped,
         fastmode,
         keypoints_only,
+        n_processes=n_processes,
     )
 
-    with Pool(min(os.cpu_count(), len(Videos))) as pool:
-        pool.map(func, Videos)
+    if n_processes > 1 and fastmode and not keypoints_only:
+        # Pool workers cannot spawn processes of their own
+        for video in Videos:
+            func(video)
+    else:
+        with Pool(min(os.cpu_count(), len(Videos))) as pool:
+            pool.map(func, Videos)
 
     os.chdir(start_path)
 
@@ -605,6 +779,7 @@ def proc_video(
     fastmode,
     keypoints_only,
     video,
+    n_processes=1,
 ):
     """Helper function for create_videos
 
@@ -734,6 +909,7 @@ def proc_video(
                     skeleton_color=skeleton_color,
                     trailpoints=trailpoints,
                     fps=outputframerate,
+                    n_processes=n_processes,
                 )
 
         except FileNotFoundError as e:
@@ -756,6 +932,7 @@ def _create_labeled_video(
     codec="mp4v",
     fps=None,
     output_path="",
+    n_processes=1,
 ):
     if color_by not in ("bodypart", "individual"):
         raise ValueError("`color_by` should be either 'bodypart' or 'individual'.")
@@ -811,6 +988,7 @@ def _create_labeled_video(
         bool(skeleton_edges),
         display_cropped,
         color_by,
+        n_processes,
     )
 
 
@@ -966,10 +1144,9 @@ def create_video_with_all_detections(
         if not (os.path.isfile(outputname)):
             print("Creating labeled video for ", str(Path(video).stem))
             h5file = full_pickle.replace("_full.pickle", ".h5")
+            # Frames are read lazily, so that detection stores are never fully decoded
             data, _ = auxfun_multianimal.LoadFullMultiAnimalData(h5file)
-            data = dict(data)  # Cast to dict (making a copy) so items can safely be popped
-
-            header = data.pop("metadata")
+            header = data["metadata"]
             all_jointnames = header["all_joints_names"]
 
             if displayedbodyparts == "all":
@@ -982,8 +1159,11 @@ def create_video_with_all_detections(
                         bpts.append(bptindex)
                 numjoints = len(bpts)
 
-            frame_names = list(data)
-            frames = [int(re.findall(r"\d+", name)[0]) for name in frame_names]
+            frame_names = {
+                int(re.findall(r"\d+", name)[0]): name
+                for name in data
+                if name != "metadata"
+            }
             colorclass = plt.cm.ScalarMappable(cmap=cfg["colormap"])
             C = colorclass.to_rgba(np.linspace(0, 1, numjoints))
             colors = (C[:, :3] * 255).astype(np.uint8)
@@ -997,18 +1177,17 @@ def create_video_with_all_detections(
                 frame = clip.load_frame()
                 if frame is None:
                     continue
-                try:
-                    ind = frames.index(n)
-                    dets = Assembler._flatten_detections(data[frame_names[ind]])
+                name = frame_names.get(n)
+                if name is None:  # No data stored for that particular frame
+                    print(n, "no data")
+                else:
+                    dets = Assembler._flatten_detections(data[name])
                     for det in dets:
                         if det.label not in bpts or det.confidence < pcutoff:
                             continue
                         x, y = det.pos
                         rr, cc = disk((y, x), dotsize, shape=(ny, nx))
                         frame[rr, cc] = colors[bpts.index(det.label)]
-                except ValueError:  # No data stored for that particular frame
-                    print(n, "no data")
-                    pass
                 try:
                     clip.save_frame(frame)
                 except:
@@ -118,3 +118,41 @@ def evaluation_data_and_metadata_montblanc():
     with open(metadata_file, "rb") as file:
         metadata = pickle.load(file)
     return data, metadata
+
+
+@pytest.fixture(scope="function")
+def make_synthetic_detections():
+    """Return a factory of raw detections, as found in *_full.pickle files."""
+    from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal
+
+    def make(n_frames, n_bodyparts=4, seed=0):
+        rng = np.random.default_rng(seed)
+        h, w = 20, 24
+        graph = [[i, j] for i in range(n_bodyparts) for j in range(i + 1, n_bodyparts)]
+        scmaps = rng.random((n_frames, h, w, n_bodyparts)).astype(np.float32)
+        locrefs = rng.standard_normal((n_frames, h, w, n_bodyparts, 2)).astype(
+            np.float32
+        )
+        pafs = rng.standard_normal((n_frames, h, w, len(graph), 2)).astype(np.float32)
+        peaks = [
+            [i, rng.integers(h), rng.integers(w), j]
+            for i in range(n_frames)
+            for j in range(n_bodyparts)
+            for _ in range(rng.integers(1, 4))
+        ]
+        paf_inds = list(range(len(graph)))
+        preds = predict_multianimal.compute_peaks_and_costs(
+            scmaps, locrefs, pafs, np.asarray(peaks), graph, paf_inds, 8, 0
+        )
+        data = {
+            "metadata": {
+                "all_joints_names": [f"bpt{i}" for i in range(n_bodyparts)],
+                "PAFgraph": graph,
+                "PAFinds": np.arange(len(graph)),
+            }
+        }
+        for i, pred in enumerate(preds):
+            data[f"frame{i:02d}"] = pred
+        return data
+
+    return make
@@ -1,5 +1,7 @@
 import numpy as np
+import pandas as pd
 import pickle
+import pytest
 from deeplabcut.pose_estimation_tensorflow.lib import crossvalutils
 
 
@@ -96,3 +98,75 @@ def test_benchmark_paf_graphs_montblanc(evaluation_data_and_metadata_montblanc):
     np.testing.assert_equal(
         vals, results_gt[0].iloc[-4:, -1].to_numpy(),
     )
+
+
+def _make_synthetic_evaluation_data(
+    make_synthetic_detections, n_frames, n_bodyparts=5, seed=0
+):
+    detections = make_synthetic_detections(n_frames, n_bodyparts, seed)
+    rng = np.random.default_rng(seed)
+    individuals = ["a", "b", "c"]
+    bodyparts = detections["metadata"]["all_joints_names"]
+    index = pd.MultiIndex.from_product(
+        [individuals, bodyparts, ["x", "y"]],
+        names=["individuals", "bodyparts", "coords"],
+    )
+    data = {"metadata": detections.pop("metadata")}
+    for imname, pred in detections.items():
+        gt = pd.Series(rng.uniform(0, 190, len(index)), index=index)
+        data[imname] = {"prediction": pred, "groundtruth": [None, None, gt]}
+    cfg = {
+        "individuals": individuals,
+        "uniquebodyparts": [],
+        "multianimalbodyparts": bodyparts,
+    }
+    return cfg, data
+
+
+def test_benchmark_paf_graphs_parallel(make_synthetic_detections):
+    cfg, data = _make_synthetic_evaluation_data(make_synthetic_detections, 20)
+    inference_cfg = {"topktoretain": 3, "pcutoff": 0.1, "pafthreshold": 0.1}
+    graphs = [list(range(10)), [0, 1, 2, 3], [0, 1, 2, 3, 5, 7]]
+    split_inds = [list(range(0, 20, 2)), list(range(1, 20, 2))]
+    results = [
+        crossvalutils._benchmark_paf_graphs(
+            cfg,
+            inference_cfg,
+            dict(data),
+            graphs,
+            split_inds=split_inds,
+            n_processes=n_processes,
+        )
+        for n_processes in (1, 2)
+    ]
+    for (scores1, paf1), (scores2, paf2) in zip(results[0][0], results[1][0]):
+        np.testing.assert_array_equal(scores1, scores2)
+        assert paf1 == paf2
+    assert [len(paf) for _, paf in results[0][0]] == [4, 6, 10]
+    pd.testing.assert_frame_equal(results[0][1], results[1][1])
+    assert repr(results[0][2]) == repr(results[1][2])
+    for (ass1, _, _), (ass2, _, _) in zip(results[0][3], results[1][3]):
+        assert ass1.keys() == ass2.keys()
+        for i in ass1:
+            np.testing.assert_array_equal(ass1.data(i), ass2.data(i))
+
+
+@pytest.mark.parametrize("patience, n_benchmarked", [(None, 6), (2, 4), (1, 3)])
+def test_benchmark_paf_graphs_early_stopping(
+    monkeypatch, make_synthetic_detections, patience, n_benchmarked
+):
+    cfg, data = _make_synthetic_evaluation_data(make_synthetic_detections, 4)
+    purities = iter([0.5, 0.7, 0.7, 0.6, 0.9, 0.9])
+
+    def benchmark(context, paf):
+        scores = np.zeros((len(context["ground_truth"]), 2))
+        scores[:, 1] = next(purities)
+        return scores, None, None, None
+
+    monkeypatch.setattr(crossvalutils, "_benchmark_paf_graph", benchmark)
+    inference_cfg = {"topktoretain": 3, "pcutoff": 0.1, "pafthreshold": 0.1}
+    graphs = [list(range(n)) for n in range(4, 10)]
+    results = crossvalutils._benchmark_paf_graphs(
+        cfg, inference_cfg, data, graphs, n_processes=1, patience=patience
+    )
+    assert len(results[0]) == n_benchmarked
@@ -70,4 +70,17 @@ def test_keypoint_horizontal_flip(
     for pair in pairs:
         temp[:, pair] = temp[:, pair[::-1]]
     keypoints_unaug = temp.reshape((-1, 2))
-    np.testing.assert_allclose(keypoints_unaug, keypoints_flipped)
\ No newline at end of file
+    np.testing.assert_allclose(keypoints_unaug, keypoints_flipped)
+
+
+def test_update_resize():
+    image = np.zeros((100, 120, 3), dtype=np.uint8)
+    keypoints = np.array([[60.0, 50.0]])
+    pipeline = iaa.Sequential(
+        [iaa.Fliplr(0.5), iaa.Resize({"height": 50, "width": 60}, name="resize")]
+    )
+    for height, width in [(50, 60), (80, 90), (200, 240)]:
+        augmentation.update_resize(pipeline, height, width)
+        images_aug, keypoints_aug = pipeline(images=[image], keypoints=[keypoints])
+        assert images_aug[0].shape == (height, width, 3)
+        np.testing.assert_allclose(keypoints_aug[0][0, 1], 50 * height / 100)
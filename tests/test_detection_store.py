@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal
+from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils
+from deeplabcut.refine_training_dataset.outlier_frames import (
+    find_outliers_in_raw_detections,
+)
+from deeplabcut.utils.detection_store import DetectionStore
+
+
+N_BODYPARTS = 4
+GRAPH = [[0, 1], [1, 2], [2, 3], [0, 3]]
+
+
+def _make_detections(n_frames, n_id_channels=0, seed=0):
+    rng = np.random.default_rng(seed)
+    h, w = 20, 24
+    n_channels = N_BODYPARTS + n_id_channels
+    scmaps = rng.random((n_frames, h, w, n_channels)).astype(np.float32)
+    locrefs = rng.standard_normal((n_frames, h, w, N_BODYPARTS, 2)).astype(np.float32)
+    pafs = rng.standard_normal((n_frames, h, w, len(GRAPH), 2)).astype(np.float32)
+    peaks = []
+    for i in range(n_frames):
+        for j in range(N_BODYPARTS):
+            if i % 4 == 1 and j == 2:
+                continue  # Missing body part
+            for _ in range(rng.integers(0, 4)):
+                peaks.append([i, rng.integers(h), rng.integers(w), j])
+    peaks = np.asarray(peaks, dtype=np.int32)
+    preds = predict_multianimal.compute_peaks_and_costs(
+        scmaps,
+        locrefs,
+        pafs,
+        peaks,
+        GRAPH,
+        list(range(len(GRAPH))),
+        8,
+        n_id_channels,
+    )
+    data = {
+        "metadata": {
+            "all_joints_names": [f"bpt{i}" for i in range(N_BODYPARTS)],
+            "PAFgraph": GRAPH,
+            "PAFinds": np.arange(len(GRAPH)),
+        }
+    }
+    for i, pred in enumerate(preds):
+        if i == 3:
+            continue  # Frames may be missing altogether
+        data[f"frame{i:03d}"] = pred
+    return data
+
+
+def _assert_frames_equal(frame1, frame2):
+    assert frame1.keys() == frame2.keys()
+    for arr1, arr2 in zip(frame1["coordinates"][0], frame2["coordinates"][0]):
+        np.testing.assert_array_equal(arr1, arr2)
+        assert arr1.dtype == arr2.dtype
+    for key in ("confidence", "identity"):
+        for arr1, arr2 in zip(frame1.get(key, []), frame2.get(key, [])):
+            np.testing.assert_array_equal(arr1, arr2)
+    if "costs" in frame1:
+        assert frame1["costs"].keys() == frame2["costs"].keys()
+        for k, mats in frame1["costs"].items():
+            for name, mat in mats.items():
+                np.testing.assert_array_equal(mat, frame2["costs"][k][name])
+
+
+@pytest.mark.parametrize("n_id_channels", [0, 3])
+def test_detection_store_roundtrip(tmp_path, n_id_channels):
+    data = _make_detections(12, n_id_channels)
+    store = DetectionStore.from_dict(data, str(tmp_path / "video_full.store"))
+    assert list(store) == list(data)
+    store = DetectionStore(str(tmp_path / "video_full.store"))  # Reopen from disk
+    assert len(store) == len(data)
+    assert "frame003" not in store
+    for key in data:
+        if key != "metadata":
+            _assert_frames_equal(data[key], store[key])
+    np.testing.assert_array_equal(store.frame_inds, [0, 1, 2, *range(4, 12)])
+
+
+def test_detection_store_modes(tmp_path):
+    store = DetectionStore(str(tmp_path / "video_full.store"), mode="w")
+    data = _make_detections(2)
+    store["frame000"] = data["frame000"]
+    with pytest.raises(KeyError):
+        store["frame000"] = data["frame000"]
+    with pytest.raises(IOError):
+        _ = store["frame000"]
+    store.close()
+    with pytest.raises(IOError):
+        store["frame001"] = data["frame001"]
+    with pytest.raises(ValueError):
+        DetectionStore(str(tmp_path), mode="a")
+
+
+def test_detection_store_interrupted(tmp_path):
+    path = str(tmp_path / "video_full.store")
+    data = _make_detections(4)
+    store = DetectionStore(path, mode="w")
+    store["frame000"] = data["frame000"]  # The analysis stops before close()
+    assert not DetectionStore.exists(path)
+    with pytest.raises(FileNotFoundError):
+        DetectionStore(path)
+    # Restarting the analysis discards the partial store...
+    (tmp_path / "video_full.store").mkdir()  # ...and any incomplete one
+    store = DetectionStore.from_dict(data, path)
+    assert DetectionStore.exists(path)
+    assert not (tmp_path / "video_full.store.partial").exists()
+    assert list(DetectionStore(path)) == list(data)
+
+
+def test_detection_store_assembler(tmp_path):
+    data = _make_detections(10)
+    store = DetectionStore.from_dict(data, str(tmp_path / "video_full.store"))
+    kwargs = dict(max_n_individuals=3, n_multibodyparts=N_BODYPARTS)
+    ass_dict = inferenceutils.Assembler(data, **kwargs)
+    ass_dict.assemble(chunk_size=0)
+    ass_store = inferenceutils.Assembler(store, **kwargs)
+    ass_store.assemble(chunk_size=0)
+    assert ass_dict.assemblies.keys() == ass_store.assemblies.keys()
+    for i, assemblies in ass_dict.assemblies.items():
+        for a1, a2 in zip(assemblies, ass_store.assemblies[i]):
+            np.testing.assert_array_equal(a1.data, a2.data)
+
+
+@pytest.mark.parametrize("kept_keypoints", [None, [3, 0, 1]])
+def test_detection_store_outliers(tmp_path, kept_keypoints):
+    data = _make_detections(10)
+    store = DetectionStore.from_dict(data, str(tmp_path / "video_full.store"))
+    inds, frames = find_outliers_in_raw_detections(
+        data, threshold=0.3, kept_keypoints=kept_keypoints
+    )
+    inds_store, frames_store = find_outliers_in_raw_detections(
+        store, threshold=0.3, kept_keypoints=kept_keypoints
+    )
+    assert inds == inds_store
+    assert frames.keys() == frames_store.keys()
+    for k, arr in frames.items():
+        np.testing.assert_array_equal(arr, frames_store[k])
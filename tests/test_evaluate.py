@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+from deeplabcut.pose_estimation_tensorflow.core import evaluate, predict
+from deeplabcut.utils import auxiliaryfunctions
+
+
+@pytest.mark.parametrize("batchsize", [1, 3])
+def test_predict_evaluation_images(batchsize):
+    num_joints = 4
+    dlc_cfg = {
+        "all_joints_names": [f"bp{i}" for i in range(num_joints)],
+        "stride": 8,
+        "location_refinement": True,
+        "locref_stdev": 7.2801,
+    }
+    rng = np.random.default_rng(0)
+    images = [
+        (rng.random(shape) * 255).astype(np.uint8)
+        for shape in [(64, 48, 3)] * 4 + [(32, 40, 3)] * 2 + [(64, 48, 3)]
+    ]
+    graph = tf.Graph()
+    with graph.as_default():
+        inputs = tf.compat.v1.placeholder(tf.float32, shape=[batchsize, None, None, 3])
+        pooled = tf.nn.avg_pool2d(inputs, 8, 8, "VALID")
+        weights = tf.constant(rng.normal(size=(3, 3 * num_joints)), tf.float32)
+        heads = tf.einsum("bhwc,cd->bhwd", pooled / 255, weights)
+        outputs = [tf.sigmoid(heads[..., :num_joints]), heads[..., num_joints:]]
+        with tf.compat.v1.Session(graph=graph) as sess:
+            poses = evaluate.predict_evaluation_images(
+                images, dlc_cfg, sess, inputs, outputs, batchsize
+            )
+            # Reference: images fed one at a time
+            for image, pose in zip(images, poses):
+                batch = np.repeat(image[None].astype(float), batchsize, axis=0)
+                outputs_np = sess.run(outputs, feed_dict={inputs: batch})
+                outputs_np = [output[:1] for output in outputs_np]
+                scmap, locref = predict.extract_cnn_output(outputs_np, dlc_cfg)
+                ref = predict.argmax_pose_predict(scmap, locref, dlc_cfg["stride"])
+                np.testing.assert_allclose(pose, ref.flatten(), rtol=1e-6)
+
+
+def test_list_evaluation_jobs(tmp_path):
+    cfg = {
+        "project_path": str(tmp_path),
+        "Task": "task",
+        "date": "Jan1",
+        "iteration": 0,
+        "TrainingFraction": [0.8, 0.95],
+    }
+    for fraction in cfg["TrainingFraction"]:
+        for shuffle in (1, 2):
+            folder = tmp_path / auxiliaryfunctions.get_model_folder(
+                fraction, shuffle, cfg
+            )
+            (folder / "train").mkdir(parents=True)
+            for iteration in (100, 200, 300):
+                (folder / "train" / f"snapshot-{iteration}.index").touch()
+    jobs = evaluate._list_evaluation_jobs(cfg, [1, 2], "all", -1)
+    assert jobs == [(1, 0, 2), (1, 1, 2), (2, 0, 2), (2, 1, 2)]
+    jobs = evaluate._list_evaluation_jobs(cfg, [2], 1, "all")
+    assert jobs == [(2, 1, 0), (2, 1, 1), (2, 1, 2)]
+    with pytest.raises(ValueError):
+        evaluate._list_evaluation_jobs(cfg, [1], 0, 3)
+    with pytest.raises(FileNotFoundError):
+        evaluate._list_evaluation_jobs(cfg, [3], 0, -1)
+
+
+def test_merged_results_match_sequential_writes(tmp_path):
+    def rows(shuffle, fraction, iterations):
+        return [[it, fraction, shuffle, 1.0, 2.0, 0.6, 1.0, 2.0] for it in iterations]
+
+    new_results = [
+        (f"shuffle{shuffle}", (rows(shuffle, 80, [100, 200]), f"DLC_{shuffle}_200"))
+        for shuffle in (1, 2)
+    ]
+    outputs = []
+    for sequential in (True, False):
+        root = tmp_path / str(sequential)
+        for folder, _ in new_results:
+            (root / folder).mkdir(parents=True)
+        # Previous evaluations are kept below the new results
+        evaluate._write_results_files(
+            [(str(root / "shuffle1"), (rows(1, 80, [50]), "DLC_1_50"))]
+        )
+        results = [(str(root / folder), result) for folder, result in new_results]
+        if sequential:
+            for folder, (final_result, scorer) in results:
+                evaluate.make_results_file(final_result, folder, scorer)
+        else:
+            evaluate._write_results_files(results)
+        outputs.append(
+            [
+                (path.relative_to(root), path.read_text())
+                for path in sorted(root.rglob("*.csv"))
+            ]
+        )
+    assert outputs[0] == outputs[1]
+    assert len(outputs[0]) == 4
+
+
+def test_load_snapshot_swaps_weights_in_one_graph(tmp_path, monkeypatch):
+    num_joints = 2
+
+    class FakeNet:
+        def test(self, inputs):
+            weights = tf.compat.v1.get_variable(
+                "weights", shape=(3, 3 * num_joints), initializer=tf.zeros_initializer()
+            )
+            pooled = tf.nn.avg_pool2d(inputs, 8, 8, "VALID")
+            heads = tf.einsum("bhwc,cd->bhwd", pooled / 255, weights)
+            return {
+                "part_prob": tf.sigmoid(heads[..., :num_joints]),
+                "locref": heads[..., num_joints:],
+                "peak_inds": tf.constant(0),
+            }
+
+    monkeypatch.setattr(predict.PoseNetFactory, "create", lambda cfg: FakeNet())
+    dlc_cfg = {
+        "all_joints_names": [f"bp{i}" for i in range(num_joints)],
+        "batch_size": 1,
+        "stride": 8,
+        "location_refinement": True,
+        "locref_stdev": 7.2801,
+        "dataset_type": "imgaug",
+    }
+    # Write two snapshots with different weights
+    snapshots = []
+    rng = np.random.default_rng(0)
+    for i in range(2):
+        graph = tf.Graph()
+        with graph.as_default():
+            weights = tf.compat.v1.get_variable(
+                "weights", initializer=rng.normal(size=(3, 3 * num_joints)).astype("f")
+            )
+            with tf.compat.v1.Session(graph=graph) as sess:
+                sess.run(tf.compat.v1.global_variables_initializer())
+                snapshots.append(
+                    tf.compat.v1.train.Saver().save(sess, str(tmp_path / f"s-{i}"))
+                )
+    images = [(rng.random((64, 48, 3)) * 255).astype(np.uint8) for _ in range(3)]
+
+    model = None
+    swapped = []
+    for snapshot in snapshots:
+        dlc_cfg["init_weights"] = snapshot
+        model = evaluate.load_snapshot(dlc_cfg, model)
+        sess, inputs, outputs, _ = model
+        swapped.append(
+            evaluate.predict_evaluation_images(images, dlc_cfg, sess, inputs, outputs)
+        )
+    graph = sess.graph
+    sess.close()
+    for snapshot, poses in zip(snapshots, swapped):
+        dlc_cfg["init_weights"] = snapshot
+        sess, inputs, outputs, _ = evaluate.load_snapshot(dlc_cfg)
+        assert sess.graph is not graph
+        ref = evaluate.predict_evaluation_images(images, dlc_cfg, sess, inputs, outputs)
+        sess.close()
+        np.testing.assert_array_equal(poses, ref)
+    assert not np.array_equal(*swapped)
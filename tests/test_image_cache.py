@@ -0,0 +1,110 @@
+import numpy as np
+import os
+import pytest
+from deeplabcut.pose_estimation_tensorflow.datasets import image_cache, ImageCache
+from PIL import Image
+
+
+@pytest.fixture()
+def image_paths(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(4):
+        path = str(tmp_path / f"img{i}.png")
+        Image.fromarray((rng.random((20, 30, 3)) * 255).astype(np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+
+def test_image_cache_lru(image_paths):
+    nbytes = 20 * 30 * 3
+    cache = ImageCache(max_bytes=2 * nbytes)
+    for path in image_paths[:2]:
+        image = cache.imread(path)
+        np.testing.assert_equal(image, np.asarray(Image.open(path)))
+        assert not image.flags.writeable
+    assert cache.imread(image_paths[0]) is cache.imread(image_paths[0])
+    cache.imread(image_paths[2])  # Evicts the least recently used image
+    assert image_paths[0] in cache
+    assert image_paths[1] not in cache
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * nbytes
+    assert cache.hits == 2
+    assert cache.misses == 3
+
+    cache = ImageCache(max_bytes=nbytes // 2)
+    cache.imread(image_paths[0])
+    assert len(cache) == 0
+
+
+def test_image_cache_memory_mapped(image_paths, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    cache = ImageCache(max_bytes=10 ** 6, cache_dir=cache_dir)
+    images = [cache.imread(path) for path in image_paths]
+    assert len(os.listdir(cache_dir)) == len(image_paths)
+    assert all(isinstance(image, np.memmap) for image in images)
+
+    # Other workers map the decoded images instead of reading them again
+    def fail(*args, **kwargs):
+        raise AssertionError("Image decoded twice")
+
+    monkeypatch.setattr(image_cache, "imread", fail)
+    other = ImageCache(max_bytes=10 ** 6, cache_dir=cache_dir)
+    for path, image in zip(image_paths, images):
+        np.testing.assert_equal(other.imread(path), image)
+
+
+def test_image_cache_from_cfg(tmp_path):
+    assert ImageCache.from_cfg({}) is None
+    cache = ImageCache.from_cfg(
+        {"image_cache_bytes": 100, "image_cache_dir": str(tmp_path)}
+    )
+    assert cache.max_bytes == 100
+    assert cache.cache_dir == str(tmp_path)
+
+
+def test_image_cache_bounded(image_paths, tmp_path):
+    nbytes = 20 * 30 * 3
+    # Few images are memory-mapped at once, to spare file descriptors
+    cache = ImageCache(max_bytes=10 ** 6, cache_dir=str(tmp_path / "a"), max_files=2)
+    for path in image_paths:
+        cache.imread(path)
+    assert len(cache) == 2
+    assert image_paths[-1] in cache
+
+    # The cache directory does not grow past the byte budget
+    cache_dir = str(tmp_path / "b")
+    cache = ImageCache(max_bytes=2 * nbytes + 500, cache_dir=cache_dir)
+    images = [cache.imread(path) for path in image_paths]
+    assert len(os.listdir(cache_dir)) == 2
+    assert not any(isinstance(image, np.memmap) for image in images[2:])
+    for path, image in zip(image_paths, images):
+        np.testing.assert_equal(image, np.asarray(Image.open(path)))
+
+
+def test_image_cache_rescans_directory_rarely(image_paths, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "c")
+    cache = ImageCache(max_bytes=10 ** 6, cache_dir=cache_dir, rescan_every=3)
+    n_scans = []
+    dir_nbytes = cache._dir_nbytes
+
+    def count_scans():
+        n_scans.append(1)
+        return dir_nbytes()
+
+    monkeypatch.setattr(cache, "_dir_nbytes", count_scans)
+    for path in image_paths * 2:
+        cache.imread(path)
+        cache.clear()
+    assert len(n_scans) == 2
+    # The running count matches the size of the directory
+    assert cache._dir_bytes == dir_nbytes()
+
+
+def test_image_cache_shared():
+    cache = ImageCache(max_bytes=10 ** 6, shared=True)
+    cache_dir = cache.cache_dir
+    assert os.path.isdir(cache_dir)
+    assert cache_dir != ImageCache(max_bytes=10 ** 6, shared=True).cache_dir
+    del cache
+    assert not os.path.exists(cache_dir)
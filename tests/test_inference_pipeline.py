@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from deeplabcut.pose_estimation_tensorflow.core.inference_pipeline import (
+    PipelinedPoseEstimator,
+)
+
+
+BLUE, RED = 1, 2
+
+
+class FakeCapture:
+    def __init__(self, n_frames, shape=(8, 10), bad_frames=()):
+        self.n_frames = n_frames
+        self.shape = shape
+        self.bad_frames = bad_frames
+        self.i = 0
+
+    def read(self):
+        i = self.i
+        self.i += 1
+        if i >= self.n_frames or i in self.bad_frames:
+            return False, None
+        frame = np.full((*self.shape, 3), i % 256, dtype=np.uint8)
+        # Distinct blue and red values, as OpenCV decodes frames to BGR
+        frame[..., 0] = BLUE
+        frame[..., 2] = RED
+        return True, frame
+
+
+def _run_batch(frames):
+    # Mimic a network: one "keypoint" per frame whose confidence is the pixel value
+    return frames[:, 0, 0, 1].astype(float).copy()
+
+
+def _extract_poses(outputs):
+    return np.c_[outputs, outputs, outputs]
+
+
+@pytest.mark.parametrize("batchsize, n_buffers", [(1, 2), (4, 3), (7, 2)])
+def test_pipelined_pose_estimator(batchsize, n_buffers):
+    nframes = 30
+    cap = FakeCapture(nframes, bad_frames=(5, 17))
+    engine = PipelinedPoseEstimator(
+        _run_batch, _extract_poses, batchsize, n_buffers=n_buffers
+    )
+    data = engine.run(cap, nframes, cap.shape, 3)
+    expected = np.repeat(np.arange(nframes, dtype=float)[:, None], 3, axis=1)
+    expected[[5, 17]] = 0
+    np.testing.assert_equal(data, expected)
+    assert engine.stats["decode"].n_frames == nframes - 2
+    assert engine.stats["write"].n_frames == nframes - 2
+
+
+def test_pipelined_pose_estimator_converts_to_rgb():
+    channels = []
+
+    def run_batch(frames):
+        channels.append(frames[:, 0, 0].copy())
+        return _run_batch(frames)
+
+    engine = PipelinedPoseEstimator(run_batch, _extract_poses, 2)
+    engine.run(FakeCapture(4), 4, (8, 10), 3)
+    channels = np.concatenate(channels)
+    np.testing.assert_equal(channels[:, 0], RED)
+    np.testing.assert_equal(channels[:, 1], np.arange(4))
+    np.testing.assert_equal(channels[:, 2], BLUE)
+
+
+def test_pipelined_pose_estimator_crop():
+    cap = FakeCapture(5, shape=(8, 10))
+    shapes = []
+
+    def run_batch(frames):
+        shapes.append(frames.shape)
+        return _run_batch(frames)
+
+    engine = PipelinedPoseEstimator(run_batch, _extract_poses, 2, crop=(1, 5, 2, 8))
+    engine.run(cap, 5, (6, 4), 3)
+    assert all(shape == (2, 6, 4, 3) for shape in shapes)
+
+
+def test_pipelined_pose_estimator_propagates_errors():
+    def run_batch(frames):
+        raise RuntimeError("boom")
+
+    engine = PipelinedPoseEstimator(run_batch, _extract_poses, 2)
+    with pytest.raises(RuntimeError, match="boom"):
+        engine.run(FakeCapture(10), 10, (8, 10), 3)
+
+    with pytest.raises(ValueError):
+        PipelinedPoseEstimator(run_batch, _extract_poses, 2, n_buffers=1)
@@ -304,3 +304,180 @@ def test_assembler_calibration(real_assemblies):
 
 def test_find_outlier_assemblies(real_assemblies):
     assert len(inferenceutils.find_outlier_assemblies(real_assemblies)) == 13
+
+
+def test_assembler_feed(make_synthetic_detections):
+    data = make_synthetic_detections(15)
+    kwargs = dict(max_n_individuals=3, n_multibodyparts=4, window_size=2)
+    ass = inferenceutils.Assembler(data, **kwargs)
+    ass.assemble(chunk_size=0)
+
+    # Stream the frames into an assembler only aware of the metadata
+    ass_stream = inferenceutils.Assembler({"metadata": data["metadata"]}, **kwargs)
+    assert ass_stream._has_identity is None
+    for i, key in enumerate(k for k in data if k != "metadata"):
+        assemblies, _ = ass_stream.feed(i, data[key])
+        assert len(ass_stream._trees) <= 2
+        if assemblies:
+            np.testing.assert_array_equal(
+                ass_stream.assemblies.data(i), [a.data for a in assemblies]
+            )
+    assert ass_stream._has_identity is False
+    assert ass.assemblies.keys() == ass_stream.assemblies.keys()
+    for i, assemblies in ass.assemblies.items():
+        for a1, a2 in zip(assemblies, ass_stream.assemblies[i]):
+            np.testing.assert_array_equal(a1.data, a2.data)
+
+
+@pytest.mark.parametrize("use_store", [False, True])
+def test_assembler_chunked_parallel(tmp_path, use_store, make_synthetic_detections):
+    from deeplabcut.utils.detection_store import DetectionStore
+
+    data = make_synthetic_detections(23)
+    if use_store:
+        data = DetectionStore.from_dict(data, str(tmp_path / "video_full.store"))
+    kwargs = dict(max_n_individuals=3, n_multibodyparts=4)
+    ass = inferenceutils.Assembler(data, **kwargs)
+    ass.assemble(chunk_size=0)
+    ass_parallel = inferenceutils.Assembler(data, **kwargs)
+    ass_parallel.assemble(chunk_size=5, n_processes=2)
+    assert ass.assemblies.keys() == ass_parallel.assemblies.keys()
+    for i, assemblies in ass.assemblies.items():
+        for a1, a2 in zip(assemblies, ass_parallel.assemblies[i]):
+            np.testing.assert_array_equal(a1.data, a2.data)
+            assert len(a1) == len(a2)
+            assert a1.affinity == a2.affinity
+            assert a1.n_links == a2.n_links
+
+
+@pytest.mark.parametrize("window_size", [0, 1])
+def test_assembler_default_chunking(
+    monkeypatch, window_size, make_synthetic_detections
+):
+    used_pool = []
+
+    class Pool:
+        def __init__(self, n_processes=None):
+            used_pool.append(True)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def imap_unordered(self, func, iterable):
+            return map(func, iterable)
+
+    monkeypatch.setattr(inferenceutils.multiprocessing, "Pool", Pool)
+    data = make_synthetic_detections(10)
+    ass = inferenceutils.Assembler(
+        data, max_n_individuals=3, n_multibodyparts=4, window_size=window_size
+    )
+    ass.assemble()
+    # Temporal coherence would be lost at chunk boundaries
+    assert used_pool == ([True] if window_size == 0 else [])
+    assert len(ass.assemblies)
+
+
+@pytest.mark.parametrize("greedy", [False, True])
+def test_assembler_cached_links(greedy, make_synthetic_detections):
+    data = make_synthetic_detections(20, n_bodyparts=5)
+    kwargs = dict(max_n_individuals=3, n_multibodyparts=5, greedy=greedy)
+    ass_cached = inferenceutils.Assembler(data, cache_links=True, **kwargs)
+    ass_cached.cache_links([0, 1, 2, 3])
+    for paf_inds in ([0, 1, 2, 3], [0, 1, 2, 3, 4, 7], list(range(10)), [9, 2, 5]):
+        ass = inferenceutils.Assembler(data, paf_inds=paf_inds, **kwargs)
+        ass.assemble(chunk_size=0)
+        ass_cached.paf_inds = paf_inds
+        ass_cached.assemble(chunk_size=0)
+        assert ass.assemblies.keys() == ass_cached.assemblies.keys()
+        for i, assemblies in ass.assemblies.items():
+            for a1, a2 in zip(assemblies, ass_cached.assemblies[i]):
+                np.testing.assert_array_equal(a1.data, a2.data)
+                assert a1.affinity == a2.affinity
+    assert len(ass_cached._cache["links"]) == 20 * 10
+
+
+def test_assemble_chunk_warmup(make_synthetic_detections):
+    data = make_synthetic_detections(10)
+    ass = inferenceutils.Assembler(
+        data, max_n_individuals=3, n_multibodyparts=4, window_size=2
+    )
+    chunks = list(ass._make_chunks(4))
+    assert [chunk[2:] for chunk in chunks] == [(0, 0), (2, 2), (6, 2)]
+    assert "imnames" not in chunks[0][0]["metadata"]
+    results = inferenceutils._assemble_chunk(chunks[1])
+    assert [res[0] for res in results] == [4, 5, 6, 7]
+
+
+def test_assemblies_storage(make_synthetic_detections):
+    data = make_synthetic_detections(8)
+    ass = inferenceutils.Assembler(data, max_n_individuals=3, n_multibodyparts=4)
+    objects = {}
+    for i, key in enumerate(k for k in data if k != "metadata"):
+        assemblies, _ = ass._assemble(data[key], i)
+        if assemblies:
+            objects[i] = assemblies
+            ass.assemblies.add(i, assemblies)
+    assert ass.assemblies.keys() == objects.keys()
+    for i, assemblies in objects.items():
+        block = ass.assemblies.data(i)
+        assert block.shape == (len(assemblies), 4, 4)
+        assert len(ass.assemblies.links(i)) == sum(a.n_links for a in assemblies)
+        for a1, a2 in zip(assemblies, ass.assemblies[i]):
+            np.testing.assert_array_equal(a1.data, a2.data)
+            assert len(a1) == len(a2)
+            assert a1.n_links == a2.n_links
+            assert a1.affinity == a2.affinity
+
+
+def test_non_max_suppression():
+    rng = np.random.default_rng(0)
+    assemblies = []
+    for _ in range(12):
+        arr = rng.random((6, 4)) * 10
+        arr[rng.random(6) < 0.3] = np.nan
+        arr[0] = 1  # Keep at least one visible keypoint
+        assemblies.append(inferenceutils.Assembly.from_array(arr))
+    scores = rng.random(len(assemblies))
+    scores[3] = scores[7]  # Ties are broken by order
+    for max_overlap in (0.3, 0.6, 0.9):
+        # Reference: greedy suppression using pairwise intersections
+        lst = list(zip(scores, range(len(assemblies))))
+        keep_gt = []
+        while lst:
+            temp = max(lst, key=lambda x: x[0])
+            lst.remove(temp)
+            keep_gt.append(temp[1])
+            for pair in lst[::-1]:
+                a1, a2 = assemblies[temp[1]], assemblies[pair[1]]
+                if a1.intersection_with(a2) >= max_overlap:
+                    lst.remove(pair)
+        keep = inferenceutils._non_max_suppression(
+            np.stack([a.data for a in assemblies]),
+            [len(a) for a in assemblies],
+            scores,
+            max_overlap,
+        )
+        assert keep == keep_gt
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_label_components_matches_networkx(seed):
+    import networkx as nx
+
+    rng = np.random.default_rng(seed)
+    n_nodes = 60
+    edges = rng.integers(n_nodes, size=(45, 2))
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    components = list(nx.connected_components(nx.Graph(edges.tolist())))
+    for func in (
+        inferenceutils._label_components,
+        inferenceutils._label_components.py_func,
+    ):
+        labels, sizes = func(edges, n_nodes)
+        assert len(sizes) == len(components)
+        for label, (chain, size) in enumerate(zip(components, sizes)):
+            assert set(np.flatnonzero(labels == label)) == chain
+            assert size == len(chain)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+from deeplabcut.pose_estimation_tensorflow.core import loader
+from deeplabcut.pose_estimation_tensorflow.core.train import (
+    get_batch_spec,
+    setup_preloading,
+    start_preloading,
+)
+from deeplabcut.pose_estimation_tensorflow.datasets import Batch
+
+
+class FakeDataset:
+    def __init__(self, cfg):
+        self.cfg = cfg
+
+    def next_batch(self):
+        batch_size, num_joints = self.cfg["batch_size"], self.cfg["num_joints"]
+        # Tag images with a random number, to tell workers apart
+        return {
+            Batch.inputs: np.full((batch_size, 16, 16, 3), np.random.rand()),
+            Batch.part_score_targets: np.zeros((batch_size, 2, 2, num_joints)),
+            Batch.part_score_weights: np.ones((batch_size, 2, 2, num_joints)),
+            Batch.locref_targets: np.zeros((batch_size, 2, 2, num_joints * 2)),
+            Batch.locref_mask: np.zeros((batch_size, 2, 2, num_joints * 2)),
+            Batch.data_item: [None] * batch_size,
+        }
+
+
+def make_fake_dataset(cfg):
+    return FakeDataset(cfg)
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_loader(num_workers):
+    cfg = {"batch_size": 2, "num_joints": 3}
+    with tf.Graph().as_default():
+        batch, enqueue_op, placeholders = setup_preloading(get_batch_spec(cfg))
+        with tf.compat.v1.Session() as sess:
+            if num_workers:
+                coord = tf.compat.v1.train.Coordinator()
+                batch_loader = loader.MultiProcessBatchLoader(
+                    sess,
+                    enqueue_op,
+                    FakeDataset(cfg),
+                    placeholders,
+                    coord,
+                    num_workers,
+                    seed=0,
+                    make_dataset=make_fake_dataset,
+                )
+                batch_loader.start()
+            else:
+                coord, batch_loader = start_preloading(
+                    sess, enqueue_op, FakeDataset(cfg), placeholders
+                )
+            tags = set()
+            for _ in range(10):
+                batch_np = sess.run(batch)
+                assert batch_np[Batch.inputs].shape == (2, 16, 16, 3)
+                assert batch_np[Batch.locref_mask].shape == (2, 2, 2, 6)
+                tags.add(batch_np[Batch.inputs][0, 0, 0, 0])
+            assert len(tags) == 10
+            assert batch_loader.pop_stall_time() >= 0
+            assert batch_loader.pop_stall_time() == 0
+            batch_loader.stop()
+            assert not batch_loader.is_alive()
+            if num_workers:
+                assert not any(w.is_alive() for w in batch_loader._workers)
@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+from deeplabcut.utils import make_labeled_video
+from deeplabcut.utils.video_processor import VideoProcessorCV
+from skimage.draw import disk
+
+
+@pytest.fixture(params=["MJPG", "mp4v"])
+def video_and_data(request, tmp_path):
+    # Unlike MJPG, mp4v compresses frames relative to each other
+    codec = request.param
+    rng = np.random.default_rng(0)
+    nframes, ny, nx = 30, 64, 80
+    video = str(tmp_path / ("video.avi" if codec == "MJPG" else "video.mp4"))
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*codec), 30, (nx, ny))
+    for _ in range(nframes):
+        writer.write((rng.random((ny, nx, 3)) * 255).astype(np.uint8))
+    writer.release()
+    columns = pd.MultiIndex.from_product(
+        [["scorer"], ["nose", "tail"], ["x", "y", "likelihood"]],
+        names=["scorer", "bodyparts", "coords"],
+    )
+    data = np.empty((nframes, 2, 3))
+    data[..., 0] = rng.uniform(-5, nx + 5, (nframes, 2))
+    data[..., 1] = rng.uniform(-5, ny + 5, (nframes, 2))
+    data[..., 2] = rng.random((nframes, 2))
+    data[3, 1, 0] = np.nan
+    df = pd.DataFrame(data.reshape((nframes, -1)), columns=columns)
+    return video, df
+
+
+def test_label_painter_stamps_disks():
+    df_x = np.array([[10.0, 20.4], [np.nan, 3.0]])
+    df_y = np.array([[12.0, 5.6], [4.0, 0.0]])
+    likelihood = np.ones_like(df_x)
+    colors = np.array([[255, 0, 0], [0, 255, 0]])
+    painter = make_labeled_video._LabelPainter(
+        df_x, df_y, likelihood, 0.5, 4, 2, [0, 1], colors, [], None, (30, 40)
+    )
+    image = painter.draw(np.zeros((30, 40, 3), dtype=np.uint8), 1)
+    expected = np.zeros_like(image)
+    for x, y, color in [(10, 12, colors[0]), (20, 6, colors[0]), (3, 0, colors[1])]:
+        expected[disk((y, x), 4, shape=(30, 40))] = color
+    np.testing.assert_array_equal(image, expected)
+
+
+def test_create_video_sharded(video_and_data, tmp_path):
+    video, df = video_and_data
+    outputs = []
+    for n_processes in (1, 3):
+        output = str(tmp_path / f"labeled{n_processes}.avi")
+        clip = VideoProcessorCV(fname=video, sname=output, codec="MJPG")
+        make_labeled_video.CreateVideo(
+            clip,
+            df.copy(),
+            0.3,
+            3,
+            "cool",
+            ["nose", "tail"],
+            3,
+            False,
+            0,
+            0,
+            0,
+            0,
+            [["nose", "tail"]],
+            "k",
+            True,
+            False,
+            "bodypart",
+            n_processes=n_processes,
+        )
+        cap = cv2.VideoCapture(output)
+        frames = []
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            frames.append(frame)
+        cap.release()
+        outputs.append(np.stack(frames))
+    assert len(outputs[0]) == len(df)
+    np.testing.assert_array_equal(outputs[0], outputs[1])
+
+
+class KeyframeSeekingCapture:
+    # Seeking lands on the preceding keyframe, as with some inter-frame codecs
+    def __init__(self, nframes, keyframe_interval):
+        self.nframes = nframes
+        self.keyframe_interval = keyframe_interval
+        self.pos = 0
+
+    def set(self, prop, value):
+        self.pos = value - value % self.keyframe_interval
+
+    def get(self, prop):
+        return self.pos
+
+    def grab(self):
+        if self.pos >= self.nframes:
+            return False
+        self.pos += 1
+        return True
+
+
+@pytest.mark.parametrize("index", [0, 24, 30])
+def test_seek_falls_back_to_grabbing_frames(index):
+    cap = KeyframeSeekingCapture(50, 12)
+    make_labeled_video._seek(cap, index)
+    assert cap.pos == index
@@ -92,3 +92,120 @@ def test_get_targetmaps(ma_dataset, num_idchannel):
 def test_batching(ma_dataset):
     for _ in range(10):
         batch = ma_dataset.next_batch()
+
+
+def _reference_target_maps(cfg, joint_id, coords, data_item, size, scale):
+    # Dense implementation, evaluating every keypoint and limb on the full grid
+    stride = cfg["stride"]
+    half_stride = stride // 2
+    dist_thresh = float(cfg["pos_dist_thresh"] * scale)
+    num_idchannel = cfg["num_idchannel"]
+    num_joints = cfg["num_joints"]
+    scmap = np.zeros((*size, num_joints + num_idchannel))
+    locref_map = np.zeros((*size, num_joints * 2))
+    locref_scale = 1.0 / cfg["locref_stdev"]
+    paf_map = np.zeros((*size, cfg["num_limbs"] * 2))
+    height, width = size
+    grid = np.mgrid[:height, :width].transpose((1, 2, 0))
+    xx = np.expand_dims(grid[..., 1], axis=2)
+    yy = np.expand_dims(grid[..., 0], axis=2)
+    coords_sm = np.round((coords - half_stride) / stride).astype(int)
+    mins = np.round(np.maximum(coords_sm - dist_thresh - 1, 0)).astype(int)
+    maxs = np.round(
+        np.minimum(coords_sm + dist_thresh + 1, [width - 1, height - 1])
+    ).astype(int)
+    dx = coords[:, 0] - xx * stride - half_stride
+    dy = coords[:, 1] - yy * stride - half_stride
+    mask = (
+        (dx ** 2 + dy ** 2 <= dist_thresh ** 2)
+        & (xx >= mins[:, 0])
+        & (xx <= maxs[:, 0])
+        & (yy >= mins[:, 1])
+        & (yy <= maxs[:, 1])
+    )
+    for n, ind in enumerate(np.concatenate(joint_id).tolist()):
+        mask_ = mask[..., n]
+        scmap[mask_, ind] = 1
+        locref_map[mask_, ind * 2 + 0] = (dx * locref_scale)[mask_, n]
+        locref_map[mask_, ind * 2 + 1] = (dy * locref_scale)[mask_, n]
+    offset = 0
+    for i, person_id in enumerate(data_item.joints):
+        if person_id < num_idchannel:
+            n_joints = joint_id[i].size
+            inds = np.arange(n_joints) + offset
+            scmap[mask[..., inds].any(axis=2), person_id + num_joints] = 1
+            offset += n_joints
+    offset = 0
+    y, x = np.rollaxis(grid * stride + half_stride, 2)
+    for ids in joint_id:
+        ids = ids.tolist()
+        for l, (bp1, bp2) in enumerate(cfg["partaffinityfield_graph"]):
+            if bp1 not in ids or bp2 not in ids:
+                continue
+            j_x, j_y = coords[ids.index(bp1) + offset]
+            linkedj_x, linkedj_y = coords[ids.index(bp2) + offset]
+            dist = np.sqrt((linkedj_x - j_x) ** 2 + (linkedj_y - j_y) ** 2)
+            if dist > 0:
+                Dx = (linkedj_x - j_x) / dist
+                Dy = (linkedj_y - j_y) / dist
+                d1 = [Dx * j_x + Dy * j_y, Dx * linkedj_x + Dy * linkedj_y]
+                d2mid = j_y * Dx - j_x * Dy
+                distance_along = Dx * x + Dy * y
+                distance_across = (
+                    ((y * Dx - x * Dy) - d2mid) * 1.0 / cfg["pafwidth"] * scale
+                )
+                mask_ = (
+                    (distance_along >= min(d1))
+                    & (distance_along <= max(d1))
+                    & (np.abs(distance_across) <= 1)
+                )
+                temp = 1 - np.abs(distance_across)[mask_]
+                paf_map[mask_, l * 2 + 0] = Dx * temp
+                paf_map[mask_, l * 2 + 1] = Dy * temp
+        offset += len(ids)
+    return scmap, locref_map, paf_map
+
+
+@pytest.mark.parametrize("num_idchannel", [0, 3])
+def test_target_maps_match_dense_computation(num_idchannel):
+    rng = np.random.default_rng(num_idchannel)
+    num_joints = 12
+    graph = [[i, j] for i in range(num_joints) for j in range(i + 1, num_joints)]
+    cfg = {
+        "stride": 8,
+        "pos_dist_thresh": 17,
+        "num_idchannel": num_idchannel,
+        "num_joints": num_joints,
+        "locref_stdev": 7.2801,
+        "num_limbs": len(graph),
+        "partaffinityfield_graph": graph,
+        "pafwidth": 20,
+        "weigh_only_present_joints": False,
+    }
+    dataset = pose_multianimal_imgaug.MAImgaugPoseDataset.__new__(
+        pose_multianimal_imgaug.MAImgaugPoseDataset
+    )
+    dataset.cfg = cfg
+    size = 50, 60
+    scale = 0.8
+    for _ in range(5):
+        # Animals overlap, some keypoints are missing or out of the image,
+        # and the last animal has no identity channel.
+        joint_id = [
+            np.sort(rng.choice(num_joints, rng.integers(1, num_joints), replace=False))
+            for _ in range(num_idchannel + 2)
+        ]
+        coords = rng.uniform(-20, 500, (sum(ids.size for ids in joint_id), 2))
+        coords[1] = coords[0]  # Zero-length limb
+        data_item = pose_multianimal_imgaug.DataItem()
+        data_item.joints = dict(zip(range(len(joint_id)), joint_id))
+        scmap, _, locref_map, _, paf_map, _ = dataset.compute_target_part_scoremap_numpy(
+            joint_id, coords, data_item, size, scale
+        )
+        ref_scmap, ref_locref_map, ref_paf_map = _reference_target_maps(
+            cfg, joint_id, coords, data_item, size, scale
+        )
+        np.testing.assert_array_equal(scmap, ref_scmap)
+        np.testing.assert_array_equal(locref_map, ref_locref_map)
+        np.testing.assert_array_equal(paf_map, ref_paf_map)
+        assert paf_map.any()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+from deeplabcut.pose_estimation_tensorflow.core import predict
+from deeplabcut.pose_estimation_tensorflow.nnets.utils import extract_poses
+
+
+@pytest.mark.parametrize("num_outputs", [1, 3])
+def test_extract_poses_matches_numpy(num_outputs):
+    rng = np.random.default_rng(0)
+    batchsize, ny, nx, num_joints = 4, 12, 15, 5
+    cfg = {
+        "location_refinement": True,
+        "locref_stdev": 7.2801,
+        "stride": 8,
+        "num_joints": num_joints,
+        "num_outputs": num_outputs,
+    }
+    scmap = rng.random((batchsize, ny, nx, num_joints)).astype(np.float32)
+    locref = rng.standard_normal((batchsize, ny, nx, num_joints * 2)).astype(np.float32)
+
+    with tf.Graph().as_default():
+        poses = extract_poses(
+            tf.constant(scmap),
+            tf.constant(locref),
+            cfg["stride"],
+            cfg["locref_stdev"],
+            num_outputs,
+        )
+        with tf.compat.v1.Session() as sess:
+            pose_gpu = sess.run(poses)
+    assert pose_gpu.shape == (batchsize, num_joints * num_outputs, 3)
+
+    pose = predict.extract_poses_from_outputs([scmap, locref.copy()], cfg)
+    np.testing.assert_allclose(
+        predict.format_GPUprediction(pose_gpu, batchsize), pose, rtol=1e-5, atol=1e-4
+    )
+
+
+def test_format_GPUprediction_legacy():
+    # Exported graphs output (batch * num_joints, 3) arrays in y, x, likelihood order
+    legacy = np.arange(2 * 3 * 3, dtype=np.float32).reshape((-1, 3))
+    pose = predict.format_GPUprediction(legacy, 2)
+    assert pose.shape == (2, 9)
+    np.testing.assert_equal(pose[:, 0::3].ravel(), legacy[:, 1])
+    np.testing.assert_equal(pose[:, 1::3].ravel(), legacy[:, 0])
+    np.testing.assert_equal(pose[:, 2::3].ravel(), legacy[:, 2])
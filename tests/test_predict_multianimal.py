@@ -1,5 +1,7 @@
 import numpy as np
+import pytest
 import tensorflow as tf
+from deeplabcut.pose_estimation_tensorflow import predict_multianimal as predictma
 from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal
 
 
@@ -77,3 +79,204 @@ def test_compute_peaks_and_costs_no_graph(model_outputs):
         stride=STRIDE,
     )[0]
     assert "costs" not in preds
+
+
+def _compute_peaks_and_costs_loop(
+    scmaps, pafs, peak_inds, graph, paf_inds, n_bodyparts
+):
+    # Reference implementation masking the full peak array at every step
+    peak_inds = peak_inds.copy()
+    h, w = pafs.shape[1:3]
+    peak_inds[:, 1] = np.clip(peak_inds[:, 1], 0, h - 1)
+    peak_inds[:, 2] = np.clip(peak_inds[:, 2], 0, w - 1)
+    s, r, c, b = peak_inds.T
+    prob = np.round(scmaps[s, r, c, b], 3).reshape((-1, 1))
+    preds = []
+    for i in range(scmaps.shape[0]):
+        mask = s == i
+        inds_per_bpt = [np.flatnonzero(mask & (b == j)) for j in range(n_bodyparts)]
+        costs = dict()
+        for k, (j1, j2) in zip(paf_inds, graph):
+            inds_s, inds_t = inds_per_bpt[j1], inds_per_bpt[j2]
+            m1 = np.zeros((len(inds_s), len(inds_t)), dtype=np.float32)
+            dist = np.zeros_like(m1)
+            for n1, ind_s in enumerate(inds_s):
+                for n2, ind_t in enumerate(inds_t):
+                    vec_s, vec_t = peak_inds[ind_s, 1:3], peak_inds[ind_t, 1:3]
+                    length = np.float32(np.linalg.norm(vec_t - vec_s))
+                    length += np.spacing(1, dtype=np.float32)
+                    xy = np.linspace(vec_s, vec_t, 10, axis=0, dtype=np.int32)
+                    y = pafs[i, xy[:, 0], xy[:, 1], k]
+                    integ = np.trapz(y, xy[:, ::-1], axis=0)
+                    m1[n1, n2] = np.float32(np.linalg.norm(integ)) / length
+                    dist[n1, n2] = length
+            if not m1.size:
+                m1 = dist = np.empty((0, 0), dtype=np.float32)
+            costs[k] = {"m1": np.round(m1, 3), "distance": np.round(dist, 3)}
+        preds.append(
+            {"confidence": [prob[inds] for inds in inds_per_bpt], "costs": costs}
+        )
+    return preds
+
+
+def _make_batch(n_samples, n_bodyparts, n_peaks_per_part, seed=0):
+    rng = np.random.default_rng(seed)
+    h, w = 32, 40
+    graph = [[i, j] for i in range(n_bodyparts) for j in range(i + 1, n_bodyparts)]
+    scmaps = rng.random((n_samples, h, w, n_bodyparts)).astype(np.float32)
+    locrefs = rng.standard_normal((n_samples, h, w, n_bodyparts, 2)).astype(np.float32)
+    pafs = rng.standard_normal((n_samples, h, w, len(graph), 2)).astype(np.float32)
+    n_peaks = n_samples * n_bodyparts * n_peaks_per_part
+    peak_inds = np.c_[
+        rng.integers(n_samples, size=n_peaks),
+        rng.integers(h, size=n_peaks),
+        rng.integers(w, size=n_peaks),
+        rng.integers(n_bodyparts, size=n_peaks),
+    ].astype(np.int32)
+    peak_inds = peak_inds[np.lexsort(peak_inds.T[::-1])]
+    return scmaps, locrefs, pafs, peak_inds, graph
+
+
+def test_compute_peaks_and_costs_matches_loop():
+    scmaps, locrefs, pafs, peak_inds, graph = _make_batch(6, 5, 2)
+    peak_inds = peak_inds[peak_inds[:, 0] != 2]  # A frame without detections
+    peak_inds = peak_inds[(peak_inds[:, 0] != 4) | (peak_inds[:, 3] != 1)]
+    paf_inds = list(range(len(graph)))
+    preds = predict_multianimal.compute_peaks_and_costs(
+        scmaps, locrefs, pafs, peak_inds.copy(), graph, paf_inds, STRIDE, 0
+    )
+    preds_gt = _compute_peaks_and_costs_loop(
+        scmaps, pafs, peak_inds, graph, paf_inds, 5
+    )
+    assert len(preds) == len(preds_gt)
+    for pred, pred_gt in zip(preds, preds_gt):
+        assert len(pred["coordinates"][0]) == 5
+        for p, p_gt in zip(pred["confidence"], pred_gt["confidence"]):
+            np.testing.assert_array_equal(p, p_gt)
+        assert list(pred["costs"]) == paf_inds
+        for k, costs in pred["costs"].items():
+            for name in ("m1", "distance"):
+                np.testing.assert_array_equal(costs[name], pred_gt["costs"][k][name])
+
+
+class FakeVideo:
+    def __init__(self, n_frames):
+        self.n_frames = n_frames
+        self.pos = 0
+        self.dimensions = 8, 6
+        self.fps = 30
+        self.video = self
+
+    def __len__(self):
+        return self.n_frames
+
+    def calc_duration(self, robust=False):
+        return self.n_frames / self.fps
+
+    def isOpened(self):
+        return True
+
+    def read_frame(self, crop=False):
+        if self.pos >= self.n_frames:
+            return None
+        self.pos += 1
+        return np.zeros((6, 8, 3), dtype=np.uint8)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("batchsize", [1, 4])
+def test_get_pose_and_costs_assembles_online(
+    monkeypatch, make_synthetic_detections, batchsize
+):
+    from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils
+
+    nframes = 10
+    detections = make_synthetic_detections(nframes)
+    metadata = detections.pop("metadata")
+    frames = iter(detections.values())
+
+    def predict_batched_peaks_and_costs(dlc_cfg, images, *args):
+        return [next(frames, None) for _ in images]
+
+    monkeypatch.setattr(
+        predictma.predict,
+        "predict_batched_peaks_and_costs",
+        predict_batched_peaks_and_costs,
+    )
+    cfg = {"cropping": False}
+    dlc_cfg = {
+        "nmsradius": 5,
+        "minconfidence": 0.01,
+        "partaffinityfield_graph": metadata["PAFgraph"],
+        "all_joints": [[i] for i in range(4)],
+        "all_joints_names": metadata["all_joints_names"],
+    }
+    kwargs = dict(max_n_individuals=3, n_multibodyparts=4)
+    ass_online = inferenceutils.Assembler({"metadata": metadata}, **kwargs)
+    args = cfg, dlc_cfg, None, None, None, FakeVideo(nframes), nframes
+    if batchsize > 1:
+        # The last batch is only partially filled
+        data, _ = predictma.GetPoseandCostsF(*args, batchsize, "", assembler=ass_online)
+    else:
+        data, _ = predictma.GetPoseandCostsS(*args, "", assembler=ass_online)
+    ass = inferenceutils.Assembler(data, **kwargs)
+    ass.assemble(chunk_size=0)
+    assert ass.assemblies.keys() == ass_online.assemblies.keys()
+    for i in ass.assemblies:
+        np.testing.assert_array_equal(
+            ass.assemblies.data(i), ass_online.assemblies.data(i)
+        )
+
+
+@pytest.mark.parametrize("interrupted", [False, True])
+def test_analyze_video_assembles_online_into_store(
+    tmp_path, monkeypatch, make_synthetic_detections, interrupted
+):
+    from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils
+    from deeplabcut.utils.detection_store import DetectionStore
+
+    nframes = 10
+    detections = make_synthetic_detections(nframes)
+    metadata = detections.pop("metadata")
+    frames = iter(detections.values())
+
+    def predict_batched_peaks_and_costs(dlc_cfg, images, *args):
+        return [next(frames, None) for _ in images]
+
+    def save_full_data(*args):
+        raise AssertionError("Detections should not be kept in memory.")
+
+    monkeypatch.setattr(
+        predictma.predict,
+        "predict_batched_peaks_and_costs",
+        predict_batched_peaks_and_costs,
+    )
+    monkeypatch.setattr(predictma, "VideoWriter", lambda video: FakeVideo(nframes))
+    monkeypatch.setattr(
+        predictma.auxfun_multianimal, "SaveFullMultiAnimalData", save_full_data
+    )
+    cfg = {"cropping": False, "iteration": 0}
+    dlc_cfg = {
+        "batch_size": 4,
+        "nmsradius": 5,
+        "minconfidence": 0.01,
+        "partaffinityfield_graph": metadata["PAFgraph"],
+        "all_joints": [[i] for i in range(4)],
+        "all_joints_names": metadata["all_joints_names"],
+    }
+    assembler = inferenceutils.Assembler(
+        {"metadata": metadata}, max_n_individuals=3, n_multibodyparts=4
+    )
+    video = str(tmp_path / "video.mp4")
+    if interrupted:  # A previous run left an incomplete store behind
+        (tmp_path / "videoDLC_full.store").mkdir()
+        (tmp_path / "videoDLC_full.store" / "xy.bin").write_bytes(b"0" * 8)
+    assert predictma.AnalyzeMultiAnimalVideo(
+        video, "DLC", 0.95, cfg, dlc_cfg, None, None, None, assembler=assembler
+    )
+    store = DetectionStore(str(tmp_path / "videoDLC_full.store"))
+    assert len(store) == nframes + 1
+    assert len(assembler.assemblies) > 0
+    assert (tmp_path / "videoDLC_meta.pickle").is_file()
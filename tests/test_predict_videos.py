@@ -0,0 +1,144 @@
+import numpy as np
+import os
+import pytest
+from deeplabcut.pose_estimation_tensorflow import predict_videos
+
+
+class FakeCapture:
+    def __init__(self, n_frames):
+        self.n_frames = n_frames
+        self.pos = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self.pos >= self.n_frames:
+            return False, None
+        self.pos += 1
+        return True, self.pos - 1
+
+    def set(self, prop, value):
+        self.pos = int(value)
+
+
+def fake_get_pose(cap, nframes):
+    # Mimics the GetPose* functions, which read until the capture is exhausted
+    data = np.zeros((nframes, 3))
+    counter = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if ret:
+            data[counter] = frame
+        elif counter >= nframes:
+            break
+        counter += 1
+    return data, nframes
+
+
+def test_frame_range_capture():
+    cap = predict_videos._FrameRangeCapture(FakeCapture(10), 3)
+    assert [cap.read()[0] for _ in range(5)] == [True] * 3 + [False] * 2
+    assert cap.isOpened()
+
+
+def test_get_pose_in_chunks(tmp_path):
+    nframes = 23
+    filepath = str(tmp_path / "videoDLC_resnet50")
+    data = predict_videos._get_pose_in_chunks(
+        fake_get_pose, FakeCapture(nframes), nframes, 5, filepath
+    )
+    np.testing.assert_equal(data[:, 0], np.arange(nframes))
+    assert os.path.isfile(filepath + "_partial.npy")
+    del data
+    predict_videos._remove_checkpoint(filepath)
+    assert not os.listdir(tmp_path)
+
+
+def test_get_pose_in_chunks_resumes(tmp_path):
+    nframes = 23
+    filepath = str(tmp_path / "videoDLC_resnet50")
+    calls = []
+
+    def crashing_get_pose(cap, n):
+        calls.append(cap.pos)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return fake_get_pose(cap, n)
+
+    with pytest.raises(KeyboardInterrupt):
+        predict_videos._get_pose_in_chunks(
+            crashing_get_pose, FakeCapture(nframes), nframes, 5, filepath
+        )
+    assert calls == [0, 5, 10]
+
+    cap = FakeCapture(nframes)
+    calls.clear()
+
+    def get_pose(cap, n):
+        calls.append(cap.pos)
+        return fake_get_pose(cap, n)
+
+    data = predict_videos._get_pose_in_chunks(get_pose, cap, nframes, 5, filepath)
+    assert calls == [10, 15, 20]
+    np.testing.assert_equal(data[:, 0], np.arange(nframes))
+
+
+class FakeVideoReader:
+    n_frames = {"short.avi": 10, "long.avi": 30, "medium.avi": 20}
+
+    def __init__(self, video):
+        self.video = video
+
+    def __len__(self):
+        return self.n_frames[os.path.basename(self.video)]
+
+
+def test_list_analysis_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(predict_videos, "VideoReader", FakeVideoReader)
+    videos = [str(tmp_path / name) for name in FakeVideoReader.n_frames]
+    jobs = predict_videos._list_analysis_jobs(videos, None, "DLC_resnet50")
+    assert jobs == [
+        (str(tmp_path / "long.avi"), 30),
+        (str(tmp_path / "medium.avi"), 20),
+        (str(tmp_path / "short.avi"), 10),
+    ]
+
+
+def test_list_analysis_jobs_skips_analyzed_videos(tmp_path, monkeypatch):
+    monkeypatch.setattr(predict_videos, "VideoReader", FakeVideoReader)
+    (tmp_path / "longDLC_resnet50.h5").touch()
+    videos = [str(tmp_path / name) for name in FakeVideoReader.n_frames]
+    jobs = predict_videos._list_analysis_jobs(videos, None, "DLC_resnet50")
+    assert [video for video, _ in jobs] == [
+        str(tmp_path / "medium.avi"),
+        str(tmp_path / "short.avi"),
+    ]
+
+
+def test_run_analysis_jobs_reports_failures(tmp_path, monkeypatch):
+    import queue
+
+    def fake_analyze_video(video, DLCscorer, destfolder, **kwargs):
+        # Like AnalyzeVideo, errors are swallowed and the scorer returned
+        if "long" in video:
+            (tmp_path / f"{os.path.basename(video)[:-4]}{DLCscorer}.h5").touch()
+        elif "medium" in video:
+            raise ValueError("Corrupted video")
+        return DLCscorer
+
+    monkeypatch.setattr(predict_videos, "AnalyzeVideo", fake_analyze_video)
+    jobs = [(str(tmp_path / name), n) for name, n in FakeVideoReader.n_frames.items()]
+    job_queue = queue.Queue()
+    for job in jobs + [None]:
+        job_queue.put(job)
+    progress = queue.Queue()
+    analysis_kwargs = dict(DLCscorer="DLC_resnet50", destfolder=None)
+    predict_videos._run_analysis_jobs(
+        job_queue, progress, None, None, None, analysis_kwargs
+    )
+    failed = predict_videos._collect_analysis_progress(progress, jobs, [])
+    assert sorted(failed) == [
+        str(tmp_path / "medium.avi"),
+        str(tmp_path / "short.avi"),
+    ]
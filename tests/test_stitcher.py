@@ -1,7 +1,16 @@
+import networkx as nx
 import numpy as np
 import pandas as pd
 import pytest
-from deeplabcut.refine_training_dataset.stitch import Tracklet, TrackletStitcher
+from itertools import combinations
+from deeplabcut.refine_training_dataset import flow
+from deeplabcut.refine_training_dataset.stitch import (
+    Tracklet,
+    TrackletFeatures,
+    TrackletIntervalIndex,
+    TrackletReIDScorer,
+    TrackletStitcher,
+)
 
 
 TRACKLET_LEN = 1000
@@ -146,6 +155,218 @@ def test_stitcher(tmpdir_factory, fake_stitcher):
         fake_stitcher.stitch(add_back_residuals=True)
 
 
+def test_tracklet_interval_index():
+    rng = np.random.default_rng(0)
+    tracklets = []
+    for _ in range(50):
+        start, length = rng.integers(0, 200), rng.integers(3, 30)
+        inds = np.arange(start, start + 2 * length)
+        if rng.random() < 0.5:  # Tracklets with holes
+            inds = np.sort(rng.choice(inds, length, replace=False))
+        tracklets.append(Tracklet(rng.random((inds.size, 2, 3)), inds))
+    index = TrackletIntervalIndex(tracklets)
+    sorted_tracklets = index.tracklets
+    pairs = set(index.overlapping_pairs())
+    for i, j in combinations(range(len(sorted_tracklets)), 2):
+        assert ((i, j) in pairs) == (sorted_tracklets[j] in sorted_tracklets[i])
+
+    # Reference: smallest positive time gap following every tracklet
+    max_gap = 0
+    for i, tracklet1 in enumerate(sorted_tracklets):
+        gaps = [tracklet1.time_gap_to(t) for t in sorted_tracklets[i + 1 :]]
+        gaps = [gap for gap in gaps if gap > 0]
+        if gaps:
+            max_gap = max(max_gap, min(gaps))
+    assert index.max_gap() == max_gap
+
+    pairs = [
+        (i, j)
+        for i, j in combinations(range(len(sorted_tracklets)), 2)
+        if 0 < sorted_tracklets[j].start - sorted_tracklets[i].end <= 5
+    ]
+    inds1, inds2 = index.following_pairs(max_gap=5)
+    assert list(zip(inds1, inds2)) == pairs
+
+
+@pytest.mark.parametrize("with_nans", [False, True])
+def test_tracklet_features(with_nans):
+    rng = np.random.default_rng(0)
+    tracklets = []
+    for _ in range(30):
+        start, length = rng.integers(0, 300), rng.integers(10, 30)
+        data = rng.random((length, N_DETS, 3)) * 100
+        if with_nans:
+            data[rng.random((length, N_DETS)) < 0.2, :2] = np.nan
+        tracklets.append(Tracklet(data, np.arange(start, start + length)))
+    index = TrackletIntervalIndex(tracklets)
+    features = TrackletFeatures(index.tracklets)
+    inds1, inds2 = index.following_pairs(max_gap=np.inf)
+    # Pairs need not be ordered in time
+    inds1[::2], inds2[::2] = inds2[::2], inds1[::2].copy()
+    for name, method in [
+        ("distance", "distance_to"),
+        ("motion_affinity", "motion_affinity_with"),
+        ("box_overlap", "box_overlap_with"),
+        ("shape_dissimilarity", "shape_dissimilarity_with"),
+        ("dynamic_dissimilarity", "dynamic_dissimilarity_with"),
+    ]:
+        expected = [
+            getattr(features.tracklets[i], method)(features.tracklets[j])
+            for i, j in zip(inds1, inds2)
+        ]
+        np.testing.assert_array_equal(
+            getattr(features, name)(inds1, inds2), expected
+        )
+
+
+def make_animal_tracklets(n_frames, n_animals=3, seed=0):
+    # Well separated, smoothly moving animals, tracked in pieces
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_frames)
+    tracklets = []
+    for i in range(n_animals):
+        centroid = np.c_[100 * i + 20 * np.sin(t / 50 + i), 50 + 10 * np.cos(t / 30)]
+        xy = centroid[:, np.newaxis] + rng.normal(0, 0.5, (n_frames, N_DETS, 2))
+        data = np.concatenate((xy, np.ones((n_frames, N_DETS, 1))), axis=2)
+        start = 0
+        while start < n_frames:
+            end = min(start + rng.integers(20, 80), n_frames)
+            tracklets.append(Tracklet(data[start:end], t[start:end]))
+            start = end + rng.integers(1, 5)
+    return tracklets
+
+
+@pytest.mark.parametrize("window_size, overlap", [(2000, None), (300, 80), (250, 0)])
+def test_stitcher_windowed(window_size, overlap):
+    tracklets = make_animal_tracklets(1500)
+    stitcher = TrackletStitcher(tracklets, n_tracks=3)
+    stitcher.build_graph()
+    stitcher.stitch()
+    stitcher_windowed = TrackletStitcher(tracklets, n_tracks=3)
+    stitcher_windowed.stitch_windowed(window_size, overlap)
+    assert len(stitcher_windowed.tracks) == 3
+    for track1, track2 in zip(
+        sorted(stitcher.tracks, key=lambda t: t.centroid[0, 0]),
+        sorted(stitcher_windowed.tracks, key=lambda t: t.centroid[0, 0]),
+    ):
+        np.testing.assert_equal(track1.inds, track2.inds)
+        np.testing.assert_equal(track1.data, track2.data)
+
+    with pytest.raises(ValueError):
+        stitcher_windowed.stitch_windowed(100, 100)
+
+
+class CountingDict(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.n_reads = 0
+
+    def __getitem__(self, key):
+        self.n_reads += 1
+        return super().__getitem__(key)
+
+
+def test_tracklet_reid_scorer():
+    n_frames, n_animals, n_features = 400, 3, 8
+    tracklets = make_animal_tracklets(n_frames, n_animals)
+    rng = np.random.default_rng(0)
+    signatures = rng.normal(size=(n_animals, N_DETS, n_features))
+    coords = np.full((n_frames, n_animals, N_DETS, 2), np.nan)
+    for tracklet in tracklets:
+        # Animals are 100 px apart
+        animal = int(np.round(np.nanmean(tracklet.centroid[:, 0]) / 100))
+        coords[tracklet.inds, animal] = tracklet.xy
+    feature_dict = CountingDict()
+    zfill_width = int(np.ceil(np.log10(n_frames)))
+    for frame in range(n_frames):
+        feature_dict["frame" + str(frame).zfill(zfill_width)] = {
+            "coordinates": coords[frame],
+            "features": signatures + rng.normal(0, 0.1, signatures.shape),
+        }
+
+    batch_sizes = []
+
+    def embed(vecs):
+        batch_sizes.append(len(vecs))
+        return vecs.reshape((len(vecs), -1))
+
+    def cost(tracklet1, tracklet2):
+        # Per-pair reference
+        vecs = []
+        for frame, xy in (
+            (tracklet1.inds[-1], tracklet1.data[-1, :, :2]),
+            (tracklet2.inds[0], tracklet2.data[0, :, :2]),
+        ):
+            key = "frame" + str(frame).zfill(zfill_width)
+            record = dict.__getitem__(feature_dict, key)
+            diff = record["coordinates"] - xy
+            diff[np.where(np.logical_or(diff > 9000, diff < 0))] = np.nan
+            match_id = np.argmin(np.nanmean(diff, axis=(1, 2)))
+            vecs.append(record["features"][match_id].ravel())
+        sim = vecs[0] @ vecs[1] / np.linalg.norm(vecs[0]) / np.linalg.norm(vecs[1])
+        return -(sim + 1) / 2
+
+    features = TrackletFeatures(tracklets)
+    index = TrackletIntervalIndex(tracklets)
+    inds1, inds2 = index.following_pairs(100)
+    order = [tracklets.index(t) for t in index.tracklets]
+    inds1, inds2 = np.take(order, inds1), np.take(order, inds2)
+    scorer = TrackletReIDScorer(embed, feature_dict, n_frames, batch_size=16)
+    costs = scorer(features, inds1, inds2)
+    expected = [cost(tracklets[i], tracklets[j]) for i, j in zip(inds1, inds2)]
+    np.testing.assert_allclose(costs, expected)
+    n_endpoints = len(np.unique(inds1)) + len(np.unique(inds2))
+    assert sum(batch_sizes) == n_endpoints
+    assert max(batch_sizes) <= 16
+    assert feature_dict.n_reads <= n_endpoints
+
+    # Endpoints are embedded only once
+    n_calls = len(batch_sizes)
+    np.testing.assert_allclose(scorer(features, inds1, inds2), costs)
+    assert len(batch_sizes) == n_calls
+
+    stitcher = TrackletStitcher(tracklets, n_tracks=n_animals)
+    stitcher.build_graph(batch_weight_func=scorer)
+    stitcher.stitch()
+    assert len(stitcher.tracks) == n_animals
+
+
+def test_min_cost_flow_solvers():
+    tracklets = make_animal_tracklets(1000)
+    stitcher = TrackletStitcher(tracklets, n_tracks=3)
+    stitcher.build_graph()
+    cost_nx, flow_nx = flow.solve_min_cost_flow(stitcher.G, "networkx")
+    cost, flow_dict = flow.solve_min_cost_flow(stitcher.G, "ssp")
+    assert cost == cost_nx
+    for node in stitcher.G:
+        assert sum(flow_dict[node].values()) == sum(flow_nx[node].values())
+
+    for solver in ("networkx", "ssp"):
+        stitcher.stitch(solver=solver)
+        assert len(stitcher.tracks) == 3
+    with pytest.raises(ValueError):
+        flow.solve_min_cost_flow(stitcher.G, "simplex")
+
+    G = nx.DiGraph()
+    G.add_node("source", demand=-2)
+    G.add_node("sink", demand=2)
+    G.add_edge("source", "sink", capacity=1)
+    with pytest.raises(nx.NetworkXUnfeasible):
+        flow.solve_min_cost_flow(G, "ssp")
+
+
+def test_min_cost_flow_solvers_agree():
+    # Stitching graphs of growing size
+    for n_frames in (500, 2000, 8000):
+        stitcher = TrackletStitcher(make_animal_tracklets(n_frames), n_tracks=3)
+        stitcher.build_graph()
+        costs = [
+            flow.solve_min_cost_flow(stitcher.G, solver)[0]
+            for solver in ("ssp", "networkx")
+        ]
+        assert costs[0] == costs[1]
+
+
 def test_stitcher_plot(fake_stitcher):
     fake_stitcher.build_graph(max_gap=1)
     fake_stitcher.draw_graph(with_weights=True)
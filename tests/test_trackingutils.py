@@ -30,6 +30,26 @@ def test_ellipse_fitter():
     assert np.isclose(el.parameters, [0, 0, 4, 2, 0]).all()
 
 
+def test_ellipse_fitter_many():
+    rng = np.random.default_rng(0)
+    xy = rng.normal(size=(50, 6, 2)) * [30, 10] + rng.uniform(0, 500, (50, 1, 2))
+    xy[rng.random((50, 6)) < 0.3] = np.nan
+    xy[0, 2:] = np.nan
+    fitter = trackingutils.EllipseFitter()
+    params = fitter.fit_many(xy)
+    for pose, p in zip(xy, params):
+        el = fitter.fit(pose)
+        if el is None:
+            assert np.isnan(p).all()
+        else:
+            np.testing.assert_allclose(p, el.parameters)
+    fitter.sd = 0
+    xy = np.asarray([[-2, 0], [2, 0], [0, 1], [0, -1]], dtype=float)
+    params = fitter.fit_many([xy, np.full_like(xy, np.nan)])
+    np.testing.assert_allclose(params[0], [0, 0, 4, 2, 0], atol=1e-12)
+    assert np.isnan(params[1]).all()
+
+
 def test_ellipse_tracker(ellipse):
     tracker1 = trackingutils.EllipseTracker(ellipse.parameters)
     tracker2 = trackingutils.EllipseTracker(ellipse.parameters)
@@ -42,6 +62,55 @@ def test_ellipse_tracker(ellipse):
     assert tracker1.hit_streak == 0
 
 
+def test_similarity_matrices():
+    rng = np.random.default_rng(0)
+    params = np.c_[
+        rng.uniform(0, 100, (6, 2)), rng.uniform(1, 20, (6, 2)), rng.uniform(0, 3, 6)
+    ]
+    ellipses = [trackingutils.Ellipse(*p) for p in params]
+    np.testing.assert_allclose(
+        trackingutils.calc_similarity_matrix(params[:4], params[4:]),
+        [[el1.calc_similarity_with(el2) for el2 in ellipses[4:]] for el1 in ellipses[:4]],
+    )
+    bboxes = np.c_[params[:, :2], params[:, :2] + params[:, 2:4]]
+    np.testing.assert_array_equal(
+        trackingutils.calc_iou_matrix(bboxes[:4], bboxes[4:]),
+        [[trackingutils.calc_iou(b1, b2) for b2 in bboxes[4:]] for b1 in bboxes[:4]],
+    )
+    poses = rng.uniform(0, 100, (5, 4, 2))
+    poses[0, 1] = np.nan
+    poses[1] = np.nan
+    mot = trackingutils.SORTSkeleton(4)
+    np.testing.assert_array_equal(
+        mot.calc_pairwise_hausdorff_dist(poses[:3], poses[3:]),
+        [[mot.weighted_hausdorff(p1, p2) for p2 in poses[3:]] for p1 in poses[:3]],
+    )
+
+
+@pytest.mark.parametrize(
+    "tracker_type, params",
+    [
+        (trackingutils.EllipseTracker, [[0, 0, 2, 4, 1], [10, 5, 3, 1, 0]]),
+        (trackingutils.BoxTracker, [[0, 0, 100, 100], [50, 20, 60, 90]]),
+    ],
+)
+def test_predict_update_many(tracker_type, params):
+    trackers = [tracker_type(p) for p in params]
+    trackers_ref = [tracker_type(p) for p in params]
+    for _ in range(3):
+        states = tracker_type.predict_many(trackers)
+        np.testing.assert_allclose(states, [t.predict() for t in trackers_ref])
+        measurements = np.asarray(params) + 1
+        tracker_type.update_many(trackers, measurements)
+        for tracker, m in zip(trackers_ref, measurements):
+            tracker.update(m)
+        for tracker, tracker_ref in zip(trackers, trackers_ref):
+            np.testing.assert_allclose(tracker.kf.x, tracker_ref.kf.x)
+            np.testing.assert_allclose(tracker.kf.P, tracker_ref.kf.P)
+            assert tracker.hit_streak == tracker_ref.hit_streak
+            assert tracker.time_since_update == tracker_ref.time_since_update
+
+
 def test_sort_ellipse():
     tracklets = dict()
     mot = trackingutils.SORTEllipse(1, 1, 0.6)